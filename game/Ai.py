@@ -1,5 +1,28 @@
 import random
 
+from game.constans import FIELDSIZE_DEFAULT, EMPTY, SHIP, DAMAGED, MISSED
+from game.engine import (Salvo, MoveShip, Hit, Sunk, SalvoFired, ShipMoved,
+                         MineExploded, MINES_COUNT)
+from game.fleet import fleet_for_size
+from game.pool import IndexedPool, SparsePool
+from game.ship import find_ship_cages
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+def random_cell(available_cells):
+    """
+    Случайная доступная клетка: за O(1) из IndexedPool и SparsePool,
+    для обычного множества — через список
+    """
+    if isinstance(available_cells, (IndexedPool, SparsePool)):
+        return available_cells.choice()
+    return random.choice(list(available_cells))
+
 
 class Ai:
     def __init__(self):
@@ -32,7 +55,7 @@ class Ai:
                 if next_move in available_cells:
                     return next_move
 
-        return random.choice(list(available_cells))
+        return random_cell(available_cells)
 
     def register_hit(self, x, y, is_ship_destroyed=False):
         """
@@ -64,3 +87,545 @@ class Ai:
         if self.direction:
             self.direction = (-self.direction[0], -self.direction[1])
             self.last_hit = self.first_hit
+
+
+class ProbabilityAi:
+    """
+    Бот, стреляющий в клетку, которую покрывает наибольшее число
+    допустимых положений еще не потопленных кораблей противника.
+    """
+    def __init__(self, field_size=FIELDSIZE_DEFAULT, ships=None):
+        self.field_size_x, self.field_size_y = field_size
+        if ships is None:
+            ships = fleet_for_size(field_size)
+        self.remaining = dict(ships)
+        self.hits = set()
+        self.blocked = set()
+        self.last_move = None
+        if HAS_NUMPY:
+            self.free = np.ones((self.field_size_y, self.field_size_x),
+                                dtype=bool)
+            self.hit_grid = np.zeros_like(self.free)
+
+    def make_move(self, available_cells):
+        """
+        Выстрел в самую вероятную клетку
+        """
+        if HAS_NUMPY:
+            candidates = self._candidates_numpy()
+        else:
+            candidates = self._candidates_python()
+        for move in candidates:
+            if move in available_cells:
+                self.last_move = move
+                return move
+        self.last_move = random_cell(available_cells)
+        return self.last_move
+
+    def register_hit(self, x, y, is_ship_destroyed=False):
+        """
+        Регистрация попадания
+        """
+        self.hits.add((x, y))
+        if HAS_NUMPY:
+            self.free[y, x] = False
+            self.hit_grid[y, x] = True
+        if not is_ship_destroyed:
+            return
+
+        ship = {(x, y)}
+        stack = [(x, y)]
+        while stack:
+            a, b = stack.pop()
+            for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                cell = (a + dx, b + dy)
+                if cell in self.hits and cell not in ship:
+                    ship.add(cell)
+                    stack.append(cell)
+        self.hits -= ship
+        for a, b in ship:
+            for dx in range(-1, 2):
+                for dy in range(-1, 2):
+                    c, d = a + dx, b + dy
+                    if (0 <= c < self.field_size_x and
+                            0 <= d < self.field_size_y):
+                        self._block(c, d)
+            if HAS_NUMPY:
+                self.hit_grid[b, a] = False
+        if self.remaining.get(len(ship)):
+            self.remaining[len(ship)] -= 1
+
+    def register_miss(self):
+        """
+        Регистрация промаха
+        """
+        if self.last_move is not None:
+            self._block(*self.last_move)
+
+    def _block(self, x, y):
+        self.blocked.add((x, y))
+        if HAS_NUMPY:
+            self.free[y, x] = False
+
+    def _candidates_numpy(self):
+        heat = np.zeros(self.free.shape, dtype=np.int64)
+        legal = self.free | self.hit_grid
+        target = bool(self.hits)
+        for size, count in self.remaining.items():
+            if count <= 0:
+                continue
+            heat += count * _line_heat(self.free, legal, self.hit_grid,
+                                       size, target)
+            if size > 1:
+                heat += count * _line_heat(self.free.T, legal.T,
+                                           self.hit_grid.T, size, target).T
+        heat[~self.free] = 0
+        best = heat.max()
+        if best == 0:
+            return []
+        ys, xs = np.nonzero(heat == best)
+        moves = list(zip(xs.tolist(), ys.tolist()))
+        random.shuffle(moves)
+        return moves
+
+    def _candidates_python(self):
+        heat = {}
+        target = bool(self.hits)
+        for size, count in self.remaining.items():
+            if count <= 0:
+                continue
+            directions = ((1, 0),) if size == 1 else ((1, 0), (0, 1))
+            for dx, dy in directions:
+                for y in range(self.field_size_y - dy * (size - 1)):
+                    for x in range(self.field_size_x - dx * (size - 1)):
+                        cells = [(x + dx * i, y + dy * i)
+                                 for i in range(size)]
+                        if any(cell in self.blocked for cell in cells):
+                            continue
+                        covered = sum(cell in self.hits for cell in cells)
+                        if target:
+                            weight = covered * count
+                        else:
+                            weight = count
+                        if weight == 0:
+                            continue
+                        for cell in cells:
+                            if cell not in self.hits:
+                                heat[cell] = heat.get(cell, 0) + weight
+        if not heat:
+            return []
+        best = max(heat.values())
+        moves = [cell for cell, value in heat.items() if value == best]
+        random.shuffle(moves)
+        return moves
+
+
+# Положения кораблей через подбитые, но не потопленные клетки
+# во столько раз вероятнее остальных
+HIT_BONUS = 50
+# Вес положения через клетку, где бот промахнулся до последнего хода
+# соперника: корабль соперника мог туда сдвинуться
+STALE_MISS_WEIGHT = 0.3
+# Сколько клеток своего флота в среднем должно спасти перемещение
+EVADE_MARGIN = 0.05
+# Сколько самых угрожаемых кораблей проверяется на отход
+EVADE_CANDIDATES = 8
+
+
+class DuelAi:
+    """
+    Бот для режима 1 на 1 по особым правилам.
+    Для каждой клетки поля соперника оценивает ожидаемое число клеток
+    кораблей по всем допустимым положениям оставшихся кораблей
+    и стреляет самым длинным кораблем туда, где залп в среднем
+    подобьет больше всего клеток. Той же оценкой со стороны соперника
+    находит свои корабли под угрозой и отводит один из них, если
+    выигрыш больше риска наступить на мину.
+    Знает только то, что видно игроку: подбитые клетки, ореолы,
+    свои залпы и события партии, которые ему передают в observe.
+    """
+    def __init__(self, field_size=FIELDSIZE_DEFAULT, ships=None):
+        self.field_size_x, self.field_size_y = field_size
+        if ships is None:
+            ships = fleet_for_size(field_size)
+        self.enemy_fleet = dict(ships)
+        self.fresh_misses = set()
+        self.stale_misses = set()
+        self.enemy_sunk = set()
+        self.enemy_misses = set()
+        self.safe = None
+        self.exploded = 0
+
+    def place_mines(self):
+        """
+        Пять мин на поле соперника: клетки выбираются случайно
+        с весом по числу положений кораблей, которые их покрывают,
+        поэтому мины чаще стоят там, где чаще бывают корабли
+        """
+        empty = [[EMPTY] * self.field_size_x
+                 for _ in range(self.field_size_y)]
+        heat, _ = self._heat(empty, (), (), (), self.enemy_fleet)
+        cells = [(x, y) for y in range(self.field_size_y)
+                 for x in range(self.field_size_x)]
+        if len(cells) < MINES_COUNT:
+            raise ValueError(f"На поле меньше {MINES_COUNT} клеток")
+        weights = [float(heat[y][x]) + 1e-9 for x, y in cells]
+        mines = []
+        while len(mines) < MINES_COUNT:
+            cell = random.choices(cells, weights)[0]
+            if cell not in mines:
+                mines.append(cell)
+        return mines
+
+    def choose_action(self, state, player):
+        """
+        Следующее действие бота в его ход: перемещение корабля
+        (не больше одного за ход) или залп
+        """
+        self._remember_ships(state, player)
+        if not state.moved_ship:
+            move = self._evade(state, player)
+            if move is not None:
+                return move
+        return self._salvo(state, player)
+
+    def fallback_salvo(self, state, player):
+        """
+        Простой допустимый залп на случай, если движок отверг
+        действие бота: любым кораблем с целой клеткой по случайной
+        неподбитой клетке соперника
+        """
+        field = state.fields[player]
+        ship_x, ship_y = next((x, y) for x, y in field.registry.ship_at
+                              if field[y][x] == SHIP)
+        enemy = state.fields[1 - player]
+        x, y = random.choice([(x, y) for y, row in enumerate(enemy)
+                              for x, cage in enumerate(row)
+                              if cage != DAMAGED])
+        return Salvo(player, ship_x, ship_y, x, y)
+
+    def observe(self, state, events, player):
+        """
+        Учет событий партии: промахов и потопленных кораблей
+        своих залпов и залпов соперника, перемещений и подрывов
+        """
+        self._remember_ships(state, player)
+        hits = {(event.x, event.y) for event in events
+                if type(event) is Hit}
+        for event in events:
+            kind = type(event)
+            if kind is SalvoFired:
+                misses = set(event.cells) - hits
+                if event.player == player:
+                    self.fresh_misses |= misses
+                else:
+                    self.enemy_misses |= misses
+            elif kind is Sunk and event.player == player:
+                self._enemy_ship_sunk(event.cells)
+            elif kind is ShipMoved:
+                if event.player == player:
+                    self.safe.update(event.cells)
+                else:
+                    self.stale_misses |= self.fresh_misses
+                    self.fresh_misses = set()
+            elif kind is MineExploded:
+                if event.player == player:
+                    self.exploded += 1
+                else:
+                    enemy_field = state.fields[1 - player]
+                    self._enemy_ship_sunk(
+                        find_ship_cages(enemy_field, event.x, event.y))
+
+    def _remember_ships(self, state, player):
+        """
+        Клетки, где стоят свои корабли, заведомо без мин
+        """
+        if self.safe is None:
+            self.safe = set(state.fields[player].registry.ship_at)
+
+    def _enemy_ship_sunk(self, cells):
+        self.enemy_sunk.update(cells)
+        self.fresh_misses.difference_update(cells)
+        self.stale_misses.difference_update(cells)
+        size = len(cells)
+        if self.enemy_fleet.get(size):
+            self.enemy_fleet[size] -= 1
+
+    def _salvo(self, state, player):
+        ship_cells = max(
+            (cells for ship_id, cells in
+             state.fields[player].registry.ship_cells.items()
+             if state.fields[player].registry.health[ship_id]),
+            key=len)
+        field = state.fields[1 - player]
+        ship_x, ship_y = next((x, y) for x, y in ship_cells
+                              if state.fields[player][y][x] == SHIP)
+        heat, damaged = self._heat(field, self.enemy_sunk,
+                                   self.fresh_misses, self.stale_misses,
+                                   self.enemy_fleet)
+        x, y = self._best_target(heat, damaged, len(ship_cells))
+        return Salvo(player, ship_x, ship_y, x, y)
+
+    def _heat(self, field, sunk, blocked, soft, fleet):
+        """
+        Ожидаемое число клеток кораблей fleet в каждой клетке field
+        и подбитые клетки. Положения через промахи, потопленные
+        корабли и клетки blocked невозможны, через клетки soft —
+        маловероятны, через подбитые клетки непотопленных кораблей —
+        вероятнее остальных.
+        """
+        if HAS_NUMPY:
+            return _duel_heat_numpy(field, sunk, blocked, soft, fleet)
+        return _duel_heat_python(field, sunk, blocked, soft, fleet)
+
+    def _best_target(self, heat, damaged, salvo_size):
+        """
+        Клетка, залп в которую в среднем подобьет больше всего клеток:
+        сама клетка и каждая соседняя с вероятностью попасть в залп
+        """
+        if HAS_NUMPY:
+            score = _expected_damage_numpy(heat, salvo_size)
+            score[damaged] = -1.0
+            ys, xs = np.nonzero(score == score.max())
+            return random.choice(list(zip(xs.tolist(), ys.tolist())))
+        best = None
+        moves = []
+        for y in range(self.field_size_y):
+            for x in range(self.field_size_x):
+                if (x, y) in damaged:
+                    continue
+                near = [heat[b][a] for a, b in _cross(x, y, self.field_size_x,
+                                                      self.field_size_y)]
+                share = min(1.0, (salvo_size - 1) / len(near)) if near else 0
+                value = heat[y][x] + share * sum(near)
+                if best is None or value > best:
+                    best, moves = value, [(x, y)]
+                elif value == best:
+                    moves.append((x, y))
+        return random.choice(moves)
+
+    def _evade(self, state, player):
+        """
+        Перемещение корабля, которое сильнее всего снижает
+        ожидаемый урон от следующих залпов соперника с учетом
+        риска наступить на мину, или None
+        """
+        field = state.fields[player]
+        registry = field.registry
+        sunk = set()
+        intact = []
+        for ship_id, cells in registry.ship_cells.items():
+            if registry.health[ship_id] == 0:
+                sunk.update(cells)
+            elif registry.health[ship_id] == len(cells):
+                intact.append(cells)
+        if not intact:
+            return None
+        threat, _ = self._heat(field, sunk, self.enemy_misses, (),
+                               registry.afloat)
+        if HAS_NUMPY:
+            threat = threat.tolist()
+        ranked = sorted(intact, key=lambda cells: sum(threat[y][x]
+                                                      for x, y in cells),
+                        reverse=True)
+        area = self.field_size_x * self.field_size_y
+        unknown = max(1, area - len(self.safe))
+        chance = max(0, MINES_COUNT - self.exploded) / unknown
+
+        best_gain, best_move = EVADE_MARGIN, None
+        for cells in ranked[:EVADE_CANDIDATES]:
+            before = sum(threat[y][x] for x, y in cells)
+            for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                moved = [(x + dx, y + dy) for x, y in cells]
+                if not self._can_move(field, cells, moved):
+                    continue
+                entered = [cell for cell in moved
+                           if cell not in self.safe]
+                risk = 1 - (1 - chance) ** len(entered)
+                gain = (before - sum(threat[y][x] for x, y in moved)
+                        - risk * len(cells))
+                if gain > best_gain:
+                    best_gain = gain
+                    best_move = MoveShip(player, *cells[0], dx, dy)
+        return best_move
+
+    def _can_move(self, field, cells, moved):
+        """
+        Те же условия, что у shift_ship: новые клетки в поле и пусты,
+        а рядом нет чужих кораблей
+        """
+        own = set(cells)
+        width, height = self.field_size_x, self.field_size_y
+        for x, y in moved:
+            if not (0 <= x < width and 0 <= y < height):
+                return False
+            if (x, y) not in own and field[y][x] != EMPTY:
+                return False
+            for a in range(max(0, x - 1), min(width, x + 2)):
+                for b in range(max(0, y - 1), min(height, y + 2)):
+                    if field[b][a] == SHIP and (a, b) not in own:
+                        return False
+        return True
+
+
+def _marks(field):
+    """
+    Подбитые клетки и клетки, отмеченные промахом
+    """
+    damaged = set()
+    missed = set()
+    for y, row in enumerate(field):
+        for x, cage in enumerate(row):
+            if cage == DAMAGED:
+                damaged.add((x, y))
+            elif cage == MISSED:
+                missed.add((x, y))
+    return damaged, missed
+
+
+def _cross(x, y, width, height):
+    return [(x + dx, y + dy) for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1))
+            if 0 <= x + dx < width and 0 <= y + dy < height]
+
+
+def _mask(cells, shape):
+    grid = np.zeros(shape, dtype=bool)
+    if cells:
+        xs, ys = zip(*cells)
+        grid[list(ys), list(xs)] = True
+    return grid
+
+
+def _board(field):
+    """
+    Поле как массив символов: строки поля склеиваются в одну строку
+    и читаются как UTF-32 без копирования по клетке
+    """
+    text = "".join(map("".join, field)).encode("utf-32-le")
+    return np.frombuffer(text, dtype="<U1").reshape(len(field), -1)
+
+
+def _duel_heat_numpy(field, sunk, blocked, soft, fleet):
+    """
+    Для каждого размера — доля взвешенных положений,
+    покрывающих клетку, умноженная на число кораблей
+    """
+    board = _board(field)
+    shape = board.shape
+    damaged = board == DAMAGED
+    sunk = _mask(sunk, shape)
+    hard = (board == MISSED) | sunk | _mask(blocked, shape)
+    hits = damaged & ~sunk
+    soft = _mask(soft, shape) & ~hard
+    heat = np.zeros(shape)
+    for size, count in fleet.items():
+        if count <= 0:
+            continue
+        cover = _weighted_cover(hard, soft, hits, size)
+        if size > 1:
+            cover += _weighted_cover(hard.T, soft.T, hits.T, size).T
+        total = cover.sum() / size
+        if total > 0:
+            heat += count * cover / total
+    heat[hits] = 0
+    return heat, damaged
+
+
+def _weighted_cover(hard, soft, hits, size):
+    """
+    Сумма весов горизонтальных положений корабля размера size,
+    покрывающих каждую клетку
+    """
+    cover = np.zeros(hard.shape)
+    width = hard.shape[1]
+    if size > width:
+        return cover
+    weights = np.where(_window_sums(hard, size) == 0,
+                       STALE_MISS_WEIGHT ** _window_sums(soft, size), 0.0)
+    weights *= 1 + HIT_BONUS * _window_sums(hits, size)
+    count = width - size + 1
+    for i in range(size):
+        cover[:, i:i + count] += weights
+    return cover
+
+
+def _expected_damage_numpy(heat, salvo_size):
+    height, width = heat.shape
+    near = np.zeros_like(heat)
+    neighbours = np.zeros_like(heat)
+    near[:, 1:] += heat[:, :-1]
+    near[:, :-1] += heat[:, 1:]
+    near[1:, :] += heat[:-1, :]
+    near[:-1, :] += heat[1:, :]
+    neighbours[:, 1:] += 1
+    neighbours[:, :-1] += 1
+    neighbours[1:, :] += 1
+    neighbours[:-1, :] += 1
+    share = np.minimum(1.0, (salvo_size - 1) / np.maximum(neighbours, 1))
+    return heat + share * near
+
+
+def _duel_heat_python(field, sunk, blocked, soft, fleet):
+    height = len(field)
+    width = len(field[0])
+    damaged, missed = _marks(field)
+    hard = missed | set(sunk) | set(blocked)
+    hits = damaged - set(sunk)
+    soft = set(soft) - hard
+    heat = [[0.0] * width for _ in range(height)]
+    for size, count in fleet.items():
+        if count <= 0:
+            continue
+        cover = {}
+        total = 0.0
+        directions = ((1, 0),) if size == 1 else ((1, 0), (0, 1))
+        for dx, dy in directions:
+            for y in range(height - dy * (size - 1)):
+                for x in range(width - dx * (size - 1)):
+                    cells = [(x + dx * i, y + dy * i) for i in range(size)]
+                    if any(cell in hard for cell in cells):
+                        continue
+                    weight = (STALE_MISS_WEIGHT **
+                              sum(cell in soft for cell in cells) *
+                              (1 + HIT_BONUS *
+                               sum(cell in hits for cell in cells)))
+                    total += weight
+                    for cell in cells:
+                        cover[cell] = cover.get(cell, 0.0) + weight
+        if total > 0:
+            for (x, y), value in cover.items():
+                heat[y][x] += count * value / total
+    for x, y in hits:
+        heat[y][x] = 0.0
+    return heat, damaged
+
+
+def _window_sums(grid, size):
+    """
+    Суммы по всем горизонтальным отрезкам длины size
+    """
+    sums = np.zeros((grid.shape[0], grid.shape[1] + 1), dtype=np.int32)
+    np.cumsum(grid, axis=1, out=sums[:, 1:])
+    return sums[:, size:] - sums[:, :-size]
+
+
+def _line_heat(free, legal, hits, size, target):
+    """
+    Сколько горизонтальных положений корабля размера size
+    покрывает каждую клетку (с весом по числу покрытых попаданий
+    в режиме добивания)
+    """
+    heat = np.zeros(free.shape, dtype=np.int64)
+    width = free.shape[1]
+    if size > width:
+        return heat
+    if target:
+        covered = _window_sums(hits, size)
+        weights = np.where((_window_sums(legal, size) == size),
+                           covered, 0)
+    else:
+        weights = (_window_sums(free, size) == size).astype(np.int64)
+    count = width - size + 1
+    for i in range(size):
+        heat[:, i:i + count] += weights
+    return heat
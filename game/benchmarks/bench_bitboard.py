@@ -0,0 +1,97 @@
+import random
+import timeit
+
+from game.bitboard import BitField
+from game.constans import SHIP, DAMAGED
+from game.field import make_field, mark_around_ship
+from game.ship import ship_not_near, find_ship_cages
+from game.utils import random_place_fleet, game_over
+
+
+def make_boards(field_size, seed=0):
+    """
+    Одинаковая расстановка флота на поле из списков и на битовом поле
+    """
+    random.seed(seed)
+    field = make_field(field_size)
+    random_place_fleet(field)
+    return field, BitField.from_list(field)
+
+
+def bench_ship_not_near(field):
+    width, height = len(field[0]), len(field)
+    for y in range(height):
+        for x in range(width):
+            ship_not_near(field, x, y, 3, 'h')
+            ship_not_near(field, x, y, 3, 'v')
+
+
+def bench_game_over(field):
+    game_over(field)
+
+
+def sunk_boards(field, ship_cells):
+    """
+    Копии поля с потопленным, но еще не отмеченным кораблем ship_cells:
+    из списков и битовая
+    """
+    sunk = [row[:] for row in field]
+    for x, y in ship_cells:
+        sunk[y][x] = DAMAGED
+    return sunk, BitField.from_list(sunk)
+
+
+def time_mark_around_ship(field, ship_cells, number):
+    """
+    Среднее время отметки ореола на списках и на битах. Перед каждым
+    вызовом вне замера готовится новое поле: на уже отмеченном поле
+    mark_around_ship ничего не делает.
+    """
+    boards = []
+
+    def setup():
+        boards[:] = sunk_boards(field, ship_cells)
+
+    return tuple(
+        sum(timeit.repeat(
+            lambda: mark_around_ship(boards[index], None, ship_cells),
+            setup, number=1, repeat=number)) / number
+        for index in (0, 1))
+
+
+def run(field_sizes=((10, 10), (42, 42)), number=200):
+    results = []
+    for field_size in field_sizes:
+        field, bit_field = make_boards(field_size)
+        ship = next((x, y) for y, row in enumerate(field)
+                    for x, cage in enumerate(row) if cage == SHIP)
+        ship_cells = find_ship_cages(field, *ship)
+        # Конец партии: game_over просматривает все поле
+        finished = [[DAMAGED if cage == SHIP else cage for cage in row]
+                    for row in field]
+        cases = (
+            ('ship_not_near', bench_ship_not_near, field, bit_field),
+            ('game_over', bench_game_over,
+             finished, BitField.from_list(finished)),
+        )
+        for name, case, list_field, bits in cases:
+            list_time = timeit.timeit(lambda: case(list_field), number=number)
+            bit_time = timeit.timeit(lambda: case(bits), number=number)
+            results.append((field_size, name, list_time / number,
+                            bit_time / number))
+        results.append((field_size, 'mark_around_ship',
+                        *time_mark_around_ship(field, ship_cells, number)))
+    return results
+
+
+def main():
+    print(f"{'поле':>7} {'функция':>18} {'списки, мкс':>12} "
+          f"{'биты, мкс':>10} {'ускорение':>9}")
+    for field_size, name, list_time, bit_time in run():
+        size = f"{field_size[0]}x{field_size[1]}"
+        print(f"{size:>7} {name:>18} {list_time * 1e6:12.1f} "
+              f"{bit_time * 1e6:10.1f} {list_time / bit_time:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+from itertools import count
+
+from game.Ai import Ai, DuelAi
+from game.constans import EMPTY, SHIP, DAMAGED
+from game.engine import duel_state
+from game.field import (make_field, mark_around_ship,
+                        check_ship_full_destroyed)
+from game.fleet import fleet_for_density
+from game.ship import ship_not_near, random_place_ship, find_ship_cages
+from game.simulation import play_headless_game
+from game.utils import random_place_fleet, game_over, init_available_cells
+
+FIELD_SIZES = ((10, 10), (16, 16), (24, 24), (32, 32), (42, 42))
+# Доля клеток поля под кораблями; у классического флота на 10x10 — 0.2
+DENSITIES = (0.05, 0.1, 0.2)
+
+
+def bench_ship_not_near(field):
+    for y in range(len(field)):
+        for x in range(len(field[0])):
+            ship_not_near(field, x, y, 3, 'h')
+            ship_not_near(field, x, y, 3, 'v')
+
+
+def bench_random_place_ship(field):
+    """
+    Установка однопалубного корабля на расставленное поле
+    и откат, чтобы поле не заполнялось от повтора к повтору
+    """
+    registry = field.registry
+    if random_place_ship(field, 1):
+        ship_id = registry.next_id - 1
+        for x, y in registry.cells(ship_id):
+            field[y][x] = EMPTY
+        registry.remove_ship(ship_id)
+
+
+def bench_find_ship_cages(field, ships):
+    for cells in ships:
+        for x, y in cells:
+            find_ship_cages(field, x, y)
+
+
+def bench_check_ship_full_destroyed(field, ships, halo):
+    for cells in ships:
+        check_ship_full_destroyed(field, *cells[0])
+    clear_marks(field, halo)
+
+
+def bench_mark_around_ship(field, ships):
+    marked = []
+    for cells in ships:
+        marked.extend(mark_around_ship(field, None, cells))
+    clear_marks(field, marked)
+
+
+def clear_marks(field, cells):
+    """
+    Снятие отметок вокруг потопленных кораблей, чтобы каждый повтор
+    замера отмечал клетки заново, а не проходил по отмеченному полю
+    """
+    for x, y in cells:
+        field[y][x] = EMPTY
+
+
+def bench_make_move(field_size):
+    """
+    Партия одного бота по пустому полю: ход за ходом
+    до последней клетки
+    """
+    ai = Ai()
+    cells = init_available_cells(field_size)
+    while cells:
+        cells.remove(ai.make_move(cells))
+
+
+def sunk_field(field_size, ships, seed):
+    """
+    Поле в конце партии: та же расстановка, что у поля
+    с тем же зерном, все корабли подбиты
+    """
+    random.seed(seed)
+    field = make_field(field_size)
+    random_place_fleet(field, ships)
+    sink_all(field)
+    return field
+
+
+def sink_all(field):
+    """
+    Поле в конце партии: все корабли подбиты
+    """
+    registry = field.registry
+    for y, row in enumerate(field):
+        for x, cage in enumerate(row):
+            if cage == SHIP:
+                row[x] = DAMAGED
+                registry.hit(x, y)
+
+
+def duel_fields(field_size, ships):
+    """
+    Поля партии 1 на 1 в середине игры: у соперника подбита
+    каждая третья клетка кораблей, свои корабли целы
+    """
+    fields = (make_field(field_size), make_field(field_size))
+    for field in fields:
+        random_place_fleet(field, ships)
+    enemy = fields[1]
+    for cells in list(enemy.registry.ship_cells.values()):
+        for x, y in cells[::3]:
+            enemy[y][x] = DAMAGED
+            enemy.registry.hit(x, y)
+    return fields
+
+
+def cases(field_size, ships, seed):
+    """
+    Замеряемые функции: имя, вызов и число операций в одном вызове
+    """
+    random.seed(seed)
+    field = make_field(field_size)
+    if not random_place_fleet(field, ships):
+        raise RuntimeError(f"флот {ships} не помещается "
+                           f"на поле {field_size[0]}x{field_size[1]}")
+    fleet = [list(cells) for cells in field.registry.ship_cells.values()]
+    sunk = sunk_field(field_size, ships, seed)
+    destroyed = sunk_field(field_size, ships, seed)
+    halo = []
+    for cells in fleet:
+        halo.extend(mark_around_ship(destroyed, None, cells))
+    clear_marks(destroyed, halo)
+    area = field_size[0] * field_size[1]
+    fleet_field = make_field(field_size)
+    duel = duel_state(*duel_fields(field_size, ships))._replace(current=0)
+    duel_ai = DuelAi(field_size, ships)
+    games = count(seed)
+    return (
+        ('ship_not_near', lambda: bench_ship_not_near(field), 2 * area),
+        ('random_place_ship', lambda: bench_random_place_ship(field), 1),
+        ('random_place_fleet',
+         lambda: random_place_fleet(fleet_field, ships), 1),
+        ('find_ship_cages', lambda: bench_find_ship_cages(field, fleet),
+         sum(len(cells) for cells in fleet)),
+        ('check_ship_full_destroyed',
+         lambda: bench_check_ship_full_destroyed(destroyed, fleet, halo),
+         len(fleet)),
+        ('mark_around_ship', lambda: bench_mark_around_ship(sunk, fleet),
+         len(fleet)),
+        ('game_over', lambda: game_over(sunk), 1),
+        ('Ai.make_move', lambda: bench_make_move(field_size), area),
+        ('DuelAi.choose_action', lambda: duel_ai.choose_action(duel, 0), 1),
+        ('headless_game',
+         lambda: play_headless_game(Ai(), Ai(), field_size,
+                                    seed=next(games), ships=ships), 1),
+    )
+
+
+def measure(function, repeat, min_time):
+    """
+    Лучшее из repeat время одного вызова; число вызовов в замере
+    подбирается так, чтобы замер длился не меньше min_time секунд
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return min(timer.repeat(repeat, number)) / number
+
+
+def run(field_sizes=FIELD_SIZES, densities=DENSITIES, repeat=3,
+        min_time=0.05, seed=0, only=None):
+    """
+    Время каждой функции на каждом размере поля и плотности флота.
+    Возвращает список словарей, готовый к записи в JSON.
+    """
+    results = []
+    for field_size in field_sizes:
+        for density in densities:
+            ships = fleet_for_density(field_size, density)
+            ship_cells = sum(size * count for size, count in ships.items())
+            for name, function, operations in cases(field_size, ships,
+                                                    seed):
+                if only and name not in only:
+                    continue
+                seconds = measure(function, repeat, min_time)
+                results.append({
+                    "case": name,
+                    "field_size": list(field_size),
+                    "density": density,
+                    "ship_cells": ship_cells,
+                    "us_per_call": seconds * 1e6,
+                    "ns_per_op": seconds * 1e9 / operations,
+                })
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results):
+    return {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def key(result):
+    return (result["case"], tuple(result["field_size"]), result["density"])
+
+
+def print_results(results, baseline=None):
+    before = {}
+    if baseline is not None:
+        before = {key(result): result for result in baseline["results"]}
+    print(f"{'функция':>26} {'поле':>7} {'плотность':>9} "
+          f"{'мкс/вызов':>12} {'нс/операция':>12}"
+          + (f" {'к базе':>7}" if before else ""))
+    for result in results:
+        size = "x".join(map(str, result["field_size"]))
+        line = (f"{result['case']:>26} {size:>7} {result['density']:9.2f} "
+                f"{result['us_per_call']:12.1f} {result['ns_per_op']:12.1f}")
+        old = before.get(key(result))
+        if old is not None:
+            line += f" {result['us_per_call'] / old['us_per_call']:7.2f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Время горячих функций игры по размерам поля "
+                    "и плотности флота")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[size for size, _ in FIELD_SIZES],
+                        help="стороны квадратных полей")
+    parser.add_argument("--densities", type=float, nargs="+",
+                        default=list(DENSITIES))
+    parser.add_argument("--cases", nargs="+", help="только эти функции")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-time", type=float, default=0.05)
+    parser.add_argument("--json", help="файл для результатов, '-' — stdout")
+    parser.add_argument("--compare",
+                        help="JSON прошлого запуска для сравнения")
+    args = parser.parse_args()
+
+    results = run([(size, size) for size in args.sizes], args.densities,
+                  args.repeat, args.min_time, only=args.cases)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+    data = report(results)
+    if args.json == "-":
+        json.dump(data, sys.stdout, ensure_ascii=False, indent=1)
+        print()
+        return
+    print_results(results, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import random
+import timeit
+
+from game.constans import EMPTY, SHIP, DAMAGED, MISSED
+from game.field import make_field, mark_around_ship
+from game.ship import ship_not_near, find_ship_cages
+from game.utils import random_place_fleet
+
+
+def legacy_ship_not_near(field, x, y, ship_size, position):
+    """
+    ship_not_near до перехода на таблицы соседей
+    """
+    field_size_y = len(field)
+    field_size_x = len(field[0])
+    ship_coords = []
+    if position == 'h':
+        if x + ship_size > field_size_x:
+            return False
+        for i in range(ship_size):
+            if field[y][x + i] != EMPTY:
+                return False
+            ship_coords.append((x + i, y))
+    else:
+        if y + ship_size > field_size_y:
+            return False
+        for i in range(ship_size):
+            if field[y + i][x] != EMPTY:
+                return False
+            ship_coords.append((x, y + i))
+
+    for ship_x, ship_y in ship_coords:
+        for dx in range(-1, 2):
+            for dy in range(-1, 2):
+                if dx == 0 and dy == 0:
+                    continue
+                check_x = ship_x + dx
+                check_y = ship_y + dy
+                if (0 <= check_x < field_size_x and
+                        0 <= check_y < field_size_y):
+                    if (check_x, check_y) not in ship_coords:
+                        if field[check_y][check_x] == SHIP:
+                            return False
+    return True
+
+
+def legacy_mark_around_ship(field, player_available_cells, ship_cells):
+    """
+    mark_around_ship до перехода на таблицы соседей
+    """
+    field_size_y = len(field)
+    field_size_x = len(field[0])
+    for x, y in ship_cells:
+        for i in range(-1, 2):
+            for j in range(-1, 2):
+                a = x + i
+                b = y + j
+                if 0 <= a < field_size_x and 0 <= b < field_size_y:
+                    if field[b][a] == EMPTY:
+                        field[b][a] = MISSED
+                        if (player_available_cells is not None and
+                                not (a == x and b == y)):
+                            player_available_cells.remove((a, b))
+
+
+def legacy_find_ship_cages(field, x, y):
+    """
+    find_ship_cages до перехода на таблицы соседей
+    """
+    field_size_y = len(field)
+    field_size_x = len(field[0])
+    steps = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    cages = []
+    stack = [(x, y)]
+    while stack:
+        a, b = stack.pop()
+        if (a, b) not in cages:
+            cages.append((a, b))
+            for i, j in steps:
+                c = a + i
+                d = b + j
+                if (0 <= c < field_size_x and
+                        0 <= d < field_size_y and ((c, d) not in cages)):
+                    if field[d][c] == DAMAGED or field[d][c] == SHIP:
+                        stack.append((c, d))
+    return cages
+
+
+def bench_ship_not_near(function, field):
+    for y in range(len(field)):
+        for x in range(len(field[0])):
+            function(field, x, y, 3, 'h')
+            function(field, x, y, 3, 'v')
+
+
+def bench_mark_around_ship(function, field, ships):
+    for cells in ships:
+        function(field, None, cells)
+
+
+def bench_find_ship_cages(function, field, ships):
+    for cells in ships:
+        for x, y in cells:
+            function(field, x, y)
+
+
+def time_case(bench, function, args, number):
+    """
+    Среднее время вызова bench(function, *args). Если args — функция,
+    она вне замера готовит новые аргументы перед каждым вызовом:
+    так поле, которое вызов меняет, в каждом повторе одно и то же.
+    """
+    if not callable(args):
+        return timeit.timeit(lambda: bench(function, *args),
+                             number=number) / number
+    current = []
+
+    def setup():
+        current[:] = args()
+
+    return sum(timeit.repeat(lambda: bench(function, *current), setup,
+                             number=1, repeat=number)) / number
+
+
+def run(field_sizes=((10, 10), (42, 42)), number=100):
+    results = []
+    for field_size in field_sizes:
+        random.seed(0)
+        field = make_field(field_size)
+        random_place_fleet(field)
+        ships = list(field.registry.ship_cells.values())
+        # Обычные списки без реестра: сравниваются именно обходы соседей
+        plain = [row[:] for row in field]
+        sunk = [[DAMAGED if cage == SHIP else cage for cage in row]
+                for row in plain]
+        cases = (
+            ('ship_not_near', bench_ship_not_near,
+             legacy_ship_not_near, ship_not_near, (plain,)),
+            ('mark_around_ship', bench_mark_around_ship,
+             legacy_mark_around_ship, mark_around_ship,
+             lambda: ([row[:] for row in sunk], ships)),
+            ('find_ship_cages', bench_find_ship_cages,
+             legacy_find_ship_cages, find_ship_cages, (plain, ships)),
+        )
+        for name, bench, before, after, args in cases:
+            before_time = time_case(bench, before, args, number)
+            after_time = time_case(bench, after, args, number)
+            results.append((field_size, name, before_time, after_time))
+    return results
+
+
+def main():
+    print(f"{'поле':>7} {'функция':>18} {'до, мкс':>10} "
+          f"{'после, мкс':>10} {'ускорение':>9}")
+    for field_size, name, before, after in run():
+        size = f"{field_size[0]}x{field_size[1]}"
+        print(f"{size:>7} {name:>18} {before * 1e6:10.1f} "
+              f"{after * 1e6:10.1f} {before / after:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import io
+import time
+
+from game.Ai import Ai
+from game.movelog import Replay, PLACE
+from game.simulation import play_headless_game
+
+
+def record_games(field_size, games, seed=0):
+    logs = []
+    for i in range(games):
+        stream = io.BytesIO()
+        play_headless_game(Ai(), Ai(), field_size, seed=seed + i,
+                           record=stream)
+        logs.append(stream.getvalue())
+    return logs
+
+
+def placement_length(replay):
+    """
+    Число событий расстановки флотов в начале журнала
+    """
+    for index, event in enumerate(replay.events):
+        if event[0] != PLACE:
+            return index
+    return len(replay.events)
+
+
+def best_time(logs, stops, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for log, stop in zip(logs, stops):
+            Replay(log).seek(stop)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def run(field_sizes=((10, 10), (42, 42)), games=200, repeat=3):
+    """
+    Скорость воспроизведения журналов: событий в секунду
+    с учетом разбора журнала и расстановки флотов,
+    и доля времени, уходящая на расстановку
+    """
+    results = []
+    for field_size in field_sizes:
+        logs = record_games(field_size, games)
+        replays = [Replay(log) for log in logs]
+        events = sum(len(replay) for replay in replays)
+        best = best_time(logs, [None] * games, repeat)
+        placing = best_time(logs, [placement_length(replay)
+                                   for replay in replays], repeat)
+        results.append((field_size, events / games, events / best,
+                        placing / best))
+    return results
+
+
+def main():
+    print(f"{'поле':>7} {'событий в партии':>17} {'событий/с':>12} "
+          f"{'расстановка':>12}")
+    for field_size, per_game, rate, placing in run():
+        size = f"{field_size[0]}x{field_size[1]}"
+        print(f"{size:>7} {per_game:17.0f} {rate:12,.0f} {placing:12.0%}")
+
+
+if __name__ == "__main__":
+    main()
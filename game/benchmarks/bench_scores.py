@@ -0,0 +1,60 @@
+import argparse
+import os
+import tempfile
+import time
+from multiprocessing import Process, Barrier
+
+from game.leaderboard import Leaderboard, ScoreSink
+
+
+def writer(path, barrier, index, records, batch_size):
+    barrier.wait()
+    with ScoreSink(path, batch_size=batch_size) as sink:
+        for i in range(records):
+            sink.add(f"bot:{index}", 20 + (index * records + i) % 80)
+
+
+def run(processes=16, records=5000, batch_size=500):
+    """
+    Одновременная запись результатов из processes процессов.
+    Возвращает число записей в секунду и проверяет, что все записи
+    попали в базу целиком.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "scores.db")
+        Leaderboard(path, legacy_path=None).close()
+        barrier = Barrier(processes + 1)
+        workers = [Process(target=writer,
+                           args=(path, barrier, index, records, batch_size))
+                   for index in range(processes)]
+        for worker in workers:
+            worker.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        duration = time.perf_counter() - start
+        with Leaderboard(path, legacy_path=None) as leaderboard:
+            stored = leaderboard.connection.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT name) FROM scores"
+            ).fetchone()
+    if stored != (processes * records, processes):
+        raise RuntimeError(f"в базе {stored}, ожидалось "
+                           f"{(processes * records, processes)}")
+    return processes * records / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест записи результатов")
+    parser.add_argument("--processes", type=int, default=16)
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    rate = run(args.processes, args.records, args.batch_size)
+    print(f"{args.processes} процессов, {args.records} записей каждый, "
+          f"пачка {args.batch_size}: {rate:,.0f} записей/с")
+
+
+if __name__ == "__main__":
+    main()
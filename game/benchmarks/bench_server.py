@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import resource
+import statistics
+import time
+from multiprocessing import Process, Event
+
+from game.constans import EMPTY, SHIP
+from game.server import LobbyServer
+
+
+def hold_idle_sessions(port, sessions, ready, stop):
+    """
+    Отдельный процесс с простаивающими подключениями,
+    чтобы клиентские сокеты не занимали дескрипторы сервера
+    """
+    async def run():
+        connections = []
+        for _ in range(sessions):
+            connections.append(await asyncio.open_connection("127.0.0.1",
+                                                             port))
+        ready.set()
+        while not stop.is_set():
+            await asyncio.sleep(0.1)
+        for reader, writer in connections:
+            writer.close()
+
+    asyncio.run(run())
+
+
+class TimedLobby(LobbyServer):
+    """
+    Лобби, замеряющее время обработки каждой команды
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timings = []
+
+    def dispatch(self, session, words):
+        start = time.perf_counter()
+        result = super().dispatch(session, words)
+        self.timings.append((words[0].upper(), time.perf_counter() - start))
+        return result
+
+
+async def read_until(reader, prefix):
+    while True:
+        line = (await reader.readline()).decode("utf-8")
+        if line.startswith(prefix):
+            return line
+
+
+async def play_turns(lobby, port, turns):
+    """
+    Одна партия, в которой игроки по очереди промахиваются однопалубными
+    кораблями. Возвращает время от отправки выстрела до объявления
+    следующего хода.
+    """
+    clients = [await asyncio.open_connection("127.0.0.1", port)
+               for _ in range(2)]
+    for reader, writer in clients:
+        await reader.readline()
+        writer.write(b"PLAY\n")
+    for reader, writer in clients:
+        await read_until(reader, "PLACE_MINES")
+    # Простаивающие подключения в очередь не встают, партия одна
+    match = next(iter(lobby.matches))
+    for index, (reader, writer) in enumerate(clients):
+        field = match.fields[1 - index]
+        cells = [f"{x} {y}" for y, row in enumerate(field)
+                 for x, cage in enumerate(row)
+                 if cage != SHIP][:5]
+        writer.write(f"MINES {' '.join(cells)}\n".encode())
+    for reader, writer in clients:
+        await read_until(reader, "TURN")
+
+    round_trips = []
+    for turn in range(turns):
+        index = match.current
+        own = match.fields[index]
+        enemy = match.fields[1 - index]
+        ship = next(cells[0] for cells in own.registry.ship_cells.values()
+                    if len(cells) == 1 and
+                    own[cells[0][1]][cells[0][0]] == SHIP)
+        target = next(((x, y) for y, row in enumerate(enemy)
+                       for x, cage in enumerate(row) if cage == EMPTY), None)
+        if target is None:
+            break
+        reader, writer = clients[index]
+        start = time.perf_counter()
+        writer.write(f"SHOT {ship[0]} {ship[1]} {target[0]} {target[1]}\n"
+                     .encode())
+        await read_until(reader, "TURN")
+        round_trips.append(time.perf_counter() - start)
+        for other_reader, _ in clients:
+            if other_reader is not reader:
+                await read_until(other_reader, "TURN")
+        if match.winner is not None:
+            break
+    for reader, writer in clients:
+        writer.close()
+    return round_trips
+
+
+async def run(sessions=2000, turns=40, field_size=(10, 10)):
+    lobby = TimedLobby(field_size)
+    port = await lobby.start()
+    ready, stop = Event(), Event()
+    holder = Process(target=hold_idle_sessions,
+                     args=(port, sessions, ready, stop))
+    holder.start()
+    while not ready.is_set() or len(lobby.sessions) < sessions:
+        await asyncio.sleep(0.05)
+    memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    round_trips = await play_turns(lobby, port, turns)
+    stop.set()
+    holder.join()
+    await lobby.close()
+    shots = [duration for command, duration in lobby.timings
+             if command == "SHOT"]
+    return sessions, memory, shots, round_trips
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Простаивающие подключения и задержка хода на сервере")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=40)
+    args = parser.parse_args()
+    sessions, memory, shots, round_trips = asyncio.run(
+        run(args.sessions, args.turns))
+    print(f"{sessions} простаивающих подключений, "
+          f"пик памяти сервера {memory / 1024:.0f} МБ")
+    print(f"обработка выстрела: медиана "
+          f"{statistics.median(shots) * 1e6:.0f} мкс, "
+          f"99% {percentile(shots, 0.99) * 1e6:.0f} мкс")
+    print(f"выстрел до объявления хода через loopback: медиана "
+          f"{statistics.median(round_trips) * 1e6:.0f} мкс, "
+          f"99% {percentile(round_trips, 0.99) * 1e6:.0f} мкс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+from game.constans import EMPTY, SHIP, DAMAGED, MISSED
+from game.registry import ShipRegistry
+
+
+class BitRow:
+    """
+    Строка битового поля, ведущая себя как список клеток
+    """
+    def __init__(self, field, y):
+        self.field = field
+        self.y = y
+
+    def __len__(self):
+        return self.field.width
+
+    def __getitem__(self, x):
+        return self.field.get(x, self.y)
+
+    def __setitem__(self, x, value):
+        self.field.set(x, self.y, value)
+
+    def __iter__(self):
+        for x in range(self.field.width):
+            yield self.field.get(x, self.y)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+
+class BitField:
+    """
+    Игровое поле, в котором каждый слой (корабли, подбитые клетки,
+    промахи) хранится одним целым числом: бит y * width + x.
+    Поддерживает обращение field[y][x], поэтому работает со всеми
+    функциями, написанными для поля из списков.
+    """
+    def __init__(self, field_size):
+        self.width, self.height = field_size
+        self.ships = 0
+        self.damaged = 0
+        self.missed = 0
+        self.registry = ShipRegistry()
+        self.full = (1 << (self.width * self.height)) - 1
+        first_column = 0
+        last_column = 0
+        for y in range(self.height):
+            first_column |= 1 << (y * self.width)
+            last_column |= 1 << (y * self.width + self.width - 1)
+        self.not_first_column = self.full & ~first_column
+        self.not_last_column = self.full & ~last_column
+        self._vertical = {}
+        self._rows = [BitRow(self, y) for y in range(self.height)]
+
+    @classmethod
+    def from_list(cls, field):
+        bit_field = cls((len(field[0]), len(field)))
+        for y, row in enumerate(field):
+            for x, cage in enumerate(row):
+                if cage != EMPTY:
+                    bit_field.set(x, y, cage)
+        bit_field.registry.rebuild(bit_field)
+        return bit_field
+
+    def to_list(self):
+        return [list(row) for row in self._rows]
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        return self._rows[y]
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __eq__(self, other):
+        if isinstance(other, BitField):
+            other = other.to_list()
+        return self.to_list() == other
+
+    __hash__ = None
+
+    def bit(self, x, y):
+        return 1 << (y * self.width + x)
+
+    def get(self, x, y):
+        bit = self.bit(x, y)
+        if self.ships & bit:
+            return SHIP
+        if self.damaged & bit:
+            return DAMAGED
+        if self.missed & bit:
+            return MISSED
+        return EMPTY
+
+    def set(self, x, y, value):
+        bit = self.bit(x, y)
+        keep = ~bit
+        self.ships &= keep
+        self.damaged &= keep
+        self.missed &= keep
+        if value == SHIP:
+            self.ships |= bit
+        elif value == DAMAGED:
+            self.damaged |= bit
+        elif value == MISSED:
+            self.missed |= bit
+
+    def clear(self):
+        self.ships = 0
+        self.damaged = 0
+        self.missed = 0
+        self.registry.clear()
+
+    def occupied(self):
+        return self.ships | self.damaged | self.missed
+
+    def ship_mask(self, x, y, ship_size, position):
+        """
+        Маска клеток корабля или None, если он выходит за границы поля
+        """
+        if position == 'h':
+            if x + ship_size > self.width:
+                return None
+            return ((1 << ship_size) - 1) << (y * self.width + x)
+        if y + ship_size > self.height:
+            return None
+        pattern = self._vertical.get(ship_size)
+        if pattern is None:
+            pattern = 0
+            for i in range(ship_size):
+                pattern |= 1 << (i * self.width)
+            self._vertical[ship_size] = pattern
+        return pattern << (y * self.width + x)
+
+    def cells_mask(self, cells):
+        mask = 0
+        for x, y in cells:
+            mask |= self.bit(x, y)
+        return mask
+
+    def cells(self, mask):
+        """
+        Координаты всех установленных битов маски
+        """
+        while mask:
+            low = mask & -mask
+            index = low.bit_length() - 1
+            yield index % self.width, index // self.width
+            mask ^= low
+
+    def dilate(self, mask):
+        """
+        Маска вместе со всеми соседними клетками (8-связность)
+        """
+        row = (mask | ((mask << 1) & self.not_first_column) |
+               ((mask >> 1) & self.not_last_column))
+        return (row | (row << self.width) | (row >> self.width)) & self.full
+
+    def ship_not_near(self, x, y, ship_size, position):
+        mask = self.ship_mask(x, y, ship_size, position)
+        if mask is None or mask & self.occupied():
+            return False
+        return not (self.dilate(mask) & self.ships)
+
+    def has_ships(self):
+        return self.ships != 0
+
+    def mark_around(self, mask):
+        """
+        Отмечает промахами пустые клетки вокруг маски.
+        Возвращает маску отмеченных клеток.
+        """
+        halo = self.dilate(mask) & ~self.occupied()
+        self.missed |= halo
+        return halo
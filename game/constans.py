@@ -1,4 +1,5 @@
 FIELDSIZE_DEFAULT = (10, 10)
+FIELDSIZE_MAX = 42
 EMPTY = ' '
 SHIP = '■'
 DAMAGED = '#'
@@ -7,3 +8,4 @@ LINE = '─'
 STICK = '│'
 CROSSING = '┼'
 SHIPS = {1: 4, 2: 3, 3: 2, 4: 1}
+MINES_COUNT = 5
@@ -0,0 +1,263 @@
+from collections import namedtuple
+
+from game.constans import EMPTY, SHIP, DAMAGED, MINES_COUNT
+from game.errors import MoveError
+from game.field import mark_around_ship, destroyed_ship_cells
+from game.instrument import STATS_ENABLED, observe
+from game.mines import Mines
+from game.movelog import (MODE_CLASSIC, MODE_DUEL, SHOT, MINE_PLACE,
+                          SURRENDER)
+from game.neighbours import STEPS_4
+from game.player_move import (is_hit_classic, salvo_ship_cells, salvo_cells,
+                              resolve_salvo)
+from game.utils import game_over, shift_ship, check_mins
+
+
+# Состояние партии. fields[i] — поле игрока i, mins[i] — мины,
+# поставленные соперником на поле игрока i. current — чей ход
+# (None, пока в режиме 1 на 1 расставляются мины), winner — победитель.
+GameState = namedtuple('GameState', ['mode', 'fields', 'mins', 'current',
+                                     'moved_ship', 'winner'])
+
+# Действия; player — номер игрока, который его совершает
+Shoot = namedtuple('Shoot', ['player', 'x', 'y'])
+Salvo = namedtuple('Salvo', ['player', 'ship_x', 'ship_y', 'x', 'y'])
+MoveShip = namedtuple('MoveShip', ['player', 'ship_x', 'ship_y', 'dx', 'dy'])
+PlaceMine = namedtuple('PlaceMine', ['player', 'x', 'y'])
+Surrender = namedtuple('Surrender', ['player'])
+
+# События; player — игрок, совершивший действие,
+# кроме MineExploded, где это владелец подорвавшегося корабля
+Missed = namedtuple('Missed', ['player', 'x', 'y'])
+Hit = namedtuple('Hit', ['player', 'x', 'y'])
+Sunk = namedtuple('Sunk', ['player', 'cells', 'halo'])
+SalvoFired = namedtuple('SalvoFired', ['player', 'ship_size', 'cells'])
+ShipMoved = namedtuple('ShipMoved', ['player', 'cells'])
+MinePlaced = namedtuple('MinePlaced', ['player', 'x', 'y'])
+MineExploded = namedtuple('MineExploded', ['player', 'x', 'y'])
+TurnPassed = namedtuple('TurnPassed', ['player'])
+GameOver = namedtuple('GameOver', ['winner'])
+
+
+def classic_state(player_field, bot_field, current=0):
+    """
+    Партия против бота: игрок 0 — человек, игрок 1 — бот
+    """
+    return GameState(MODE_CLASSIC, (player_field, bot_field), ((), ()),
+                     current, False, None)
+
+
+def duel_state(first_field, second_field):
+    """
+    Партия 1 на 1 до расстановки мин
+    """
+    return GameState(MODE_DUEL, (first_field, second_field),
+                     (Mines(), Mines()), None, False, None)
+
+
+def apply(state, action, log=None):
+    """
+    Переход партии: проверяет действие и возвращает список событий
+    и новое состояние. Недопустимое действие бросает MoveError
+    с кодом причины и ничего не меняет.
+    Поля и мины меняются на месте: копия двух полей на каждый ход
+    стоила бы дороже самого хода, поэтому после apply
+    пользоваться нужно только новым состоянием.
+    Если передан журнал партии, действие записывается в него.
+    """
+    if state.winner is not None:
+        raise MoveError("Партия окончена", 'game_over')
+    if action.player not in (0, 1):
+        raise MoveError("Нет такого игрока", 'bad_input')
+    handler = RULES[state.mode].get(type(action))
+    if handler is None:
+        raise MoveError("Это действие недоступно в этом режиме",
+                        'wrong_action')
+    return handler(state, action, log)
+
+
+def place_mines(state, player, cells, log=None):
+    """
+    Все мины игрока одним действием: либо ставятся все,
+    либо ни одной, если хотя бы одна клетка не подходит
+    """
+    if state.winner is not None:
+        raise MoveError("Партия окончена", 'game_over')
+    if state.mode != MODE_DUEL:
+        raise MoveError("Это действие недоступно в этом режиме",
+                        'wrong_action')
+    if state.mins[1 - player]:
+        raise MoveError("Мины уже расставлены", 'mines_placed')
+    if len(set(cells)) != MINES_COUNT:
+        raise MoveError(f"Нужно {MINES_COUNT} разных клеток", 'mine_taken')
+    for x, y in cells:
+        check_cell(state.fields[1 - player], x, y)
+    events = []
+    for x, y in cells:
+        new_events, state = place_mine(state, PlaceMine(player, x, y), log)
+        events.extend(new_events)
+    return events, state
+
+
+def check_turn(state, player):
+    if state.current is None:
+        raise MoveError("Партия еще не началась", 'not_started')
+    if state.current != player:
+        raise MoveError("Сейчас ход соперника", 'not_your_turn')
+
+
+def check_cell(field, x, y):
+    if not (0 <= x < len(field[0]) and 0 <= y < len(field)):
+        raise MoveError("Введите 2 числа в пределах поля", 'out_of_field')
+
+
+def sink(field, x, y):
+    """
+    Клетки корабля в клетке (x, y) и отмеченный вокруг него ореол,
+    если корабль уничтожен; иначе None
+    """
+    cells = destroyed_ship_cells(field, x, y)
+    if cells is None:
+        return None
+    return cells, sorted(mark_around_ship(field, None, cells))
+
+
+def sink_ships(state, player, hits, events):
+    """
+    События уничтожения кораблей соперника после попаданий hits
+    и конец партии, если флот соперника уничтожен
+    """
+    field = state.fields[1 - player]
+    sunk = False
+    seen = set()
+    for x, y in hits:
+        result = sink(field, x, y)
+        if result is None or result[0][0] in seen:
+            continue
+        seen.add(result[0][0])
+        sunk = True
+        events.append(Sunk(player, *result))
+    if sunk and game_over(field):
+        events.append(GameOver(player))
+        return state._replace(winner=player)
+    return state
+
+
+def detonate(state, events, log, index, cells=None):
+    """
+    Подрыв корабля игрока index, вставшего на мину в одной из клеток
+    cells (или на любую мину, если клетки не переданы).
+    Игрок без кораблей проигрывает.
+    """
+    mins = state.mins[index]
+    if STATS_ENABLED:
+        observe("engine.mine_cells_checked",
+                len(mins if cells is None else cells))
+    field = state.fields[index]
+    exploded = check_mins(field, mins, log, cells)
+    events.extend(MineExploded(index, x, y) for x, y in exploded)
+    if exploded and state.winner is None and game_over(field):
+        events.append(GameOver(1 - index))
+        state = state._replace(winner=1 - index)
+    return state
+
+
+def shoot(state, action, log):
+    player, x, y = action
+    check_turn(state, player)
+    field = state.fields[1 - player]
+    check_cell(field, x, y)
+    if field[y][x] != EMPTY and field[y][x] != SHIP:
+        raise MoveError("Клетка уже в игре. Попробуйте еще раз.",
+                        'cell_used')
+    if log is not None:
+        log.record(SHOT, field, x, y)
+    if not is_hit_classic(x, y, field):
+        return ([Missed(player, x, y), TurnPassed(1 - player)],
+                state._replace(current=1 - player))
+    events = [Hit(player, x, y)]
+    return events, sink_ships(state, player, [(x, y)], events)
+
+
+def salvo(state, action, log):
+    player, ship_x, ship_y, x, y = action
+    check_turn(state, player)
+    ship_cells = salvo_ship_cells(state.fields[player], ship_x, ship_y)
+    field = state.fields[1 - player]
+    check_cell(field, x, y)
+    if field[y][x] == DAMAGED:
+        raise MoveError("Клетка уже в игре. Попробуйте еще раз.",
+                        'cell_used')
+
+    hit_cells = salvo_cells(field, x, y, len(ship_cells))
+    if log is not None:
+        log.record_salvo(field, ship_x, ship_y, hit_cells)
+    result = resolve_salvo(field, hit_cells)
+    events = [SalvoFired(player, len(ship_cells), hit_cells)]
+    events.extend(Hit(player, a, b) for a, b in result.hits)
+    events.extend(Sunk(player, *ship) for ship in result.sunk)
+    if result.sunk and game_over(field):
+        events.append(GameOver(player))
+        state = state._replace(winner=player)
+    if not result.hits:
+        events.append(TurnPassed(1 - player))
+        state = state._replace(current=1 - player, moved_ship=False)
+    return events, state
+
+
+def move_ship(state, action, log):
+    player, ship_x, ship_y, dx, dy = action
+    check_turn(state, player)
+    if state.moved_ship:
+        raise MoveError("Корабль уже перемещали на этом ходу",
+                        'already_moved')
+    if (dx, dy) not in STEPS_4:
+        raise MoveError("Корабль сдвигается на одну клетку по прямой",
+                        'bad_input')
+    cells = shift_ship(state.fields[player], ship_x, ship_y, dx, dy, log)
+    events = [ShipMoved(player, cells)]
+    return events, detonate(state._replace(moved_ship=True), events, log,
+                            player, cells)
+
+
+def place_mine(state, action, log):
+    player, x, y = action
+    mins = state.mins[1 - player]
+    if state.current is not None or len(mins) == MINES_COUNT:
+        raise MoveError("Мины уже расставлены", 'mines_placed')
+    field = state.fields[1 - player]
+    check_cell(field, x, y)
+    if (x, y) in mins:
+        raise MoveError("Мина уже в игре. Попробуйте еще раз.",
+                        'mine_taken')
+    mins.append((x, y))
+    if log is not None:
+        log.record(MINE_PLACE, field, x, y)
+    events = [MinePlaced(player, x, y)]
+    if all(len(cells) == MINES_COUNT for cells in state.mins):
+        events.append(TurnPassed(0))
+        state = state._replace(current=0)
+        for index in (0, 1):
+            state = detonate(state, events, log, index)
+    return events, state
+
+
+def surrender(state, action, log):
+    player = action.player
+    if log is not None:
+        log.record(SURRENDER, state.fields[player])
+    return [GameOver(1 - player)], state._replace(winner=1 - player)
+
+
+RULES = {
+    MODE_CLASSIC: {
+        Shoot: shoot,
+        Surrender: surrender,
+    },
+    MODE_DUEL: {
+        Salvo: salvo,
+        MoveShip: move_ship,
+        PlaceMine: place_mine,
+        Surrender: surrender,
+    },
+}
@@ -0,0 +1,11 @@
+class MoveError(ValueError):
+    """
+    Недопустимый ход; текст ошибки показывается игроку,
+    а код причины нужен клиентам, которым текст не подходит:
+    out_of_field, cell_used, no_ship, ship_sunk, ship_damaged, blocked,
+    already_moved, not_your_turn, not_started, game_over, mines_placed,
+    mine_taken, wrong_action, bad_input
+    """
+    def __init__(self, message, code='bad_input'):
+        super().__init__(message)
+        self.code = code
@@ -0,0 +1,279 @@
+import json
+import os
+import tempfile
+from functools import lru_cache
+
+from game.constans import SHIPS, FIELDSIZE_MAX
+from game.instrument import STATS_ENABLED, observe, instrument_module
+
+CACHE_PATH = "fleet_fit.json"
+
+# Путь к файлу кэша -> словарь "ШxВ:размер=число,..." -> расстановка
+_caches = {}
+
+
+def fleet_key(width, height, fleet):
+    return f"{width}x{height}:" + ",".join(f"{size}={number}"
+                                           for size, number in fleet)
+
+
+@lru_cache(maxsize=64)
+def shapes(width, height, size):
+    """
+    Маски положений корабля на расширенном поле (width + 1) x (height + 1)
+    с левым верхним углом в каждой клетке: корабль вместе с клетками
+    справа и снизу от него. Корабли не касаются друг друга даже углами
+    ровно тогда, когда такие прямоугольники не пересекаются.
+    """
+    stride = width + 1
+    rows = height + 1
+    forms = [(size + 1, 2, 'h')]
+    if size > 1:
+        forms.append((2, size + 1, 'v'))
+    result = {}
+    for form_width, form_height, position in forms:
+        base = 0
+        line = (1 << form_width) - 1
+        for row in range(form_height):
+            base |= line << (row * stride)
+        for y in range(rows - form_height + 1):
+            for x in range(stride - form_width + 1):
+                cell = y * stride + x
+                result.setdefault(cell, []).append((base << cell, position))
+    return result
+
+
+def lanes_fit(stride, rows, fleet):
+    """
+    Необходимое условие на расширенном поле stride x rows: каждый
+    прямоугольник корабля не меньше двух клеток в высоту и в ширину,
+    поэтому столбец пересекают не больше rows // 2 кораблей, а строку —
+    не больше stride // 2. Отсюда суммы ширин и высот ограничены,
+    а сумма ширины и высоты корабля не зависит от его направления.
+    """
+    total = 0
+    widths = {0}
+    for size, number in fleet:
+        total += (size + 3) * number
+        forms = {form_width
+                 for form_width, form_height in ((size + 1, 2),
+                                                 (2, size + 1))
+                 if form_width <= stride and form_height <= rows}
+        if not forms:
+            return False
+        for _ in range(number):
+            widths = {width + form for width in widths for form in forms}
+    low = total - rows * (stride // 2)
+    high = stride * (rows // 2)
+    return any(low <= width <= high for width in widths)
+
+
+def parity_fit(stride, rows, fleet, slack):
+    """
+    Необходимое условие четности. Пустых клеток на расширенном поле
+    ровно slack. Если высота поля rows нечетна, столбец без пустых
+    клеток должен пересекать прямоугольник нечетной высоты — корабль
+    четной длины, стоящий вертикально, а он пересекает два столбца.
+    Так же для строк и горизонтальных кораблей четной длины.
+    """
+    need_v = (stride - slack + 1) // 2 if rows % 2 else 0
+    need_h = (rows - slack + 1) // 2 if stride % 2 else 0
+    only_v = only_h = both = 0
+    for size, number in fleet:
+        if size % 2:
+            continue
+        vertical = size + 1 <= rows
+        horizontal = size + 1 <= stride
+        if vertical and horizontal:
+            both += number
+        elif vertical:
+            only_v += number
+        elif horizontal:
+            only_h += number
+    return (max(0, need_v - only_v) + max(0, need_h - only_h)) <= both
+
+
+def solve(width, height, fleet):
+    """
+    Точная проверка, помещается ли флот на поле width x height.
+    Перебор с возвратом по первой свободной клетке расширенного поля:
+    в нее ставится левый верхний угол корабля каждого оставшегося
+    размера (одинаковые корабли не различаются) или она остается пустой,
+    пока пустых клеток не больше запаса площади. Неудачные состояния
+    запоминаются вместе с запасом, с которым они не решились.
+    Возвращает расстановку [(x, y, размер, направление), ...] или None.
+    """
+    stride = width + 1
+    rows = height + 1
+    sizes = [size for size, _ in fleet]
+    if max(sizes, default=0) > max(width, height):
+        return None
+    slack = stride * rows - sum((size + 1) * 2 * number
+                                for size, number in fleet)
+    if (slack < 0 or not lanes_fit(stride, rows, fleet) or
+            not parity_fit(stride, rows, fleet, slack)):
+        return None
+    tables = [shapes(width, height, size) for size in sizes]
+    failed = {}
+    states = 0
+
+    def search(mask, counts, slack):
+        nonlocal states
+        visited = []
+        while True:
+            states += 1
+            largest = next((sizes[i] for i in reversed(range(len(counts)))
+                            if counts[i]), None)
+            if largest is None:
+                return []
+            free = ~mask & (mask + 1)
+            cell = free.bit_length() - 1
+            if largest + 1 > stride and cell // stride + largest + 1 > rows:
+                break
+            state = (mask, counts)
+            if failed.get(state, -1) >= slack:
+                break
+            visited.append((state, slack))
+            for i in reversed(range(len(counts))):
+                if not counts[i]:
+                    continue
+                rest = counts[:i] + (counts[i] - 1,) + counts[i + 1:]
+                for shape, position in tables[i].get(cell, ()):
+                    if mask & shape:
+                        continue
+                    layout = search(mask | shape, rest, slack)
+                    if layout is not None:
+                        layout.append((cell % stride, cell // stride,
+                                       sizes[i], position))
+                        return layout
+            if not slack:
+                break
+            mask |= free
+            slack -= 1
+        for state, state_slack in visited:
+            failed[state] = max(failed.get(state, -1), state_slack)
+        return None
+
+    # Клетки за краем расширенного поля заняты: маска поля
+    # дополняется единицами до бесконечности через отрицательное число
+    outside = -1 << (stride * rows)
+    layout = search(outside, tuple(number for _, number in fleet), slack)
+    if STATS_ENABLED:
+        observe("fleet_fit.states", states)
+    if layout is not None:
+        layout.reverse()
+    return layout
+
+
+def layout_valid(width, height, fleet, layout):
+    """
+    Проверка расстановки из кэша: в ней ровно корабли флота fleet,
+    все они в пределах поля width x height и не касаются друг друга
+    даже углами. Файл кэша мог быть испорчен или изменен вручную.
+    """
+    if not isinstance(layout, list):
+        return False
+    counts = {}
+    owner = {}
+    for index, placement in enumerate(layout):
+        if not (isinstance(placement, (list, tuple)) and
+                len(placement) == 4):
+            return False
+        x, y, size, position = placement
+        if (not all(type(value) is int for value in (x, y, size)) or
+                position not in ('h', 'v') or size < 1):
+            return False
+        dx, dy = (1, 0) if position == 'h' else (0, 1)
+        if not (0 <= x and x + dx * (size - 1) < width and
+                0 <= y and y + dy * (size - 1) < height):
+            return False
+        counts[size] = counts.get(size, 0) + 1
+        for i in range(size):
+            owner[(x + dx * i, y + dy * i)] = index
+    if tuple(sorted(counts.items())) != fleet:
+        return False
+    if len(owner) != sum(size * number for size, number in fleet):
+        return False
+    return all(owner.get((x + dx, y + dy), index) == index
+               for (x, y), index in owner.items()
+               for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+
+
+def load_cache(path):
+    if path not in _caches:
+        try:
+            with open(path, encoding="utf-8") as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            cache = {}
+        _caches[path] = cache if isinstance(cache, dict) else {}
+    return _caches[path]
+
+
+def save_cache(path, cache):
+    """
+    Запись кэша через свой временный файл у каждого писателя, поэтому
+    одновременные записи из разных процессов не смешиваются, а файл
+    кэша заменяется целиком. Кэш необязателен, так что ошибка записи
+    не мешает игре.
+    """
+    try:
+        handle, temporary = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)),
+            prefix=os.path.basename(path) + ".", suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8") as file:
+            json.dump(cache, file)
+        os.replace(temporary, path)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+
+
+def fleet_layout(field_size, ships=SHIPS, path=None):
+    """
+    Расстановка флота ships на поле field_size, подтверждающая,
+    что флот помещается, или None, если это невозможно.
+    Ответы хранятся в файле кэша, поэтому повторные вопросы
+    (в том числе из прошлых запусков) отвечаются без перебора;
+    расстановка из кэша проверяется и при ошибке решается заново.
+    Поле и его транспонированная копия считаются одним вопросом;
+    перебор идет вдоль длинной стороны, так что граница между
+    заполненной и свободной частью поля остается короткой.
+    У поля больше FIELDSIZE_MAX по стороне решается угловой кусок
+    не больше FIELDSIZE_MAX x FIELDSIZE_MAX: расстановка на нем годится
+    и для всего поля, а флот, которому он мал, считается
+    не помещающимся — перебор по такому полю не закончился бы.
+    """
+    if path is None:
+        path = CACHE_PATH
+    width, height = (min(side, FIELDSIZE_MAX) for side in field_size)
+    fleet = tuple(sorted((size, number) for size, number in ships.items()
+                         if number))
+    transposed = width > height
+    if transposed:
+        width, height = height, width
+    key = fleet_key(width, height, fleet)
+    cache = load_cache(path)
+    layout = cache.get(key)
+    if key not in cache or (layout is not None and
+                            not layout_valid(width, height, fleet, layout)):
+        layout = cache[key] = solve(width, height, fleet)
+        save_cache(path, cache)
+    if layout is None:
+        return None
+    if transposed:
+        return [(y, x, size, 'h' if size == 1 or position == 'v' else 'v')
+                for x, y, size, position in layout]
+    return [tuple(placement) for placement in layout]
+
+
+def fleet_fits(field_size, ships=SHIPS, path=None):
+    return fleet_layout(field_size, ships, path) is not None
+
+
+instrument_module(globals())
@@ -1,12 +1,46 @@
+import shutil
+import sys
+from functools import lru_cache
+from itertools import zip_longest
+
+from game.bitboard import BitField
 from game.constans import EMPTY, SHIP, LINE, STICK, CROSSING, MISSED, DAMAGED
+from game.instrument import instrument_module
+from game.neighbours import neighbour_tables
+from game.registry import ShipRegistry
 from game.ship import find_ship_cages
+from game.sparse import SparseField, SPARSE_AREA
+
+
+class Field(list):
+    """
+    Игровое поле: список строк клеток и реестр кораблей на нем
+    """
+    def __init__(self, rows=()):
+        super().__init__(rows)
+        self.registry = ShipRegistry()
+        # Множество изменившихся клеток, пока за полем следит
+        # терминальный режим отрисовки; иначе None
+        self.changes = None
+
+
+def note_changes(field, cells):
+    """
+    Запоминает изменившиеся клетки поля, если их кто-то отслеживает
+    """
+    changes = getattr(field, 'changes', None)
+    if changes is not None:
+        changes.update(cells)
 
 
 def make_field(field_size):
     """
-    Инициализация игрового поля
+    Инициализация игрового поля. Очень большие поля
+    создаются разреженными.
     """
-    field = []
+    if field_size[0] * field_size[1] > SPARSE_AREA:
+        return SparseField(field_size)
+    field = Field()
     for i in range(field_size[1]):
         row = []
         for j in range(field_size[0]):
@@ -15,61 +49,176 @@ def make_field(field_size):
     return field
 
 
-def print_field(field, hide_ships, mins=None):
+CELL_TEXT = {cage: f"{EMPTY + cage + EMPTY}{STICK}"
+             for cage in (EMPTY, SHIP, DAMAGED, MISSED)}
+HIDDEN_CELL_TEXT = dict(CELL_TEXT, **{SHIP: f"{EMPTY * 3}{STICK}"})
+MINE_TEXT = f"{EMPTY + 'M' + EMPTY}{STICK}"
+# Сторона окна, которым показывается разреженное поле
+VIEWPORT_SIZE = 20
+
+
+@lru_cache(maxsize=8)
+def grid_chrome(field_size_x):
     """
-    Отрисовка игрового поля в консоли
+    Строка с номерами столбцов и разделительная линия
+    для поля заданной ширины
     """
-    field_size_y = len(field)
-    field_size_x = len(field[0])
+    column_nums_str = " " * 3 + "".join(f" {i:{2}d} "
+                                        for i in range(field_size_x))
+    separator = " " * 2 + " " + CROSSING + (LINE * 3 + CROSSING) * field_size_x
+    return column_nums_str, separator
 
-    column_nums_str = " " * 3
-    for i in range(field_size_x):
-        column_nums_str += f" {i:{2}d} "
-    print(column_nums_str)
-    print(" " * 2 + " " + CROSSING + (LINE * 3 + CROSSING) * field_size_x)
-    for i in range(field_size_y):
-        row_num = f"{i:{2}d}"
-        row = f"{row_num} {STICK}"
-        for j in range(field_size_x):
-            cage = field[i][j]
-            if (hide_ships and mins is not None and
-                    (j, i) in mins and cage != MISSED and cage != DAMAGED):
-                row += f"{EMPTY + 'M' + EMPTY}{STICK}"
-            elif hide_ships and cage == SHIP:
-                row += f"{EMPTY * 3}{STICK}"
+
+def render_field(field, hide_ships, mins=None):
+    """
+    Строки изображения игрового поля. Разреженное поле целиком
+    не рисуется: показывается окно вокруг клетки, менявшейся последней.
+    """
+    if isinstance(field, SparseField):
+        x, y = field.last
+        left = max(min(x - VIEWPORT_SIZE // 2, field.width - VIEWPORT_SIZE), 0)
+        top = max(min(y - VIEWPORT_SIZE // 2, field.height - VIEWPORT_SIZE),
+                  0)
+        return render_viewport(field, hide_ships, left, top,
+                               VIEWPORT_SIZE, VIEWPORT_SIZE, mins)
+    column_nums_str, separator = grid_chrome(len(field[0]))
+    cell_text = HIDDEN_CELL_TEXT if hide_ships else CELL_TEXT
+    if not hide_ships or not mins:
+        mins = None
+    else:
+        mins = set(mins)
+    lines = [column_nums_str, separator]
+    for i, row in enumerate(field):
+        if mins is None:
+            cells = [cell_text[cage] for cage in row]
+        else:
+            cells = [MINE_TEXT if ((j, i) in mins and cage != MISSED and
+                                   cage != DAMAGED) else cell_text[cage]
+                     for j, cage in enumerate(row)]
+        lines.append(f"{i:{2}d} {STICK}" + "".join(cells))
+        lines.append(separator)
+    return lines
+
+
+def render_viewport(field, hide_ships, left, top, width, height,
+                    mins=None):
+    """
+    Строки изображения прямоугольного окна поля, для полей, которые
+    целиком на экран не помещаются. Над окном — его границы,
+    номера столбцов показаны по модулю 100.
+    """
+    right = min(left + width, len(field[0]))
+    bottom = min(top + height, len(field))
+    cell_text = HIDDEN_CELL_TEXT if hide_ships else CELL_TEXT
+    mins = set(mins) if hide_ships and mins else ()
+    label = max(2, len(str(bottom - 1)))
+    separator = (" " * (label + 1) + CROSSING +
+                 (LINE * 3 + CROSSING) * (right - left))
+    lines = [f"x {left}..{right - 1}, y {top}..{bottom - 1}",
+             " " * (label + 1) + "".join(f" {x % 100:2d} "
+                                         for x in range(left, right)),
+             separator]
+    for y in range(top, bottom):
+        row = field[y]
+        cells = []
+        for x in range(left, right):
+            cage = row[x]
+            if (x, y) in mins and cage != MISSED and cage != DAMAGED:
+                cells.append(MINE_TEXT)
             else:
-                row += f"{EMPTY + cage + EMPTY}{STICK}"
-        print(row)
-        print(" " * 2 + " " + CROSSING + (LINE * 3 + CROSSING) * field_size_x)
+                cells.append(cell_text[cage])
+        lines.append(f"{y:{label}d} {STICK}" + "".join(cells))
+        lines.append(separator)
+    return lines
+
+
+def print_field(field, hide_ships, mins=None):
+    """
+    Отрисовка игрового поля в консоли одной записью
+    """
+    sys.stdout.write("\n".join(render_field(field, hide_ships, mins)) + "\n")
+
+
+def print_fields(player_field, enemy_field, player_title, enemy_title,
+                 player_mins=None, enemy_mins=None):
+    """
+    Отрисовка своего и чужого поля одним кадром: рядом,
+    если хватает ширины терминала, иначе одно под другим
+    """
+    left = [player_title] + render_field(player_field, False, player_mins)
+    right = [enemy_title] + render_field(enemy_field, True, enemy_mins)
+    width = max(len(line) for line in left)
+    gap = " " * 4
+    columns = shutil.get_terminal_size().columns
+    if width + len(gap) + max(len(line) for line in right) <= columns:
+        lines = [line.ljust(width) + gap + other
+                 for line, other in zip_longest(left, right, fillvalue="")]
+    else:
+        lines = left + [""] + right
+    sys.stdout.write("\n" + "\n".join(lines) + "\n")
 
 
 def mark_around_ship(field, player_available_cells, ship_cells):
     """
-    Функция отмечает клетки вокруг уничтоженного корабля
+    Функция отмечает клетки вокруг уничтоженного корабля.
+    Возвращает отмеченные клетки.
     """
+    if isinstance(field, BitField):
+        marked = list(field.cells(
+            field.mark_around(field.cells_mask(ship_cells))))
+    elif isinstance(field, SparseField):
+        marked = field.mark_around(ship_cells)
+    else:
+        marked = None
+    if marked is not None:
+        if player_available_cells is not None:
+            for cell in marked:
+                player_available_cells.remove(cell)
+        note_changes(field, marked)
+        return marked
+
     field_size_y = len(field)
     field_size_x = len(field[0])
 
+    near = neighbour_tables(field_size_x, field_size_y)[1]
+    marked = []
     for x, y in ship_cells:
-        for i in range(-1, 2):
-            for j in range(-1, 2):
-                a = x + i
-                b = y + j
-                if 0 <= a < field_size_x and 0 <= b < field_size_y:
-                    if field[b][a] == EMPTY:
-                        field[b][a] = MISSED
-                        if (player_available_cells is not None and
-                                not (a == x and b == y)):
-                            player_available_cells.remove((a, b))
+        if field[y][x] == EMPTY:
+            field[y][x] = MISSED
+            marked.append((x, y))
+        for a, b in near[y][x]:
+            if field[b][a] == EMPTY:
+                field[b][a] = MISSED
+                marked.append((a, b))
+                if player_available_cells is not None:
+                    player_available_cells.remove((a, b))
+    note_changes(field, marked)
+    return marked
+
+
+def destroyed_ship_cells(field, x, y):
+    """
+    Клетки корабля в клетке (x, y), если он уничтожен полностью, иначе None
+    """
+    registry = getattr(field, 'registry', None)
+    ship_id = registry.find(x, y) if registry is not None else None
+    if ship_id is not None:
+        return registry.cells(ship_id) if registry.is_sunk(ship_id) else None
+    cages = find_ship_cages(field, x, y)
+    if not all(field[j][i] == DAMAGED for i, j in cages):
+        return None
+    return cages
 
 
 def check_ship_full_destroyed(field, x, y, player_available_cells=None):
     """
     Проверка уничтожен ли корабль полностью
     """
-    cages = find_ship_cages(field, x, y)
-    if all(field[j][i] == DAMAGED for i, j in cages):
-        mark_around_ship(field, player_available_cells, cages)
-        return True
-    else:
+    cages = destroyed_ship_cells(field, x, y)
+    if cages is None:
         return False
+    mark_around_ship(field, player_available_cells, cages)
+    return True
+
+
+instrument_module(globals())
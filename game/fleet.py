@@ -0,0 +1,49 @@
+from functools import lru_cache
+
+from game.constans import SHIPS, FIELDSIZE_MAX
+from game.feasibility import fleet_fits
+
+# Доля клеток под кораблями у классического флота на поле 10x10.
+# С такой долей на больших полях бот тратит на партию около половины
+# клеток поля, а с классическим флотом из 10 кораблей — почти все.
+TARGET_DENSITY = 0.2
+
+
+def fleet_for_density(field_size, density, ships=SHIPS):
+    """
+    Флот состава ships, увеличенный или уменьшенный так,
+    чтобы корабли занимали примерно долю density клеток поля
+    """
+    area = field_size[0] * field_size[1]
+    scale = density * area / sum(size * count
+                                 for size, count in ships.items())
+    return {size: max(1, round(count * scale))
+            for size, count in ships.items()}
+
+
+@lru_cache(maxsize=64)
+def _fleet_for_size(field_size):
+    fleet = fleet_for_density(field_size, TARGET_DENSITY)
+    while not fleet_fits(field_size, fleet):
+        # Сначала убираются самые длинные корабли:
+        # на узком поле им просто негде встать
+        size = max(fleet)
+        fleet[size] -= 1
+        if not fleet[size]:
+            del fleet[size]
+    return tuple(sorted(fleet.items()))
+
+
+def fleet_for_size(field_size):
+    """
+    Флот для поля field_size: классический на 10x10, на других полях
+    того же состава с долей кораблей TARGET_DENSITY. Если такой флот
+    не помещается (проверяет точный решатель), из него убираются
+    корабли, пока он не поместится. На полях больше FIELDSIZE_MAX
+    по стороне флот тот же, что на угловом куске FIELDSIZE_MAX:
+    решатель проверяет только такие поля, а флот с долей
+    TARGET_DENSITY на огромном разреженном поле не поместился бы
+    в память.
+    """
+    return dict(_fleet_for_size(tuple(min(side, FIELDSIZE_MAX)
+                                      for side in field_size)))
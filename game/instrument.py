@@ -0,0 +1,141 @@
+import atexit
+import functools
+import inspect
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+# SEA_BATTLE_STATS=1 — отчет в stderr при выходе,
+# SEA_BATTLE_STATS=путь — отчет в JSON-файл.
+# Без переменной функции не оборачиваются, а счетчики в горячих местах
+# стоят за проверкой STATS_ENABLED, поэтому замеры почти ничего не стоят.
+STATS_TARGET = os.environ.get("SEA_BATTLE_STATS", "")
+STATS_ENABLED = STATS_TARGET not in ("", "0")
+
+# Имя функции -> [число вызовов, суммарное время в секундах]
+calls = defaultdict(lambda: [0, 0.0])
+# Имя счетчика -> число событий
+counters = Counter()
+# Имя величины -> Counter значений
+observations = defaultdict(Counter)
+
+
+def timed(function):
+    """
+    Обертка, считающая вызовы функции и их время
+    (вместе со временем вложенных вызовов)
+    """
+    entry = calls[f"{function.__module__}.{function.__qualname__}"]
+    clock = time.perf_counter
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            entry[0] += 1
+            entry[1] += clock() - start
+    return wrapper
+
+
+def instrument_module(namespace):
+    """
+    Оборачивает замером все функции, объявленные в модуле.
+    Вызывается в конце модуля как instrument_module(globals());
+    без SEA_BATTLE_STATS ничего не делает.
+    """
+    if not STATS_ENABLED:
+        return
+    module = namespace["__name__"]
+    for name, value in list(namespace.items()):
+        if inspect.isfunction(value) and value.__module__ == module:
+            namespace[name] = timed(value)
+
+
+def count(name, value=1):
+    counters[name] += value
+
+
+def observe(name, value):
+    """
+    Значение величины, у которой важно распределение:
+    например число попыток установить корабль
+    """
+    observations[name][value] += 1
+
+
+def summary(values):
+    """
+    Число наблюдений, среднее, медиана, 99-й процентиль и максимум
+    """
+    total = sum(values.values())
+    mean = sum(value * times for value, times in values.items()) / total
+    ordered = sorted(values.items())
+    result = [total, mean]
+    for share in (0.5, 0.99):
+        seen = 0
+        for value, times in ordered:
+            seen += times
+            if seen >= share * total:
+                result.append(value)
+                break
+    result.append(ordered[-1][0])
+    return result
+
+
+def report():
+    """
+    Собранные данные в виде словаря для JSON
+    """
+    return {
+        "calls": {name: {"calls": number, "seconds": seconds}
+                  for name, (number, seconds) in calls.items() if number},
+        "counters": dict(counters),
+        "observations": {
+            name: dict(zip(("count", "mean", "p50", "p99", "max"),
+                           summary(values)))
+            for name, values in observations.items()},
+    }
+
+
+def format_report():
+    lines = ["Вызовы (время включает вложенные вызовы):",
+             f"{'функция':>45} {'вызовов':>10} {'всего, мс':>10} "
+             f"{'мкс/вызов':>10}"]
+    ordered = sorted(((seconds, number, name)
+                      for name, (number, seconds) in calls.items()
+                      if number), reverse=True)
+    for seconds, number, name in ordered:
+        lines.append(f"{name:>45} {number:>10} {seconds * 1e3:10.2f} "
+                     f"{seconds * 1e6 / number:10.2f}")
+    if counters:
+        lines.append("Счетчики:")
+        for name, value in sorted(counters.items()):
+            lines.append(f"{name:>45} {value:>10}")
+    if observations:
+        lines.append("Распределения:")
+        lines.append(f"{'величина':>45} {'раз':>10} {'среднее':>10} "
+                     f"{'медиана':>8} {'99%':>8} {'макс':>8}")
+        for name, values in sorted(observations.items()):
+            total, mean, median, p99, top = summary(values)
+            lines.append(f"{name:>45} {total:>10} {mean:10.2f} "
+                         f"{median:>8} {p99:>8} {top:>8}")
+    return "\n".join(lines)
+
+
+def dump():
+    """
+    Отчет при выходе: в stderr или в JSON-файл из SEA_BATTLE_STATS
+    """
+    if STATS_TARGET == "1":
+        sys.stderr.write(format_report() + "\n")
+    else:
+        with open(STATS_TARGET, "w", encoding="utf-8") as file:
+            json.dump(report(), file, ensure_ascii=False, indent=1)
+
+
+if STATS_ENABLED:
+    atexit.register(dump)
@@ -0,0 +1,172 @@
+import atexit
+import os
+import sqlite3
+import time
+
+SCORES_DB = "scores.db"
+SCORES_TXT = "scores.txt"
+
+
+class Leaderboard:
+    """
+    Таблица рекордов в SQLite. Индекс по числу ходов дает добавление
+    за O(log n) и чтение первых K записей за O(K), отдельная таблица
+    хранит лучший результат каждого игрока.
+    """
+    def __init__(self, path=SCORES_DB, legacy_path=SCORES_TXT):
+        self.connection = sqlite3.connect(path, timeout=30)
+        # WAL позволяет читать во время записи, а synchronous=NORMAL
+        # убирает fsync на каждую транзакцию
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.executescript("""
+                CREATE TABLE IF NOT EXISTS scores (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    moves INTEGER NOT NULL);
+                CREATE INDEX IF NOT EXISTS scores_by_moves
+                    ON scores (moves, id);
+                CREATE TABLE IF NOT EXISTS best (
+                    name TEXT PRIMARY KEY,
+                    moves INTEGER NOT NULL);
+                CREATE INDEX IF NOT EXISTS best_by_moves
+                    ON best (moves);
+                CREATE TABLE IF NOT EXISTS migrations (
+                    path TEXT PRIMARY KEY);
+            """)
+        if legacy_path is not None:
+            self.migrate(legacy_path)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, name, moves):
+        self.add_many([(name, moves)])
+
+    def add_many(self, records):
+        """
+        Добавление пачки записей (имя, ходы) одной транзакцией
+        """
+        with self.connection:
+            self._insert(records)
+
+    def _insert(self, records):
+        records = [(str(name), int(moves)) for name, moves in records]
+        self.connection.executemany(
+            "INSERT INTO scores (name, moves) VALUES (?, ?)", records)
+        self.connection.executemany(
+            "INSERT INTO best (name, moves) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE "
+            "SET moves = MIN(moves, excluded.moves)", records)
+
+    def top(self, limit=10):
+        """
+        Лучшие записи: меньше ходов — выше, при равенстве — раньше
+        """
+        return self.connection.execute(
+            "SELECT name, moves FROM scores ORDER BY moves, id LIMIT ?",
+            (limit,)).fetchall()
+
+    def top_players(self, limit=10):
+        """
+        Игроки по их лучшему результату
+        """
+        return self.connection.execute(
+            "SELECT name, moves FROM best ORDER BY moves, name LIMIT ?",
+            (limit,)).fetchall()
+
+    def best(self, name):
+        row = self.connection.execute(
+            "SELECT moves FROM best WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def migrate(self, legacy_path):
+        """
+        Однократный перенос записей из текстового файла формата имя:ходы.
+        Имя может содержать ':', испорченные строки пропускаются.
+        Проверка, перенос и отметка о нем идут одной транзакцией
+        BEGIN IMMEDIATE, поэтому из нескольких процессов, одновременно
+        открывших таблицу, файл переносит только один.
+        """
+        key = os.path.abspath(legacy_path)
+        if not os.path.exists(legacy_path) or self._migrated(key):
+            return 0
+        records = []
+        with open(legacy_path, "r", encoding="utf-8",
+                  errors="replace") as file:
+            for line in file:
+                name, separator, moves = line.rstrip("\n").rpartition(":")
+                if not separator:
+                    continue
+                try:
+                    records.append((name, int(moves)))
+                except ValueError:
+                    continue
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            # Пока файл читался, его мог перенести другой процесс
+            if self._migrated(key):
+                return 0
+            self._insert(records)
+            self.connection.execute(
+                "INSERT INTO migrations (path) VALUES (?)", (key,))
+        return len(records)
+
+    def _migrated(self, key):
+        return self.connection.execute(
+            "SELECT 1 FROM migrations WHERE path = ?",
+            (key,)).fetchone() is not None
+
+
+class ScoreSink:
+    """
+    Буфер результатов для множества одновременно играющих процессов.
+    Записи копятся в памяти и сбрасываются пачкой одной транзакцией,
+    когда буфер заполнен или прошло max_delay секунд. Блокировку файла
+    берет на себя SQLite: писатели по очереди получают право записи
+    (ожидая до timeout секунд), и каждая запись попадает в базу целиком.
+    Остаток буфера сбрасывается при close() и при выходе из процесса.
+    """
+    def __init__(self, path=SCORES_DB, batch_size=500, max_delay=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.buffer = []
+        self.leaderboard = None
+        self.last_flush = time.monotonic()
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, name, moves):
+        self.buffer.append((str(name), int(moves)))
+        if (len(self.buffer) >= self.batch_size or
+                time.monotonic() - self.last_flush >= self.max_delay):
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        if self.leaderboard is None:
+            self.leaderboard = Leaderboard(self.path, legacy_path=None)
+        self.leaderboard.add_many(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        if self.leaderboard is not None:
+            self.leaderboard.close()
+            self.leaderboard = None
+        atexit.unregister(self.close)
@@ -1,14 +1,22 @@
-from game.field import make_field, print_field, check_ship_full_destroyed
-from game.constans import SHIPS, FIELDSIZE_DEFAULT
-from game.Ai import Ai
-from game.utils import (random_setup_ships, game_over,
-                        init_available_cells, manual_ship_placement,
+from game.field import make_field, print_fields
+from game.fleet import fleet_for_size
+from game.constans import FIELDSIZE_DEFAULT
+from game.Ai import Ai, DuelAi
+from game.engine import (Shoot, Salvo, MoveShip, Surrender, Hit, Sunk,
+                         SalvoFired, ShipMoved, MineExploded, classic_state,
+                         duel_state, apply, place_mines)
+from game.errors import MoveError
+from game.utils import (random_setup_ships, random_place_fleet,
+                        init_available_cells, untouched_cells,
+                        manual_ship_placement,
                         record_score,
-                        display_scores, move_ship,
-                        correct_field_size, set_up_mins, check_mins)
-from game.ship import random_place_ship
-from game.player_move import (player_move_1v1, is_hit_classic,
-                              player_move_classic)
+                        display_scores, MOVE_DIRECTIONS,
+                        correct_field_size, set_up_mins)
+from game.player_move import player_move_classic, read_cell
+from game.movelog import new_seed, open_move_log, MODE_DUEL
+from game.snapshot import (ClassicGame, DuelGame, SnapshotError,
+                           save_game, load_game)
+from game.terminal import DiffRenderer, ansi_mode_enabled
 
 try:
     import pygame
@@ -29,9 +37,28 @@ def play_music(file_path, volume=0.5):
     thread.start()
 
 
-def run_1v1_game(field_size):
+def show_fields(renderer, player_field, enemy_field,
+                player_title, enemy_title,
+                player_mins=None, enemy_mins=None):
     """
-    Запускает игру в режиме 1 на 1 с особыми правилами.
+    Вывод полей: целиком или, в терминальном режиме,
+    только изменившихся клеток
+    """
+    if renderer is None:
+        print_fields(player_field, enemy_field, player_title, enemy_title,
+                     player_mins, enemy_mins)
+    else:
+        renderer.draw([(player_field, False, player_mins, player_title),
+                       (enemy_field, True, enemy_mins, enemy_title)])
+
+
+def make_renderer():
+    return DiffRenderer() if ansi_mode_enabled() else None
+
+
+def setup_1v1_game(field_size, ships):
+    """
+    Имена игроков, расстановка флота ships и мин для режима 1 на 1
     """
     print("\n--- Режим Игры 1 на 1 ---")
     player1_name = input("Введите имя Игрока 1: ")
@@ -46,9 +73,9 @@ def run_1v1_game(field_size):
     print("2 - Ручная")
     choice1 = input("Ваш выбор (1/2): ")
     if choice1 == '1':
-        random_setup_ships(player1_field)
+        random_setup_ships(player1_field, ships)
     else:
-        manual_ship_placement(player1_field)
+        manual_ship_placement(player1_field, ships)
 
     mins_on_player2_field = set_up_mins(player2_field)
 
@@ -61,145 +88,283 @@ def run_1v1_game(field_size):
     print("2 - Ручная")
     choice2 = input("Ваш выбор (1/2): ")
     if choice2 == '1':
-        random_setup_ships(player2_field)
+        random_setup_ships(player2_field, ships)
     else:
-        manual_ship_placement(player2_field)
+        manual_ship_placement(player2_field, ships)
 
     mins_on_player1_field = set_up_mins(player1_field)
 
-    current_player = 1
+    return DuelGame(player1_name, player2_name, player1_field, player2_field,
+                    mins_on_player1_field, mins_on_player2_field, 1, False)
 
-    while True:
-        if current_player == 1:
-            player_name = player1_name
-            player_field = player1_field
-            opponent_name = player2_name
-            opponent_field = player2_field
-            player_mins = mins_on_player1_field
-            opponent_mins = mins_on_player2_field
-        else:
-            player_name = player2_name
-            player_field = player2_field
-            opponent_name = player1_name
-            opponent_field = player1_field
-            player_mins = mins_on_player2_field
-            opponent_mins = mins_on_player1_field
-
-        moved_ship_this_turn = False
-
-        while True:
-            if check_mins(opponent_field, opponent_mins):
-                print(f"\nИгрок {opponent_name} подорвался на мине")
-            if check_mins(player_field, player_mins):
-                print(f"\nИгрок {player_name} подорвался на мине")
-            print(f"\nХод игрока: {player_name}")
-            print(f"\nВаше поле ({player_name}):")
-            print_field(player_field, False, player_mins)
-            print(f"\nПоле соперника ({opponent_name}):")
-            print_field(opponent_field, True, opponent_mins)
+
+def setup_1v1_bot_game(field_size, ships, bot):
+    """
+    Партия 1 на 1 против бота: флот ships и мины игрока,
+    случайный флот бота и мины, которые выбирает бот
+    """
+    print("\n--- Режим Игры 1 на 1 против бота ---")
+    player_name = input("Введите ваше имя: ")
+
+    player_field = make_field(field_size)
+    bot_field = make_field(field_size)
+
+    print("Выберите тип расстановки:")
+    print("1 - Авто")
+    print("2 - Ручная")
+    choice = input("Ваш выбор (1/2): ")
+    if choice == '1':
+        random_setup_ships(player_field, ships)
+    else:
+        manual_ship_placement(player_field, ships)
+
+    mins_on_bot_field = set_up_mins(bot_field)
+    random_place_fleet(bot_field, ships)
+    mins_on_player_field = bot.place_mines()
+
+    return DuelGame(player_name, "Бот", player_field, bot_field,
+                    mins_on_player_field, mins_on_bot_field, 1, False)
+
+
+def ask_salvo(player):
+    print("Выберите клетку, принадлежащую "
+          "кораблю, которым хотите выстрелить (x y):")
+    ship_x, ship_y = read_cell()
+    x, y = read_cell("Введите координаты выстрела (x y): ")
+    return Salvo(player, ship_x, ship_y, x, y)
+
+
+def ask_ship_move(player):
+    print("\n--- Перемещение корабля ---")
+    print("Выберите клетку, принадлежащую "
+          "кораблю, который хотите переместить (x y):")
+    ship_x, ship_y = read_cell()
+    print("Введите куда переместить корабль(вверх, вниз, влево, вправо):")
+    direction = input().strip().lower()
+    if direction not in MOVE_DIRECTIONS:
+        print("Некорректное направление.")
+        return None
+    return MoveShip(player, ship_x, ship_y, *MOVE_DIRECTIONS[direction])
+
+
+def report_1v1(events, names):
+    """
+    Сообщения игрокам о событиях партии 1 на 1
+    """
+    hit = any(type(event) is Hit for event in events)
+    for event in events:
+        if type(event) is SalvoFired:
+            print(f"Игрок выстрелил {event.ship_size}-палубным "
+                  f"кораблем по {event.cells}")
+            if not hit:
+                print(f"{names[event.player]} промахнулся!")
+        elif type(event) is ShipMoved:
+            print("Корабль успешно перемещен!")
+        elif type(event) is MineExploded:
+            print(f"\nИгрок {names[event.player]} подорвался на мине")
+
+
+def run_1v1_game(field_size, game=None, bot=None):
+    """
+    Запускает игру в режиме 1 на 1 с особыми правилами.
+    Если передана сохраненная партия, продолжает ее.
+    Если передан бот, вторым игроком ходит он.
+    Правила выполняет автомат партии, здесь только ввод и вывод.
+    """
+    seed = new_seed()
+    if game is None and bot is not None:
+        game = setup_1v1_bot_game(field_size, fleet_for_size(field_size),
+                                  bot)
+    elif game is None:
+        game = setup_1v1_game(field_size, fleet_for_size(field_size))
+    names = (game.player1_name, game.player2_name)
+    fields = (game.player1_field, game.player2_field)
+    renderer = make_renderer()
+    log = open_move_log(fields, seed, MODE_DUEL)
+    for field in fields:
+        log.record_field(field)
+
+    try:
+        state = duel_state(*fields)
+        events = []
+        for player, mins in ((0, game.player2_mins), (1, game.player1_mins)):
+            new_events, state = place_mines(state, player, mins, log)
+            events.extend(new_events)
+        state = state._replace(current=game.current_player - 1,
+                               moved_ship=game.moved_ship)
+        report_1v1(events, names)
+        if bot is not None:
+            bot.observe(state, events, 1)
+
+        while state.winner is None:
+            player = state.current
+            if bot is not None and player == 1:
+                action = bot.choose_action(state, 1)
+                try:
+                    events, state = apply(state, action, log)
+                except MoveError as error:
+                    print(f"Ход бота {action} отклонен: {error}")
+                    events, state = apply(state,
+                                          bot.fallback_salvo(state, 1), log)
+                bot.observe(state, events, 1)
+                report_1v1(events, names)
+                continue
+            show_fields(renderer, fields[player], fields[1 - player],
+                        f"Ваше поле ({names[player]}):",
+                        f"Поле соперника ({names[1 - player]}):",
+                        state.mins[player], state.mins[1 - player])
+            print(f"\nХод игрока: {names[player]}")
 
             print("\nВыберите действие:")
             print("1. Стрелять")
-            if not moved_ship_this_turn:
+            if not state.moved_ship:
                 print("2. Переместить корабль")
             print("3. Сдаться")
+            if bot is None:
+                print("4. Сохранить и выйти")
             action_choice = input("Ваш выбор: ")
 
             if action_choice == '1':
-                damaged_cells = player_move_1v1(player_field, opponent_field)
-
-                if len(damaged_cells) != 0:
-                    for x, y in damaged_cells:
-                        destroyed = (
-                            check_ship_full_destroyed(opponent_field, x, y))
-                        if destroyed:
-                            if game_over(opponent_field):
-                                print(f"\nПобедил {player_name}!")
-                                input("\nНажмите Enter, "
-                                      "чтобы вернуться в меню.")
-                                return
-                else:
-                    print(f"{player_name} промахнулся!")
-                    break
-
-            elif action_choice == '2' and not moved_ship_this_turn:
-                if move_ship(player_field):
-                    moved_ship_this_turn = True
+                action = ask_salvo(player)
+            elif action_choice == '2' and not state.moved_ship:
+                action = ask_ship_move(player)
             elif action_choice == '3':
-                print(f"\nПобедил {opponent_name}!")
-                input("\nНажмите Enter, чтобы вернуться в меню.")
+                action = Surrender(player)
+            elif action_choice == '4' and bot is None:
+                save_game(DuelGame(
+                    names[0], names[1], fields[0], fields[1],
+                    state.mins[0], state.mins[1],
+                    state.current + 1, state.moved_ship))
+                print("Игра сохранена.")
                 return
             else:
                 print("Некорректный выбор действия.")
-
-        current_player = 2 if current_player == 1 else 1
-
-
-def start_game(field_size):
+                continue
+            if action is None:
+                continue
+            try:
+                events, state = apply(state, action, log)
+            except MoveError as error:
+                print(error)
+                continue
+            report_1v1(events, names)
+            if bot is not None:
+                bot.observe(state, events, 1)
+
+        print(f"\nПобедил {names[state.winner]}!")
+        input("\nНажмите Enter, чтобы вернуться в меню.")
+    finally:
+        log.close()
+        if renderer is not None:
+            renderer.close()
+
+
+def setup_game(field_size, ships):
+    """
+    Имя игрока и расстановка флота ships для игры против бота
+    """
     player_name = input("Введите свое имя: ")
     player_field = make_field(field_size)
     bot_field = make_field(field_size)
-    player_available_cells = init_available_cells(field_size)
-    ai = Ai()
 
     print("\nВыберите тип расстановки кораблей:")
     print("1 - Авто")
     print("2 - Ручная")
     choice = input("Ваш выбор (1/2): ")
     if choice == '1':
-        random_setup_ships(player_field)
+        random_setup_ships(player_field, ships)
     else:
-        manual_ship_placement(player_field)
+        manual_ship_placement(player_field, ships)
 
-    for count in SHIPS:
-        for i in range(count):
-            size_of_ship = SHIPS[count]
-            random_place_ship(bot_field, size_of_ship)
+    random_place_fleet(bot_field, ships)
+    return ClassicGame(player_name, player_field, bot_field, Ai(), True, 0)
 
-    player_turn = True
-    player_moves = 0
 
-    while True:
-        print("\nВаше игровое поле:")
-        print_field(player_field, False)
-        print("\nИгровое поле соперника:")
-        print_field(bot_field, True)
-        if player_turn:
-            x, y = player_move_classic(bot_field)
-            player_moves += 1
-            if is_hit_classic(x, y, bot_field):
-                print("Вы попали!")
-                check_ship_full_destroyed(bot_field, x, y)
-                player_turn = True
+def start_game(field_size, game=None):
+    """
+    Игра против бота. Если передана сохраненная партия, продолжает ее.
+    Правила выполняет автомат партии, здесь только ввод, ходы бота
+    и вывод. Флот новой партии зависит от размера поля.
+    """
+    seed = new_seed()
+    if game is None:
+        game = setup_game(field_size, fleet_for_size(field_size))
+        player_available_cells = init_available_cells(field_size)
+    else:
+        player_available_cells = untouched_cells(game.player_field)
+    (player_name, player_field, bot_field, ai,
+     player_turn, player_moves) = game
+    renderer = make_renderer()
+    log = open_move_log((player_field, bot_field), seed)
+    log.record_field(player_field)
+    log.record_field(bot_field)
+    state = classic_state(player_field, bot_field, 0 if player_turn else 1)
+
+    try:
+        while state.winner is None:
+            show_fields(renderer, player_field, bot_field,
+                        "Ваше игровое поле:", "Игровое поле соперника:")
+            if state.current == 0:
+                move = player_move_classic(bot_field)
+                if move is None:
+                    save_game(ClassicGame(player_name, player_field, bot_field,
+                                          ai, True, player_moves))
+                    print("Игра сохранена.")
+                    return
+                player_moves += 1
+                events, state = apply(state, Shoot(0, *move), log)
+                if type(events[0]) is Hit:
+                    print("Вы попали!")
+                else:
+                    print("Вы промахнулись!")
             else:
-                print("Вы промахнулись!")
-                player_turn = False
-            if game_over(bot_field):
-                print("Победа!")
-                record_score(player_moves, player_name)
-                break
+                print("\nХод соперника:")
+                x, y = ai.make_move(player_available_cells)
+                print(x, y)
+                player_available_cells.remove((x, y))
+                events, state = apply(state, Shoot(1, x, y), log)
+                destroyed = False
+                for event in events:
+                    if type(event) is Sunk:
+                        destroyed = True
+                        for cell in event.halo:
+                            player_available_cells.remove(cell)
+                if type(events[0]) is Hit:
+                    print("Соперник попал!")
+                    ai.register_hit(x, y, destroyed)
+                else:
+                    print("Соперник промахнулся!")
+                    ai.register_miss()
+
+        if state.winner == 0:
+            print("Победа!")
+            record_score(player_moves, player_name)
         else:
-            print("\nХод соперника:")
-            x, y = ai.make_move(player_available_cells)
-            print(x, y)
-            player_available_cells.remove((x, y))
-            if is_hit_classic(x, y, player_field):
-                print("Соперник попал!")
-                ai.register_hit(
-                    x, y, check_ship_full_destroyed(
-                        player_field, x, y, player_available_cells))
-                player_turn = False
-            else:
-                print("Соперник промахнулся!")
-                ai.register_miss()
-                player_turn = True
-        if game_over(player_field):
-            print("\nВаше игровое поле:")
-            print_field(player_field, False)
-            print("\nИгровое поле соперника:")
-            print_field(bot_field, True)
+            show_fields(renderer, player_field, bot_field,
+                        "Ваше игровое поле:", "Игровое поле соперника:")
             print("Проигрыш!")
-            break
+    finally:
+        log.close()
+        if renderer is not None:
+            renderer.close()
+
+
+def resume_game():
+    try:
+        game = load_game()
+    except FileNotFoundError:
+        print("\nСохраненной игры нет.")
+        return
+    except (OSError, SnapshotError) as error:
+        print(f"\nНе удалось загрузить игру: {error}")
+        return
+    field = (game.player_field if isinstance(game, ClassicGame)
+             else game.player1_field)
+    field_size = (len(field[0]), len(field))
+    if isinstance(game, ClassicGame):
+        start_game(field_size, game)
+    else:
+        run_1v1_game(field_size, game)
 
 
 def main():
@@ -213,6 +378,8 @@ def main():
         print("2. Посмотреть таблицу рекордов")
         print("3. Изменить размер поля")
         print("4. Игра 1 на 1 (особые правила)")
+        print("5. Продолжить сохраненную игру")
+        print("6. Игра 1 на 1 против бота (особые правила)")
         print("0. Выход")
         choice = input("Выберите пункт меню: ")
 
@@ -230,16 +397,22 @@ def main():
                 if len(field_size) != 2:
                     print("Ошибка: нужно ввести ровно два числа!")
                     continue
-                if correct_field_size(field_size):
+                # Флот для поля подбирается при начале партии
+                # и всегда помещается, проверяются только размеры
+                if correct_field_size(field_size, ships=None):
                     break
             input("\nНажмите Enter, чтобы вернуться в меню.")
         elif choice == '4':
             run_1v1_game(field_size)
+        elif choice == '5':
+            resume_game()
+        elif choice == '6':
+            run_1v1_game(field_size, bot=DuelAi(field_size))
         elif choice == '0':
             print("Спасибо за игру!")
             break
         else:
-            print("Некорректный выбор. Введите число от 0 до 3.")
+            print("Некорректный выбор. Введите число от 0 до 6.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,41 @@
+class Mines:
+    """
+    Мины на поле игрока. Клетки хранятся в порядке установки
+    (в нем они попадают в сохранение) и в множестве, поэтому
+    проверка клеток, на которые встал корабль, стоит
+    O(число этих клеток), а не O(число мин).
+    """
+    def __init__(self, cells=()):
+        self.cells = []
+        self.index = set()
+        for cell in cells:
+            self.append(cell)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __iter__(self):
+        return iter(self.cells)
+
+    def __contains__(self, cell):
+        return cell in self.index
+
+    def __eq__(self, other):
+        return list(self.cells) == list(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Mines({self.cells!r})"
+
+    def append(self, cell):
+        cell = tuple(cell)
+        self.cells.append(cell)
+        self.index.add(cell)
+
+    def under(self, cells):
+        """
+        Клетки из cells, в которых стоят мины
+        """
+        index = self.index
+        return [cell for cell in cells if cell in index]
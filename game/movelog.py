@@ -0,0 +1,252 @@
+import os
+import random
+import struct
+import time
+
+from game.constans import EMPTY, SHIP, DAMAGED, MISSED
+from game.field import Field, mark_around_ship
+from game.neighbours import STEPS_4, ship_layout
+from game.sparse import SparseField
+
+REPLAY_DIR = "replays"
+
+MAGIC = b"SL"
+VERSION = 1
+MODE_CLASSIC = 0
+MODE_DUEL = 1
+
+# Заголовок: метка, версия, режим, есть ли зерно, размер поля, зерно
+HEADER = struct.Struct("<2sBBBHHQ")
+# Событие: вид, поле (0 или 1), x, y, дополнительное число
+EVENT = struct.Struct("<BBHHH")
+
+# Виды событий. side — номер поля, на котором происходит событие.
+PLACE = 0       # корабль: (x, y) — голова, extra = размер * 2 + вертикальный
+SHOT = 1        # выстрел по классическим правилам
+SALVO = 2       # залп: (x, y) — клетка стреляющего корабля,
+                # extra — число следующих за ним событий TARGET
+TARGET = 3      # клетка залпа
+MOVE = 4        # сдвиг корабля из клетки (x, y), extra — номер в STEPS_4
+MINE = 5        # подрыв корабля на мине в клетке (x, y)
+MINE_PLACE = 6  # мина поставлена в клетку (x, y)
+SURRENDER = 7   # владелец поля сдался
+
+
+def new_seed():
+    """
+    Зерно для новой партии: записывается в журнал,
+    чтобы партию можно было разобрать и повторить
+    """
+    seed = random.SystemRandom().getrandbits(63)
+    random.seed(seed)
+    return seed
+
+
+class MoveLog:
+    """
+    Журнал партии только на дописывание: заголовок с зерном генератора
+    и события фиксированного размера по 8 байт. Поток может быть
+    файлом или io.BytesIO.
+    """
+    def __init__(self, stream, fields, seed=None, mode=MODE_CLASSIC):
+        self.stream = stream
+        self.fields = fields
+        field = fields[0]
+        stream.write(HEADER.pack(MAGIC, VERSION, mode, seed is not None,
+                                 len(field[0]), len(field), seed or 0))
+
+    def side(self, field):
+        return 0 if field is self.fields[0] else 1
+
+    def record(self, kind, field, x=0, y=0, extra=0):
+        self.stream.write(EVENT.pack(kind, self.side(field), x, y, extra))
+
+    def record_field(self, field):
+        """
+        Текущее состояние поля: корабли по его реестру и клетки,
+        в которые уже стреляли. Для новой партии это только расстановка,
+        для продолженной — вся позиция.
+        """
+        side = self.side(field)
+        events = []
+        for cells in field.registry.ship_cells.values():
+            x, y = min(cells)
+            vertical = len(cells) > 1 and cells[0][0] == cells[1][0]
+            events.append(EVENT.pack(PLACE, side, x, y,
+                                     len(cells) * 2 + vertical))
+        if isinstance(field, SparseField):
+            shots = field.shot_cells()
+        else:
+            shots = [(x, y) for y, row in enumerate(field)
+                     for x, cage in enumerate(row)
+                     if cage == DAMAGED or cage == MISSED]
+        for x, y in shots:
+            events.append(EVENT.pack(SHOT, side, x, y, 0))
+        self.stream.write(b"".join(events))
+
+    def record_salvo(self, field, ship_x, ship_y, cells):
+        side = self.side(field)
+        self.stream.write(
+            EVENT.pack(SALVO, side, ship_x, ship_y, len(cells)) +
+            b"".join(EVENT.pack(TARGET, side, x, y, 0) for x, y in cells))
+
+    def record_move(self, field, x, y, dx, dy):
+        self.record(MOVE, field, x, y, STEPS_4.index((dx, dy)))
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+
+def open_move_log(fields, seed, mode=MODE_CLASSIC, directory=None):
+    """
+    Новый файл журнала в каталоге directory (по умолчанию REPLAY_DIR)
+    """
+    if directory is None:
+        directory = REPLAY_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-"
+                                   f"{seed:016x}.log")
+    return MoveLog(open(path, "ab"), fields, seed, mode)
+
+
+class Replay:
+    """
+    Воспроизведение журнала без консольного ввода-вывода.
+    seek(index) восстанавливает поля после первых index событий:
+    вперед — дописывая события к текущей позиции, назад — с начала.
+    """
+    def __init__(self, data):
+        if len(data) < HEADER.size:
+            raise ValueError("Журнал обрезан")
+        magic, version, mode, has_seed, field_size_x, field_size_y, seed = (
+            HEADER.unpack_from(data))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Неизвестный формат журнала")
+        self.mode = mode
+        self.seed = seed if has_seed else None
+        self.field_size = (field_size_x, field_size_y)
+        body = memoryview(data)[HEADER.size:]
+        body = body[:len(body) - len(body) % EVENT.size]
+        self.events = list(EVENT.iter_unpack(body))
+        self.reset()
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            return cls(file.read())
+
+    def __len__(self):
+        return len(self.events)
+
+    def reset(self):
+        field_size_x, field_size_y = self.field_size
+        self.fields = tuple(Field([EMPTY] * field_size_x
+                                  for _ in range(field_size_y))
+                            for _ in range(2))
+        self.mins = ([], [])
+        self.halos = ({}, {})
+        self.salvo_left = 0
+        self.salvo_hits = []
+        self.index = 0
+
+    def seek(self, index=None):
+        """
+        Поля обоих игроков после первых index событий (по умолчанию всех)
+        """
+        if index is None or index > len(self.events):
+            index = len(self.events)
+        if index < self.index:
+            self.reset()
+        self.apply(self.events[self.index:index])
+        self.index = index
+        return self.fields
+
+    def apply(self, events):
+        """
+        Применение событий к текущей позиции. Выстрелы — почти все
+        события журнала, поэтому они разбираются первыми, а ореол вокруг
+        потопленного корабля берется из таблицы, посчитанной при
+        расстановке.
+        """
+        fields = self.fields
+        field_size_x, field_size_y = self.field_size
+        registries = (fields[0].registry, fields[1].registry)
+        halos = self.halos
+        for kind, side, x, y, extra in events:
+            field = fields[side]
+            if kind == SHOT:
+                row = field[y]
+                if row[x] != SHIP:
+                    row[x] = MISSED
+                    continue
+                row[x] = DAMAGED
+                registry = registries[side]
+                ship_id = registry.hit(x, y)
+                if registry.health[ship_id] == 0:
+                    for a, b in halos[side][ship_id]:
+                        if field[b][a] == EMPTY:
+                            field[b][a] = MISSED
+            elif kind == TARGET:
+                if field[y][x] == SHIP:
+                    field[y][x] = DAMAGED
+                    registries[side].hit(x, y)
+                    self.salvo_hits.append((x, y))
+                self.salvo_left -= 1
+                if self.salvo_left == 0:
+                    self._resolve_salvo(field, self.salvo_hits)
+                    self.salvo_hits = []
+            elif kind == PLACE:
+                cells, halo = ship_layout(field_size_x, field_size_y,
+                                          x, y, extra >> 1, extra & 1)
+                for a, b in cells:
+                    field[b][a] = SHIP
+                halos[side][registries[side].add_ship(cells)] = halo
+            elif kind == SALVO:
+                self.salvo_left = extra
+                self.salvo_hits = []
+            elif kind == MOVE:
+                ship_id = self._move(field, x, y, STEPS_4[extra])
+                cells = registries[side].cells(ship_id)
+                vertical = len(cells) > 1 and cells[0][0] == cells[1][0]
+                halos[side][ship_id] = ship_layout(
+                    field_size_x, field_size_y, *min(cells), len(cells),
+                    vertical)[1]
+            elif kind == MINE:
+                self._explode(field, x, y)
+            elif kind == MINE_PLACE:
+                self.mins[side].append((x, y))
+
+    @staticmethod
+    def _resolve_salvo(field, hits):
+        registry = field.registry
+        for x, y in hits:
+            ship_id = registry.find(x, y)
+            if registry.is_sunk(ship_id):
+                mark_around_ship(field, None, registry.cells(ship_id))
+
+    @staticmethod
+    def _move(field, x, y, step):
+        registry = field.registry
+        ship_id = registry.find(x, y)
+        cells = registry.cells(ship_id)
+        new_cells = [(a + step[0], b + step[1]) for a, b in cells]
+        for a, b in cells:
+            field[b][a] = EMPTY
+        for a, b in new_cells:
+            field[b][a] = SHIP
+        registry.move(ship_id, new_cells)
+        return ship_id
+
+    @staticmethod
+    def _explode(field, x, y):
+        registry = field.registry
+        ship_id = registry.find(x, y)
+        cells = registry.cells(ship_id)
+        for a, b in cells:
+            if field[b][a] == SHIP:
+                registry.hit(a, b)
+                field[b][a] = DAMAGED
+        mark_around_ship(field, None, cells)
@@ -0,0 +1,45 @@
+from functools import lru_cache
+
+STEPS_4 = ((-1, 0), (1, 0), (0, -1), (0, 1))
+STEPS_8 = tuple((dx, dy) for dx in range(-1, 2) for dy in range(-1, 2)
+                if dx != 0 or dy != 0)
+
+
+def _table(field_size_x, field_size_y, steps):
+    table = []
+    for y in range(field_size_y):
+        row = []
+        for x in range(field_size_x):
+            row.append(tuple((x + dx, y + dy) for dx, dy in steps
+                             if 0 <= x + dx < field_size_x and
+                             0 <= y + dy < field_size_y))
+        table.append(row)
+    return table
+
+
+@lru_cache(maxsize=8)
+def neighbour_tables(field_size_x, field_size_y):
+    """
+    Соседи каждой клетки поля с учетом его границ:
+    table[y][x] — кортеж координат соседних клеток.
+    Возвращает таблицы для 4-связности и 8-связности.
+    Таблицы строятся один раз на размер поля; хранятся только
+    последние размеры, поэтому смена размера в меню не копит память.
+    """
+    return (_table(field_size_x, field_size_y, STEPS_4),
+            _table(field_size_x, field_size_y, STEPS_8))
+
+
+@lru_cache(maxsize=4096)
+def ship_layout(field_size_x, field_size_y, x, y, size, vertical):
+    """
+    Клетки прямого корабля с головой в (x, y) и клетки вокруг него
+    в пределах поля
+    """
+    if vertical:
+        cells = tuple((x, y + i) for i in range(size))
+    else:
+        cells = tuple((x + i, y) for i in range(size))
+    near = neighbour_tables(field_size_x, field_size_y)[1]
+    halo = {cell for a, b in cells for cell in near[b][a]}
+    return cells, tuple(sorted(halo.difference(cells)))
@@ -0,0 +1,197 @@
+from functools import lru_cache
+
+from game.constans import EMPTY, SHIP
+from game.instrument import STATS_ENABLED, count, observe, instrument_module
+from game.neighbours import neighbour_tables
+from game.pool import IndexedPool
+from game.registry import register_ship
+from game.ship import random_place_ship
+from game.sparse import SparseField
+
+
+@lru_cache(maxsize=32)
+def placement_tables(field_size_x, field_size_y, ship_size):
+    """
+    Все положения корабля (x, y, направление) в границах поля
+    и для каждой клетки — положения, которые ее занимают
+    """
+    placements = {}
+    covering = {}
+    positions = ('h',) if ship_size == 1 else ('h', 'v')
+    for position in positions:
+        dx, dy = (1, 0) if position == 'h' else (0, 1)
+        for y in range(field_size_y - dy * (ship_size - 1)):
+            for x in range(field_size_x - dx * (ship_size - 1)):
+                placement = (x, y, position)
+                cells = tuple((x + dx * i, y + dy * i)
+                              for i in range(ship_size))
+                placements[placement] = cells
+                for cell in cells:
+                    covering.setdefault(cell, []).append(placement)
+    return placements, covering, IndexedPool(placements)
+
+
+def fleet_sizes(ships):
+    """
+    Размеры всех кораблей флота, начиная с самых больших
+    """
+    sizes = []
+    for size, count in ships.items():
+        sizes.extend([size] * count)
+    sizes.sort(reverse=True)
+    return sizes
+
+
+class FleetPlacer:
+    """
+    Расстановка флота с перебором с возвратом.
+    Для каждого размера корабля хранится множество еще допустимых
+    положений; после установки корабля из него удаляются положения,
+    задевающие корабль или его окрестность.
+    """
+    def __init__(self, field, ships, max_steps=1000):
+        self.field = field
+        self.field_size_y = len(field)
+        self.field_size_x = len(field[0])
+        self.sizes = fleet_sizes(ships)
+        self.max_steps = max_steps
+        self.steps = 0
+        self.tables = {size: placement_tables(self.field_size_x,
+                                              self.field_size_y, size)
+                       for size in set(self.sizes)}
+        self.pools = {size: self.tables[size][2].copy()
+                      for size in self.tables}
+        self.coverings = [(size, self.pools[size], self.tables[size][1])
+                          for size in self.tables]
+        self.near = neighbour_tables(self.field_size_x,
+                                     self.field_size_y)[1]
+        self.blocked = set()
+        self.placed = []
+
+        occupied = []
+        for y, row in enumerate(field):
+            for x, cage in enumerate(row):
+                if cage == SHIP:
+                    occupied.extend(self.around([(x, y)]))
+                elif cage != EMPTY:
+                    occupied.append((x, y))
+        self.block(occupied)
+
+    def around(self, cells):
+        """
+        Клетки корабля вместе с соседними клетками
+        """
+        result = list(cells)
+        for x, y in cells:
+            result.extend(self.near[y][x])
+        return result
+
+    def block(self, cells):
+        """
+        Запрещает клетки и возвращает журнал изменений для отката
+        """
+        blocked = self.blocked
+        new_cells = []
+        removed = []
+        for cell in cells:
+            if cell in blocked:
+                continue
+            blocked.add(cell)
+            new_cells.append(cell)
+            for size, pool, covering in self.coverings:
+                positions = pool.positions
+                for placement in covering.get(cell, ()):
+                    if placement in positions:
+                        pool.discard(placement)
+                        removed.append((size, placement))
+        return new_cells, removed
+
+    def unblock(self, journal):
+        new_cells, removed = journal
+        self.blocked.difference_update(new_cells)
+        for size, placement in removed:
+            self.pools[size].add(placement)
+
+    def feasible(self, index):
+        """
+        Для каждого оставшегося размера есть хотя бы одно положение
+        """
+        return all(self.pools[size] for size in set(self.sizes[index:]))
+
+    def search(self, index):
+        if index == len(self.sizes):
+            return True
+        size = self.sizes[index]
+        pool = self.pools[size]
+        tried = []
+        while pool and self.steps < self.max_steps:
+            self.steps += 1
+            placement = pool.choice()
+            pool.discard(placement)
+            tried.append(placement)
+            cells = self.tables[size][0][placement]
+            journal = self.block(self.around(cells))
+            if self.feasible(index + 1) and self.search(index + 1):
+                self.placed.append(cells)
+                return True
+            self.unblock(journal)
+        for placement in tried:
+            pool.add(placement)
+        return False
+
+    def place(self):
+        """
+        Расставляет весь флот на поле. Если флот не помещается
+        (или не удалось найти расстановку за max_steps шагов),
+        поле не изменяется и возвращается False.
+        """
+        found = self.search(0)
+        if STATS_ENABLED:
+            observe("fleet_placer.steps", self.steps)
+        if not found:
+            return False
+        for cells in self.placed:
+            for x, y in cells:
+                self.field[y][x] = SHIP
+            register_ship(self.field, cells)
+        return True
+
+
+def place_fleet(field, ships, restarts=20, max_steps=1000):
+    """
+    Расстановка флота с перезапусками: случайный перебор, застрявший
+    в неудачной ветви, дешевле начать заново, чем перебирать до конца.
+    Время работы ограничено restarts * max_steps установками кораблей.
+    """
+    if isinstance(field, SparseField):
+        return place_sparse_fleet(field, ships)
+    for i in range(restarts):
+        if FleetPlacer(field, ships, max_steps).place():
+            if STATS_ENABLED:
+                observe("place_fleet.restarts", i)
+            return True
+    if STATS_ENABLED:
+        count("place_fleet.failed")
+    return False
+
+
+def place_sparse_fleet(field, ships):
+    """
+    Расстановка на разреженном поле: таблицы всех положений для него
+    не поместятся в память, зато флот занимает малую долю поля,
+    и случайные пробы почти всегда удаются с первых попыток.
+    Если какой-то корабль не встал, поставленные убираются.
+    """
+    registry = field.registry
+    first_ship = registry.next_id
+    for size in fleet_sizes(ships):
+        if not random_place_ship(field, size):
+            for ship_id in range(first_ship, registry.next_id):
+                for x, y in registry.cells(ship_id):
+                    field.set(x, y, EMPTY)
+                registry.remove_ship(ship_id)
+            return False
+    return True
+
+
+instrument_module(globals())
@@ -1,18 +1,34 @@
 import random
+from collections import namedtuple
 
 from game.constans import EMPTY, SHIP, DAMAGED, MISSED
+from game.errors import MoveError
+from game.field import note_changes, mark_around_ship
+from game.instrument import instrument_module
+from game.neighbours import neighbour_tables
 from game.ship import find_ship_cages
+from game.sparse import SparseField
+
+# Итог залпа: подбитые клетки в порядке залпа, уничтоженные корабли
+# и все отмеченные вокруг них клетки
+SalvoResult = namedtuple('SalvoResult', ['hits', 'sunk', 'halo'])
+# Уничтоженный корабль: его клетки и ореол вокруг него
+SunkShip = namedtuple('SunkShip', ['cells', 'halo'])
 
 
 def player_move_classic(field):
     """
-    Функция отвечает за ход игрока
+    Функция отвечает за ход игрока.
+    Возвращает None, если игрок решил сохранить партию.
     """
     field_size_y = len(field)
     field_size_x = len(field[0])
     while True:
         try:
-            x, y = map(int, input("Ваш ход: ").split())
+            move = input("Ваш ход (x y, s — сохранить и выйти): ")
+            if move.strip().lower() == 's':
+                return None
+            x, y = map(int, move.split())
             if (0 <= x < field_size_x and 0 <= y < field_size_y and
                     (field[y][x] == EMPTY or field[y][x] == SHIP)):
                 return x, y
@@ -24,49 +40,46 @@ def player_move_classic(field):
             print("Ошибка. Введите два числа через пробел.")
 
 
-def player_move_1v1(player_field, enemy_field):
+def read_cell(prompt=""):
     """
-    Функция отвечает за ход игрока
+    Координаты клетки (x y); переспрашивает, пока не введены два числа
     """
+    while True:
+        try:
+            x, y = map(int, input(prompt).split())
+            return x, y
+        except ValueError:
+            print("Ошибка. Введите два числа через пробел.")
 
-    print("Выберите клетку, принадлежащую "
-          "кораблю, которым хотите выстрелить (x y):")
+
+def salvo_ship_cells(player_field, ship_x, ship_y):
+    """
+    Клетки корабля, которым игрок хочет выстрелить.
+    Если этим кораблем стрелять нельзя, бросает MoveError.
+    """
     player_field_size_y = len(player_field)
     player_field_size_x = len(player_field[0])
-
-    ship_x, ship_y = map(int, input().split())
     if not (0 <= ship_x < player_field_size_x and
             0 <= ship_y < player_field_size_y):
-        print("Некорректные координаты корабля.")
-        return False
+        raise MoveError("Некорректные координаты корабля.", 'out_of_field')
     if player_field[ship_y][ship_x] != SHIP:
-        print("В выбранной клетке нет вашего неподбитого корабля.")
-        return False
+        raise MoveError("В выбранной клетке нет вашего неподбитого корабля.",
+                        'no_ship')
 
     ship_cells = find_ship_cages(player_field, ship_x, ship_y)
     if all(player_field[y][x] == DAMAGED for x, y in ship_cells):
-        print("Этот корабль уничтожен, им нельзя выстрелить.")
-        return False
+        raise MoveError("Этот корабль уничтожен, им нельзя выстрелить.",
+                        'ship_sunk')
+    return ship_cells
 
-    ship_size = len(ship_cells)
 
+def salvo_cells(enemy_field, x, y, ship_size):
+    """
+    Клетки залпа: выбранная клетка и еще до ship_size - 1
+    случайных соседних с ней клеток
+    """
     field_size_y = len(enemy_field)
     field_size_x = len(enemy_field[0])
-
-    while True:
-        try:
-            x, y = map(int, input(
-                "Введите координаты выстрела (x y): ").split())
-            if (0 <= x < field_size_x and
-                    0 <= y < field_size_y and enemy_field[y][x] != DAMAGED):
-                break
-            elif 0 <= x < field_size_x and 0 <= y < field_size_y:
-                print("Клетка уже в игре. Попробуйте еще раз.")
-            else:
-                print("Введите 2 числа в пределах поля")
-        except ValueError:
-            print("Ошибка. Введите два числа через пробел.")
-
     directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
 
     hit_cells = [(x, y)]
@@ -80,23 +93,121 @@ def player_move_1v1(player_field, enemy_field):
             new_hit = random.choice(cells)
             cells.remove(new_hit)
             hit_cells.append(new_hit)
+    return hit_cells
+
 
-    damaged_cells = []
-    for x, y in hit_cells:
-        hit = is_hit_1v1(x, y, enemy_field)
-        if hit:
-            damaged_cells.append((x, y))
-    print(f"Игрок выстрелил "
-          f"{ship_size}-палубным кораблем по {hit_cells}")
-    return damaged_cells
+def resolve_salvo(field, cells, apply=True):
+    """
+    Залп по клеткам cells за один проход по правилам 1 на 1:
+    промахи не отмечаются, а вокруг уничтоженных кораблей
+    отмечается ореол. Уничтожение проверяется один раз на корабль,
+    сколько бы клеток залпа в него ни попало.
+    С apply=False поле не меняется: так бот может оценить
+    возможный залп. Возвращает SalvoResult.
+    """
+    hits = []
+    seen = set()
+    for x, y in cells:
+        if (x, y) in seen:
+            continue
+        seen.add((x, y))
+        if is_hit_1v1(x, y, field) if apply else field[y][x] == SHIP:
+            hits.append((x, y))
+
+    sunk = []
+    all_halo = []
+    checked = set()
+    marked = set()
+    hit_set = set(hits)
+    for x, y in hits:
+        if (x, y) in checked:
+            continue
+        ship_cells = ship_cells_at(field, x, y)
+        checked.update(ship_cells)
+        if not all(field[j][i] == DAMAGED or (i, j) in hit_set
+                   for i, j in ship_cells):
+            continue
+        if apply:
+            halo = sorted(mark_around_ship(field, None, ship_cells))
+        else:
+            halo = sorted(halo_cells(field, ship_cells) - marked)
+            marked.update(halo)
+        sunk.append(SunkShip(ship_cells, halo))
+        all_halo.extend(halo)
+    return SalvoResult(hits, sunk, all_halo)
+
+
+def ship_cells_at(field, x, y):
+    """
+    Клетки корабля в клетке (x, y): из реестра или обходом поля
+    """
+    registry = getattr(field, 'registry', None)
+    ship_id = registry.find(x, y) if registry is not None else None
+    if ship_id is None:
+        return find_ship_cages(field, x, y)
+    return registry.cells(ship_id)
+
+
+def halo_cells(field, ship_cells):
+    """
+    Пустые клетки вокруг корабля, которые отметит mark_around_ship
+    """
+    if isinstance(field, SparseField):
+        near = field.near
+    else:
+        tables = neighbour_tables(len(field[0]), len(field))[1]
+
+        def near(x, y):
+            return tables[y][x]
+    return {(a, b) for x, y in ship_cells for a, b in near(x, y)
+            if field[b][a] == EMPTY}
+
+
+def player_move_1v1(player_field, enemy_field, log=None):
+    """
+    Залп игрока с вводом с консоли. Ход выполняет автомат партии
+    (game.engine). Возвращает подбитые клетки или False, если
+    выбранным кораблем стрелять нельзя.
+    Залп записывается в журнал партии, если он передан.
+    """
+    # game.engine сам импортирует этот модуль
+    from game.engine import Hit, Salvo, SalvoFired, apply, duel_state
+
+    print("Выберите клетку, принадлежащую "
+          "кораблю, которым хотите выстрелить (x y):")
+
+    ship_x, ship_y = map(int, input().split())
+    try:
+        salvo_ship_cells(player_field, ship_x, ship_y)
+    except MoveError as error:
+        print(error)
+        return False
+
+    state = duel_state(player_field, enemy_field)._replace(current=0)
+    while True:
+        x, y = read_cell("Введите координаты выстрела (x y): ")
+        try:
+            events, state = apply(state, Salvo(0, ship_x, ship_y, x, y),
+                                  log)
+            break
+        except MoveError as error:
+            print(error)
+
+    for event in events:
+        if type(event) is SalvoFired:
+            print(f"Игрок выстрелил "
+                  f"{event.ship_size}-палубным кораблем по {event.cells}")
+    return [(event.x, event.y) for event in events if type(event) is Hit]
 
 
 def is_hit_classic(x, y, field):
     """
     Проверка на попадание
     """
+    note_changes(field, [(x, y)])
     if field[y][x] == SHIP:
         field[y][x] = DAMAGED
+        _register_hit(field, x, y)
         return True
     else:
         field[y][x] = MISSED
@@ -106,4 +217,15 @@ def is_hit_classic(x, y, field):
 def is_hit_1v1(x, y, field):
     if field[y][x] == SHIP:
         field[y][x] = DAMAGED
+        _register_hit(field, x, y)
+        note_changes(field, [(x, y)])
         return True
+
+
+def _register_hit(field, x, y):
+    registry = getattr(field, 'registry', None)
+    if registry is not None:
+        registry.hit(x, y)
+
+
+instrument_module(globals())
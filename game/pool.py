@@ -0,0 +1,137 @@
+import random
+
+
+class IndexedPool:
+    """
+    Множество с добавлением, удалением, проверкой и случайным
+    выбором элемента за O(1): плотный список элементов
+    и словарь их позиций в нем.
+    Повторяет нужную игре часть интерфейса set, поэтому используется
+    как множество доступных для выстрела клеток.
+    """
+    def __init__(self, items=()):
+        self.items = list(dict.fromkeys(items))
+        self.positions = {item: index
+                          for index, item in enumerate(self.items)}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __eq__(self, other):
+        if isinstance(other, IndexedPool):
+            other = other.positions.keys()
+        return self.positions.keys() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"IndexedPool({self.items!r})"
+
+    def copy(self):
+        pool = IndexedPool()
+        pool.items = list(self.items)
+        pool.positions = dict(self.positions)
+        return pool
+
+    def add(self, item):
+        if item not in self.positions:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+
+    def remove(self, item):
+        if item not in self.positions:
+            raise KeyError(item)
+        self.discard(item)
+
+    def discard(self, item):
+        """
+        Удаление перестановкой последнего элемента на место удаляемого
+        """
+        index = self.positions.pop(item, None)
+        if index is None:
+            return
+        last = self.items.pop()
+        if index < len(self.items):
+            self.items[index] = last
+            self.positions[last] = index
+
+    def choice(self):
+        return random.choice(self.items)
+
+
+class SparsePool:
+    """
+    Все клетки поля, кроме удаленных. Хранятся только удаленные клетки,
+    поэтому для огромного поля память растет с числом выстрелов,
+    а не с площадью. Интерфейс тот же, что у IndexedPool.
+    """
+    # Сколько раз пробовать случайную клетку, прежде чем искать
+    # свободную обходом: нужно, только когда почти все клетки удалены
+    CHOICE_ATTEMPTS = 64
+
+    def __init__(self, field_size, removed=()):
+        self.width, self.height = field_size
+        self.removed = set(removed)
+
+    def __len__(self):
+        return self.width * self.height - len(self.removed)
+
+    def __contains__(self, item):
+        x, y = item
+        return (0 <= x < self.width and 0 <= y < self.height and
+                item not in self.removed)
+
+    def __iter__(self):
+        for y in range(self.height):
+            for x in range(self.width):
+                if (x, y) not in self.removed:
+                    yield x, y
+
+    def __eq__(self, other):
+        if isinstance(other, SparsePool):
+            return ((self.width, self.height, self.removed) ==
+                    (other.width, other.height, other.removed))
+        return set(self) == set(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"SparsePool(({self.width}, {self.height}), "
+                f"removed={len(self.removed)})")
+
+    def copy(self):
+        return SparsePool((self.width, self.height), self.removed)
+
+    def add(self, item):
+        self.removed.discard(item)
+
+    def remove(self, item):
+        if item not in self:
+            raise KeyError(item)
+        self.removed.add(item)
+
+    def discard(self, item):
+        if item in self:
+            self.removed.add(item)
+
+    def choice(self):
+        if not len(self):
+            raise IndexError("Cannot choose from an empty pool")
+        width, height = self.width, self.height
+        for _ in range(self.CHOICE_ATTEMPTS):
+            cell = (random.randrange(width), random.randrange(height))
+            if cell not in self.removed:
+                return cell
+        area = width * height
+        start = random.randrange(area)
+        for offset in range(area):
+            index = (start + offset) % area
+            cell = (index % width, index // width)
+            if cell not in self.removed:
+                return cell
@@ -0,0 +1,128 @@
+from game.constans import SHIP, DAMAGED
+
+
+class ShipRegistry:
+    """
+    Реестр кораблей поля: номер корабля в каждой его клетке,
+    список клеток корабля и число его неподбитых клеток.
+    Также ведет счетчики состояния флота: сколько всего неподбитых
+    клеток осталось и сколько кораблей каждого размера еще на плаву.
+    """
+    def __init__(self):
+        self.ship_at = {}
+        self.ship_cells = {}
+        self.health = {}
+        self.next_id = 0
+        self.intact_cells = 0
+        self.afloat = {}
+
+    def clear(self):
+        self.ship_at.clear()
+        self.ship_cells.clear()
+        self.health.clear()
+        self.intact_cells = 0
+        self.afloat.clear()
+
+    def add_ship(self, cells, health=None):
+        ship_id = self.next_id
+        self.next_id += 1
+        cells = list(cells)
+        self.ship_at.update(dict.fromkeys(cells, ship_id))
+        self.ship_cells[ship_id] = cells
+        size = len(cells)
+        if health is None:
+            health = size
+        self.health[ship_id] = health
+        self.intact_cells += health
+        if health:
+            self.afloat[size] = self.afloat.get(size, 0) + 1
+        return ship_id
+
+    def remove_ship(self, ship_id):
+        cells = self.ship_cells.pop(ship_id)
+        for cell in cells:
+            del self.ship_at[cell]
+        health = self.health.pop(ship_id)
+        self.intact_cells -= health
+        if health:
+            self.afloat[len(cells)] -= 1
+
+    def find(self, x, y):
+        """
+        Номер корабля в клетке (x, y) или None
+        """
+        return self.ship_at.get((x, y))
+
+    def cells(self, ship_id):
+        return self.ship_cells[ship_id]
+
+    def is_sunk(self, ship_id):
+        return self.health[ship_id] == 0
+
+    def hit(self, x, y):
+        """
+        Учет попадания в неподбитую клетку корабля
+        """
+        ship_id = self.ship_at.get((x, y))
+        if ship_id is not None:
+            self.health[ship_id] -= 1
+            self.intact_cells -= 1
+            if self.health[ship_id] == 0:
+                self.afloat[len(self.ship_cells[ship_id])] -= 1
+        return ship_id
+
+    def fleet_destroyed(self):
+        return self.intact_cells == 0
+
+    def ships_left(self, size=None):
+        """
+        Число кораблей на плаву (всего или заданного размера)
+        """
+        if size is None:
+            return sum(self.afloat.values())
+        return self.afloat.get(size, 0)
+
+    def move(self, ship_id, new_cells):
+        for cell in self.ship_cells[ship_id]:
+            del self.ship_at[cell]
+        new_cells = list(new_cells)
+        for cell in new_cells:
+            self.ship_at[cell] = ship_id
+        self.ship_cells[ship_id] = new_cells
+
+    def rebuild(self, field):
+        """
+        Заполнение реестра по кораблям, уже стоящим на поле.
+        Корабли прямые, поэтому первая встреченная при обходе по строкам
+        клетка корабля — его левая верхняя клетка.
+        """
+        self.clear()
+        field_size_y = len(field)
+        field_size_x = len(field[0])
+        for y, row in enumerate(field):
+            for x, cage in enumerate(row):
+                if ((cage != SHIP and cage != DAMAGED) or
+                        (x, y) in self.ship_at):
+                    continue
+                cells = [(x, y)]
+                a, b = x + 1, y
+                while a < field_size_x and field[b][a] in (SHIP, DAMAGED):
+                    cells.append((a, b))
+                    a += 1
+                if len(cells) == 1:
+                    a, b = x, y + 1
+                    while (b < field_size_y and
+                           field[b][a] in (SHIP, DAMAGED)):
+                        cells.append((a, b))
+                        b += 1
+                health = sum(field[j][i] == SHIP for i, j in cells)
+                self.add_ship(cells, health)
+
+
+def register_ship(field, cells):
+    """
+    Добавляет корабль в реестр поля, если у поля есть реестр
+    """
+    registry = getattr(field, 'registry', None)
+    if registry is not None:
+        registry.add_ship(cells)
@@ -0,0 +1,324 @@
+import argparse
+import asyncio
+from collections import deque
+
+from game.constans import FIELDSIZE_DEFAULT, EMPTY, SHIP, DAMAGED, MISSED
+from game.engine import (MINES_COUNT, Salvo, MoveShip, Surrender, Hit,
+                         SalvoFired, MineExploded, TurnPassed, duel_state,
+                         apply, place_mines)
+from game.errors import MoveError
+from game.field import make_field
+from game.fleet import fleet_for_size
+from game.utils import random_place_fleet, correct_field_size
+
+MAX_LINE = 1024
+MAX_WRITE_BUFFER = 64 * 1024
+
+STEPS = {
+    'up': (0, -1), 'вверх': (0, -1),
+    'down': (0, 1), 'вниз': (0, 1),
+    'left': (-1, 0), 'влево': (-1, 0),
+    'right': (1, 0), 'вправо': (1, 0),
+}
+
+# Поле в строке протокола: строки через '/', корабли соперника скрыты
+OWN_CODES = str.maketrans({EMPTY: '.', SHIP: 'S', DAMAGED: 'X', MISSED: 'o'})
+ENEMY_CODES = str.maketrans({EMPTY: '.', SHIP: '.', DAMAGED: 'X',
+                             MISSED: 'o'})
+
+
+def encode_field(field, codes):
+    return "/".join("".join(row).translate(codes) for row in field)
+
+
+def parse_numbers(words, count):
+    if len(words) != count:
+        raise MoveError(f"Нужно {count} чисел")
+    try:
+        return [int(word) for word in words]
+    except ValueError:
+        raise MoveError("Координаты должны быть целыми числами")
+
+
+class Session:
+    """
+    Подключение игрока: имя, текущая партия и номер в ней
+    """
+    def __init__(self, writer, number):
+        self.writer = writer
+        self.name = f"player{number}"
+        self.match = None
+        self.index = None
+
+    def send(self, *lines):
+        if self.writer.is_closing():
+            return
+        self.writer.write(("\n".join(lines) + "\n").encode("utf-8"))
+        # Клиент, который не читает ответы, не должен копить память
+        transport = self.writer.transport
+        if transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            transport.abort()
+
+
+class Match:
+    """
+    Партия 1 на 1 по особым правилам: залп размером с выбранный корабль,
+    одно перемещение корабля за ход и скрытые мины соперника.
+    Правила выполняет автомат партии из game.engine.
+    """
+    def __init__(self, first, second, field_size):
+        self.players = (first, second)
+        fields = (make_field(field_size), make_field(field_size))
+        ships = fleet_for_size(field_size)
+        for field in fields:
+            random_place_fleet(field, ships)
+        self.state = duel_state(*fields)
+
+    @property
+    def fields(self):
+        return self.state.fields
+
+    @property
+    def current(self):
+        return self.state.current
+
+    @property
+    def winner(self):
+        return self.state.winner
+
+    def opponent(self, index):
+        return self.players[1 - index]
+
+    def apply(self, action):
+        events, self.state = apply(self.state, action)
+        return events
+
+    def place_mines(self, index, cells):
+        events, self.state = place_mines(self.state, index, cells)
+        return events
+
+
+class LobbyServer:
+    """
+    Сервер режима 1 на 1: лобби, подбор соперника и партии по строковому
+    протоколу. Все правила выполняются синхронно в обработчике строки,
+    поэтому ход занимает микросекунды и не блокирует другие партии.
+    """
+    def __init__(self, field_size=FIELDSIZE_DEFAULT):
+        self.field_size = field_size
+        self.waiting = deque()
+        self.sessions = set()
+        self.matches = set()
+        self.server = None
+        self.connections = 0
+        self.handlers = set()
+
+    async def start(self, host="127.0.0.1", port=0):
+        self.server = await asyncio.start_server(self.handle, host, port,
+                                                 limit=MAX_LINE)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self.server.close()
+        for session in list(self.sessions):
+            session.writer.close()
+        # Обработчики подключений должны завершиться до остановки цикла
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        task.add_done_callback(self.handlers.discard)
+        self.connections += 1
+        session = Session(writer, self.connections)
+        self.sessions.add(session)
+        session.send("HELLO sea-battle 1")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                words = line.decode("utf-8", errors="replace").split()
+                if words and not self.dispatch(session, words):
+                    break
+        except (ConnectionError, ValueError):
+            # ValueError — слишком длинная строка
+            pass
+        finally:
+            self.disconnect(session)
+            writer.close()
+
+    def dispatch(self, session, words):
+        """
+        Выполнение команды игрока. Возвращает False, если
+        соединение нужно закрыть.
+        """
+        command, args = words[0].upper(), words[1:]
+        try:
+            if command == "QUIT":
+                session.send("BYE")
+                return False
+            handler = self.commands.get(command)
+            if handler is None:
+                raise MoveError(f"Неизвестная команда {command}")
+            handler(self, session, args)
+        except MoveError as error:
+            session.send(f"ERR {error}")
+        return True
+
+    def command_name(self, session, args):
+        if not args:
+            raise MoveError("Укажите имя")
+        session.name = " ".join(args)[:32]
+        session.send("OK")
+
+    def command_play(self, session, args):
+        if session.match is not None or session in self.waiting:
+            raise MoveError("Вы уже в игре или в очереди")
+        while self.waiting:
+            opponent = self.waiting.popleft()
+            if opponent in self.sessions:
+                self.start_match(opponent, session)
+                return
+        self.waiting.append(session)
+        session.send("WAIT")
+
+    def start_match(self, first, second):
+        match = Match(first, second, self.field_size)
+        self.matches.add(match)
+        field_size_x, field_size_y = self.field_size
+        for index, session in enumerate(match.players):
+            session.match = match
+            session.index = index
+            session.send(
+                f"MATCH {index + 1} {field_size_x} {field_size_y} "
+                f"{match.opponent(index).name}",
+                f"OWN {encode_field(match.fields[index], OWN_CODES)}",
+                f"PLACE_MINES {MINES_COUNT}")
+
+    def current_match(self, session):
+        if session.match is None:
+            raise MoveError("Вы не в игре")
+        return session.match
+
+    def command_mines(self, session, args):
+        match = self.current_match(session)
+        numbers = parse_numbers(args, MINES_COUNT * 2)
+        cells = list(zip(numbers[::2], numbers[1::2]))
+        events = match.place_mines(session.index, cells)
+        session.send("OK")
+        if any(type(event) is TurnPassed for event in events):
+            self.broadcast(match, "START")
+            self.after_action(match, events)
+
+    def command_shot(self, session, args):
+        match = self.current_match(session)
+        ship_x, ship_y, x, y = parse_numbers(args, 4)
+        events = match.apply(Salvo(session.index, ship_x, ship_y, x, y))
+        salvo = next(event for event in events if type(event) is SalvoFired)
+        cells = " ".join(f"{a},{b}" for a, b in salvo.cells)
+        hits = " ".join(f"{event.x},{event.y}" for event in events
+                        if type(event) is Hit)
+        self.broadcast(match, f"SALVO {session.index + 1} {cells}",
+                       f"HITS {session.index + 1} {hits}".rstrip())
+        self.after_action(match, events)
+
+    def command_move(self, session, args):
+        match = self.current_match(session)
+        if len(args) != 3 or args[2].lower() not in STEPS:
+            raise MoveError("Формат: MOVE x y up|down|left|right")
+        ship_x, ship_y = parse_numbers(args[:2], 2)
+        events = match.apply(MoveShip(session.index, ship_x, ship_y,
+                                      *STEPS[args[2].lower()]))
+        self.broadcast(match, f"MOVED {session.index + 1}")
+        self.after_action(match, events)
+
+    def command_surrender(self, session, args):
+        match = self.current_match(session)
+        match.apply(Surrender(session.index))
+        self.finish(match)
+
+    def command_board(self, session, args):
+        match = self.current_match(session)
+        self.send_boards(match, session.index)
+
+    commands = {
+        "NAME": command_name,
+        "PLAY": command_play,
+        "MINES": command_mines,
+        "SHOT": command_shot,
+        "MOVE": command_move,
+        "SURRENDER": command_surrender,
+        "BOARD": command_board,
+    }
+
+    def broadcast(self, match, *lines):
+        for session in match.players:
+            session.send(*lines)
+
+    def send_boards(self, match, index):
+        match.players[index].send(
+            f"OWN {encode_field(match.fields[index], OWN_CODES)}",
+            f"ENEMY {encode_field(match.fields[1 - index], ENEMY_CODES)}")
+
+    def announce_turn(self, match):
+        for index in (0, 1):
+            self.send_boards(match, index)
+        self.broadcast(match, f"TURN {match.current + 1}")
+
+    def after_action(self, match, events):
+        exploded = {event.player for event in events
+                    if type(event) is MineExploded}
+        for index in sorted(exploded):
+            self.broadcast(match, f"MINE {index + 1}")
+        if match.winner is not None:
+            self.finish(match)
+        else:
+            self.announce_turn(match)
+
+    def finish(self, match):
+        for index in (0, 1):
+            self.send_boards(match, index)
+        self.broadcast(match, f"WIN {match.winner + 1}")
+        for session in match.players:
+            session.match = None
+            session.index = None
+        self.matches.discard(match)
+
+    def disconnect(self, session):
+        self.sessions.discard(session)
+        if session in self.waiting:
+            self.waiting.remove(session)
+        match = session.match
+        if match is not None:
+            match.apply(Surrender(session.index))
+            self.finish(match)
+
+
+async def serve(host, port, field_size):
+    lobby = LobbyServer(field_size)
+    port = await lobby.start(host, port)
+    print(f"Сервер слушает {host}:{port}")
+    await lobby.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Сервер режима 1 на 1 по строковому протоколу")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--field-size", type=int, nargs=2,
+                        default=FIELDSIZE_DEFAULT)
+    args = parser.parse_args()
+    field_size = tuple(args.field_size)
+    if not correct_field_size(field_size, ships=None):
+        parser.error("некорректный размер поля")
+    try:
+        asyncio.run(serve(args.host, args.port, field_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
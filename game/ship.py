@@ -1,5 +1,10 @@
 import random
+from game.bitboard import BitField
 from game.constans import EMPTY, SHIP, DAMAGED
+from game.instrument import STATS_ENABLED, count, observe, instrument_module
+from game.neighbours import STEPS_4, neighbour_tables
+from game.registry import register_ship
+from game.sparse import SparseField
 
 
 def ship_not_near(field, x, y, ship_size, position):
@@ -7,6 +12,8 @@ def ship_not_near(field, x, y, ship_size, position):
     Проверяет, можно ли разместить
     корабль в (x, y) с учетом границ и соседних кораблей.
     """
+    if isinstance(field, (BitField, SparseField)):
+        return field.ship_not_near(x, y, ship_size, position)
     field_size_y = len(field)
     field_size_x = len(field[0])
     ship_coords = []
@@ -29,24 +36,20 @@ def ship_not_near(field, x, y, ship_size, position):
                 return False
             ship_coords.append((cage_x, cage_y))
 
+    # Клетки самого корабля пусты, поэтому SHIP среди соседей —
+    # всегда чужой корабль
+    near = neighbour_tables(field_size_x, field_size_y)[1]
     for ship_x, ship_y in ship_coords:
-        for dx in range(-1, 2):
-            for dy in range(-1, 2):
-                if dx == 0 and dy == 0:
-                    continue
-                check_x = ship_x + dx
-                check_y = ship_y + dy
-                if (0 <= check_x < field_size_x and
-                        0 <= check_y < field_size_y):
-                    if (check_x, check_y) not in ship_coords:
-                        if field[check_y][check_x] == SHIP:
-                            return False
+        for check_x, check_y in near[ship_y][ship_x]:
+            if field[check_y][check_x] == SHIP:
+                return False
     return True
 
 
 def random_place_ship(field, ship_size):
     """
-    Случайная расстановка корабля
+    Случайная расстановка корабля. Если случайные попытки
+    не удались, выбирается одно из всех допустимых положений.
     """
     field_size_y = len(field)
     field_size_x = len(field[0])
@@ -67,36 +70,70 @@ def random_place_ship(field, ship_size):
             x = random.randint(0, field_size_x - 1)
             y = random.randint(0, field_size_y - ship_size)
         if ship_not_near(field, x, y, ship_size, position):
-            if position == 'h':
-                for i in range(ship_size):
-                    field[y][x + i] = SHIP
-            else:
-                for i in range(ship_size):
-                    field[y + i][x] = SHIP
+            _put_ship(field, x, y, ship_size, position)
+            if STATS_ENABLED:
+                observe("random_place_ship.attempts", attempts)
             return True
-    print(f"Ошибка: Не удалось разместить корабль")
-    return False
+
+    # Обход всех положений на разреженном поле занял бы часы
+    if isinstance(field, SparseField):
+        return False
+    positions = []
+    for position in ('h', 'v'):
+        for y in range(field_size_y):
+            for x in range(field_size_x):
+                if ship_not_near(field, x, y, ship_size, position):
+                    positions.append((x, y, position))
+    if STATS_ENABLED:
+        observe("random_place_ship.attempts", attempts)
+        observe("random_place_ship.fallback_positions", len(positions))
+    if not positions:
+        return False
+    x, y, position = random.choice(positions)
+    _put_ship(field, x, y, ship_size, position)
+    return True
+
+
+def _put_ship(field, x, y, ship_size, position):
+    if position == 'h':
+        cells = [(x + i, y) for i in range(ship_size)]
+    else:
+        cells = [(x, y + i) for i in range(ship_size)]
+    for cage_x, cage_y in cells:
+        field[cage_y][cage_x] = SHIP
+    register_ship(field, cells)
 
 
 def find_ship_cages(field, x, y):
     """
     Определяются занимаемые данным кораблем клетки
     """
-    field_size_y = len(field)
-    field_size_x = len(field[0])
+    registry = getattr(field, 'registry', None)
+    if registry is not None:
+        ship_id = registry.find(x, y)
+        if ship_id is not None:
+            if STATS_ENABLED:
+                count("find_ship_cages.registry")
+            return list(registry.cells(ship_id))
 
-    steps = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-    cages = []
+    if isinstance(field, SparseField):
+        near = field.neighbour_view(STEPS_4)
+    else:
+        near = neighbour_tables(len(field[0]), len(field))[0]
+    cages = [(x, y)]
+    seen = {(x, y)}
     stack = [(x, y)]
     while stack:
         a, b = stack.pop()
-        if (a, b) not in cages:
-            cages.append((a, b))
-            for i, j in steps:
-                c = a + i
-                d = b + j
-                if (0 <= c < field_size_x and
-                        0 <= d < field_size_y and ((c, d) not in cages)):
-                    if field[d][c] == DAMAGED or field[d][c] == SHIP:
-                        stack.append((c, d))
+        for c, d in near[b][a]:
+            if (c, d) not in seen and (field[d][c] == DAMAGED or
+                                       field[d][c] == SHIP):
+                seen.add((c, d))
+                cages.append((c, d))
+                stack.append((c, d))
+    if STATS_ENABLED:
+        observe("find_ship_cages.flood_size", len(cages))
     return cages
+
+
+instrument_module(globals())
@@ -0,0 +1,104 @@
+import random
+import time
+from collections import namedtuple
+
+from game.constans import FIELDSIZE_DEFAULT
+from game.engine import duel_state, apply, place_mines
+from game.field import make_field, check_ship_full_destroyed
+from game.fleet import fleet_for_size
+from game.movelog import MoveLog, SHOT
+from game.player_move import is_hit_classic
+from game.utils import random_place_fleet, game_over, init_available_cells
+
+GameResult = namedtuple('GameResult', ['winner', 'shots', 'duration'])
+
+
+def play_headless_game(first_ai, second_ai,
+                       field_size=FIELDSIZE_DEFAULT, seed=None, record=None,
+                       ships=None):
+    """
+    Партия бот против бота по классическим правилам
+    без консольного ввода-вывода.
+    Возвращает номер победителя (0 или 1), число выстрелов
+    каждого бота и длительность партии в секундах.
+    Если передан двоичный поток record, в него пишется журнал партии
+    (целое зерно попадает в заголовок журнала).
+    По умолчанию флот выбирается по размеру поля.
+    """
+    if seed is not None:
+        random.seed(seed)
+    start = time.perf_counter()
+
+    if ships is None:
+        ships = fleet_for_size(field_size)
+    bots = (first_ai, second_ai)
+    fields = (make_field(field_size), make_field(field_size))
+    for field in fields:
+        random_place_fleet(field, ships)
+    log = None
+    if record is not None:
+        log = MoveLog(record, fields,
+                      seed if isinstance(seed, int) else None)
+        for field in fields:
+            log.record_field(field)
+    available_cells = (init_available_cells(field_size),
+                       init_available_cells(field_size))
+    shots = [0, 0]
+    current = 0
+
+    while True:
+        ai = bots[current]
+        enemy_field = fields[1 - current]
+        cells = available_cells[current]
+        x, y = ai.make_move(cells)
+        cells.remove((x, y))
+        shots[current] += 1
+        if log is not None:
+            log.record(SHOT, enemy_field, x, y)
+        if is_hit_classic(x, y, enemy_field):
+            destroyed = check_ship_full_destroyed(enemy_field, x, y, cells)
+            ai.register_hit(x, y, destroyed)
+            # Игра может закончиться только после уничтожения корабля
+            if destroyed and game_over(enemy_field):
+                return GameResult(current, tuple(shots),
+                                  time.perf_counter() - start)
+        else:
+            ai.register_miss()
+            current = 1 - current
+
+
+def play_headless_duel(first_ai, second_ai,
+                       field_size=FIELDSIZE_DEFAULT, seed=None, ships=None):
+    """
+    Партия бот против бота в режиме 1 на 1 по особым правилам
+    без консольного ввода-вывода. Боты — DuelAi или с тем же
+    интерфейсом: place_mines, choose_action и observe.
+    Возвращает номер победителя, число действий каждого бота
+    и длительность партии в секундах.
+    """
+    if seed is not None:
+        random.seed(seed)
+    start = time.perf_counter()
+
+    if ships is None:
+        ships = fleet_for_size(field_size)
+    bots = (first_ai, second_ai)
+    fields = (make_field(field_size), make_field(field_size))
+    for field in fields:
+        random_place_fleet(field, ships)
+    state = duel_state(*fields)
+    for player, ai in enumerate(bots):
+        events, state = place_mines(state, player, ai.place_mines())
+        for index, observer in enumerate(bots):
+            observer.observe(state, events, index)
+    actions = [0, 0]
+
+    while state.winner is None:
+        current = state.current
+        events, state = apply(state, bots[current].choose_action(state,
+                                                                 current))
+        actions[current] += 1
+        for index, observer in enumerate(bots):
+            observer.observe(state, events, index)
+    return GameResult(state.winner, tuple(actions),
+                      time.perf_counter() - start)
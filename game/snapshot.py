@@ -0,0 +1,210 @@
+import struct
+from collections import namedtuple
+
+from game.Ai import Ai
+from game.constans import EMPTY, SHIP, DAMAGED, MISSED, FIELDSIZE_MAX
+from game.field import Field
+
+SAVE_PATH = "savegame.bin"
+
+MAGIC = b"SB"
+VERSION = 1
+MODE_CLASSIC = 0
+MODE_DUEL = 1
+
+NO_CELL = 0xFFFF
+
+HEADER = struct.Struct("<2sBBHH")
+CLASSIC_STATE = struct.Struct("<BI")
+DUEL_STATE = struct.Struct("<BB")
+AI_STATE = struct.Struct("<BHHHHbb")
+CELL = struct.Struct("<HH")
+
+ClassicGame = namedtuple('ClassicGame', [
+    'player_name', 'player_field', 'bot_field', 'ai',
+    'player_turn', 'player_moves'])
+# Мины player1_mins стоят на поле первого игрока, player2_mins — второго
+DuelGame = namedtuple('DuelGame', [
+    'player1_name', 'player2_name', 'player1_field', 'player2_field',
+    'player1_mins', 'player2_mins', 'current_player', 'moved_ship'])
+
+# Клетка поля кодируется двумя битами, четыре клетки в байте;
+# таблицы переводят четверки клеток в байт и обратно
+CELL_VALUES = (EMPTY, SHIP, DAMAGED, MISSED)
+PACK = {a + b + c + d: i | j << 2 | k << 4 | m << 6
+        for i, a in enumerate(CELL_VALUES)
+        for j, b in enumerate(CELL_VALUES)
+        for k, c in enumerate(CELL_VALUES)
+        for m, d in enumerate(CELL_VALUES)}
+UNPACK = tuple(CELL_VALUES[byte & 3] + CELL_VALUES[byte >> 2 & 3] +
+               CELL_VALUES[byte >> 4 & 3] + CELL_VALUES[byte >> 6]
+               for byte in range(256))
+
+
+class SnapshotError(ValueError):
+    """
+    Сохранение повреждено или записано неизвестной версией формата
+    """
+
+
+def pack_field(field):
+    cells = "".join(["".join(row) for row in field])
+    cells += EMPTY * (-len(cells) % 4)
+    return bytes([PACK[cells[i:i + 4]] for i in range(0, len(cells), 4)])
+
+
+def unpack_field(data, offset, field_size):
+    field_size_x, field_size_y = field_size
+    count = field_size_x * field_size_y
+    end = offset + (count + 3) // 4
+    if end > len(data):
+        raise SnapshotError("Сохранение обрезано")
+    cells = "".join([UNPACK[byte] for byte in data[offset:end]])
+    field = Field(list(cells[i:i + field_size_x])
+                  for i in range(0, count, field_size_x))
+    field.registry.rebuild(field)
+    return field, end
+
+
+def pack_name(name):
+    data = name.encode("utf-8")[:255]
+    return bytes((len(data),)) + data
+
+
+def unpack_name(data, offset):
+    end = offset + 1 + data[offset]
+    return data[offset + 1:end].decode("utf-8", errors="ignore"), end
+
+
+def pack_cell(cell):
+    return (NO_CELL, NO_CELL) if cell is None else cell
+
+
+def unpack_cell(x, y):
+    return None if x == NO_CELL else (x, y)
+
+
+def pack_ai(ai):
+    direction = ai.direction or (0, 0)
+    return AI_STATE.pack(ai.direction is not None,
+                         *pack_cell(ai.first_hit), *pack_cell(ai.last_hit),
+                         *direction)
+
+
+def unpack_ai(data, offset):
+    has_direction, x1, y1, x2, y2, dx, dy = AI_STATE.unpack_from(data, offset)
+    ai = Ai()
+    ai.first_hit = unpack_cell(x1, y1)
+    ai.last_hit = unpack_cell(x2, y2)
+    ai.direction = (dx, dy) if has_direction else None
+    return ai, offset + AI_STATE.size
+
+
+def pack_mins(mins):
+    return bytes((len(mins),)) + b"".join(CELL.pack(*cell) for cell in mins)
+
+
+def unpack_mins(data, offset, field_size):
+    field_size_x, field_size_y = field_size
+    count = data[offset]
+    offset += 1
+    mins = [CELL.unpack_from(data, offset + i * CELL.size)
+            for i in range(count)]
+    if not all(x < field_size_x and y < field_size_y for x, y in mins):
+        raise SnapshotError("Мина за пределами поля")
+    return mins, offset + count * CELL.size
+
+
+def dumps(game):
+    """
+    Двоичный снимок партии: заголовок с версией формата, состояние хода,
+    имена, состояние бота или мины и поля по два бита на клетку
+    """
+    if isinstance(game, ClassicGame):
+        field = game.player_field
+        parts = [HEADER.pack(MAGIC, VERSION, MODE_CLASSIC,
+                             len(field[0]), len(field)),
+                 CLASSIC_STATE.pack(game.player_turn, game.player_moves),
+                 pack_name(game.player_name),
+                 pack_ai(game.ai),
+                 pack_field(game.player_field),
+                 pack_field(game.bot_field)]
+    elif isinstance(game, DuelGame):
+        field = game.player1_field
+        parts = [HEADER.pack(MAGIC, VERSION, MODE_DUEL,
+                             len(field[0]), len(field)),
+                 DUEL_STATE.pack(game.current_player, game.moved_ship),
+                 pack_name(game.player1_name),
+                 pack_name(game.player2_name),
+                 pack_mins(game.player1_mins),
+                 pack_mins(game.player2_mins),
+                 pack_field(game.player1_field),
+                 pack_field(game.player2_field)]
+    else:
+        raise TypeError(f"Нельзя сохранить {type(game).__name__}")
+    return b"".join(parts)
+
+
+def loads(data):
+    """
+    Восстановление партии из снимка. Реестры кораблей
+    строятся заново по полям.
+    """
+    try:
+        magic, version, mode, field_size_x, field_size_y = (
+            HEADER.unpack_from(data))
+        if magic != MAGIC:
+            raise SnapshotError("Это не сохранение игры")
+        if version != VERSION:
+            raise SnapshotError(f"Неизвестная версия сохранения {version}")
+        if not (1 <= field_size_x <= FIELDSIZE_MAX and
+                1 <= field_size_y <= FIELDSIZE_MAX):
+            raise SnapshotError(f"Некорректный размер поля "
+                                f"{field_size_x}x{field_size_y}")
+        field_size = (field_size_x, field_size_y)
+        offset = HEADER.size
+        if mode == MODE_CLASSIC:
+            player_turn, player_moves = CLASSIC_STATE.unpack_from(data,
+                                                                  offset)
+            offset += CLASSIC_STATE.size
+            player_name, offset = unpack_name(data, offset)
+            ai, offset = unpack_ai(data, offset)
+            player_field, offset = unpack_field(data, offset, field_size)
+            bot_field, offset = unpack_field(data, offset, field_size)
+            return ClassicGame(player_name, player_field, bot_field, ai,
+                               bool(player_turn), player_moves)
+        if mode == MODE_DUEL:
+            current_player, moved_ship = DUEL_STATE.unpack_from(data, offset)
+            offset += DUEL_STATE.size
+            if current_player not in (1, 2):
+                raise SnapshotError(f"Некорректный номер игрока "
+                                    f"{current_player}")
+            player1_name, offset = unpack_name(data, offset)
+            player2_name, offset = unpack_name(data, offset)
+            player1_mins, offset = unpack_mins(data, offset,
+                                                field_size)
+            player2_mins, offset = unpack_mins(data, offset,
+                                                field_size)
+            player1_field, offset = unpack_field(data, offset, field_size)
+            player2_field, offset = unpack_field(data, offset, field_size)
+            return DuelGame(player1_name, player2_name,
+                            player1_field, player2_field,
+                            player1_mins, player2_mins,
+                            current_player, bool(moved_ship))
+    except SnapshotError:
+        raise
+    except (struct.error, IndexError) as error:
+        raise SnapshotError("Сохранение обрезано") from error
+    except ValueError as error:
+        raise SnapshotError(f"Сохранение повреждено: {error}") from error
+    raise SnapshotError(f"Неизвестный режим игры {mode}")
+
+
+def save_game(game, path=SAVE_PATH):
+    with open(path, "wb") as file:
+        file.write(dumps(game))
+
+
+def load_game(path=SAVE_PATH):
+    with open(path, "rb") as file:
+        return loads(file.read())
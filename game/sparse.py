@@ -0,0 +1,157 @@
+from game.constans import EMPTY, SHIP, MISSED
+from game.registry import ShipRegistry
+
+# Поля больше этой площади make_field создает разреженными:
+# список строк на 10 000 x 10 000 клеток не поместится в память
+SPARSE_AREA = 1 << 18
+
+STEPS_8 = tuple((dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+                if dx or dy)
+
+
+class NeighbourView:
+    """
+    Соседи клеток с тем же обращением [y][x], что у таблиц
+    neighbour_tables, но без хранения: считаются на лету
+    """
+    __slots__ = ('width', 'height', 'steps', 'y')
+
+    def __init__(self, width, height, steps, y=None):
+        self.width = width
+        self.height = height
+        self.steps = steps
+        self.y = y
+
+    def __getitem__(self, index):
+        if self.y is None:
+            return NeighbourView(self.width, self.height, self.steps, index)
+        x, y = index, self.y
+        return [(x + dx, y + dy) for dx, dy in self.steps
+                if 0 <= x + dx < self.width and 0 <= y + dy < self.height]
+
+
+class SparseRow:
+    """
+    Строка разреженного поля, ведущая себя как список клеток
+    """
+    __slots__ = ('field', 'y')
+
+    def __init__(self, field, y):
+        self.field = field
+        self.y = y
+
+    def __len__(self):
+        return self.field.width
+
+    def __getitem__(self, x):
+        return self.field.cells.get((x, self.y), EMPTY)
+
+    def __setitem__(self, x, value):
+        self.field.set(x, self.y, value)
+
+    def __iter__(self):
+        get = self.field.cells.get
+        y = self.y
+        for x in range(self.field.width):
+            yield get((x, y), EMPTY)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+
+class SparseField:
+    """
+    Поле для очень больших карт: хранятся только непустые клетки
+    (корабли, выстрелы и ореолы) в словаре (x, y) -> клетка, поэтому
+    память растет с числом кораблей и выстрелов, а не с площадью.
+    Поддерживает обращение field[y][x]; функции, которым нужен обход
+    соседей или всего поля, для него вызывают методы ниже.
+    last — клетка, записанная последней: вокруг нее показывается
+    окно поля при отрисовке.
+    """
+    def __init__(self, field_size):
+        self.width, self.height = field_size
+        self.cells = {}
+        self.registry = ShipRegistry()
+        self.changes = None
+        self.last = (0, 0)
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        if not 0 <= y < self.height:
+            raise IndexError(y)
+        return SparseRow(self, y)
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield SparseRow(self, y)
+
+    def __eq__(self, other):
+        if isinstance(other, SparseField):
+            return ((self.width, self.height, self.cells) ==
+                    (other.width, other.height, other.cells))
+        return [list(row) for row in self] == other
+
+    __hash__ = None
+
+    def set(self, x, y, value):
+        self.last = (x, y)
+        if value == EMPTY:
+            self.cells.pop((x, y), None)
+        else:
+            self.cells[(x, y)] = value
+
+    def clear(self):
+        self.cells.clear()
+        self.registry.clear()
+        self.last = (0, 0)
+
+    def near(self, x, y):
+        """
+        Соседние клетки в пределах поля (8-связность)
+        """
+        width, height = self.width, self.height
+        return [(x + dx, y + dy) for dx, dy in STEPS_8
+                if 0 <= x + dx < width and 0 <= y + dy < height]
+
+    def neighbour_view(self, steps=STEPS_8):
+        return NeighbourView(self.width, self.height, steps)
+
+    def ship_not_near(self, x, y, ship_size, position):
+        dx, dy = (1, 0) if position == 'h' else (0, 1)
+        if (x + dx * (ship_size - 1) >= self.width or
+                y + dy * (ship_size - 1) >= self.height or
+                x < 0 or y < 0):
+            return False
+        cells = self.cells
+        ship = [(x + dx * i, y + dy * i) for i in range(ship_size)]
+        if any(cell in cells for cell in ship):
+            return False
+        return not any(cells.get(cell) == SHIP
+                       for a, b in ship for cell in self.near(a, b))
+
+    def mark_around(self, ship_cells):
+        """
+        Отмечает промахами пустые клетки корабля и вокруг него.
+        Возвращает отмеченные клетки.
+        """
+        cells = self.cells
+        marked = []
+        for x, y in ship_cells:
+            for cell in [(x, y)] + self.near(x, y):
+                if cell not in cells:
+                    cells[cell] = MISSED
+                    marked.append(cell)
+        return marked
+
+    def has_ships(self):
+        return SHIP in self.cells.values()
+
+    def shot_cells(self):
+        """
+        Клетки, в которые уже стреляли (подбитые и промахи)
+        """
+        return [cell for cell, cage in self.cells.items() if cage != SHIP]
+
@@ -0,0 +1,242 @@
+import os
+import shutil
+import sys
+
+from game.constans import MISSED, DAMAGED
+from game.field import (Field, render_field, CELL_TEXT, HIDDEN_CELL_TEXT,
+                        MINE_TEXT)
+
+CLEAR_SCREEN = "\x1b[2J\x1b[H"
+CLEAR_BELOW = "\x1b[J"
+RESET_SCROLL = "\x1b[r"
+GAP = 4
+# Строки внизу терминала под меню и сообщения хода. Они выделены
+# в отдельную область прокрутки, поэтому вывод меню не сдвигает кадр
+PROMPT_LINES = 6
+
+
+def ansi_mode_enabled():
+    """
+    Режим частичной перерисовки включается переменной окружения
+    SEA_BATTLE_ANSI=1 и работает только в настоящем терминале
+    """
+    return (os.environ.get("SEA_BATTLE_ANSI") == "1" and
+            sys.stdout.isatty())
+
+
+def move_to(row, column):
+    return f"\x1b[{row};{column}H"
+
+
+def scroll_region(top, bottom):
+    return f"\x1b[{top};{bottom}r"
+
+
+class BoardSlot:
+    """
+    Место поля в кадре и то, что сейчас нарисовано в каждой его клетке
+    """
+    def __init__(self, field, hide_ships, mins, title, top, left):
+        self.field = field
+        self.hide_ships = hide_ships
+        self.mins = mins
+        self.title = title
+        self.top = top
+        self.left = left
+        self.texts = [[cell_text(field, x, y, hide_ships, mins)
+                       for x in range(len(field[0]))]
+                      for y in range(len(field))]
+
+    def position(self, x, y):
+        """
+        Строка и столбец терминала (с 1) для символа клетки (x, y):
+        над полем заголовок, номера столбцов и разделитель,
+        строки поля чередуются с разделителями
+        """
+        return self.top + 4 + 2 * y, self.left + 4 * x + 6
+
+
+def cell_text(field, x, y, hide_ships, mins):
+    cage = field[y][x]
+    if (mins is not None and (x, y) in mins and
+            cage != MISSED and cage != DAMAGED):
+        return MINE_TEXT
+    if hide_ships:
+        return HIDDEN_CELL_TEXT[cage]
+    return CELL_TEXT[cage]
+
+
+class DiffRenderer:
+    """
+    Терминальный режим отрисовки: кадр с полями рисуется целиком
+    один раз, а затем перерисовываются только изменившиеся клетки
+    с помощью управляющих последовательностей позиционирования курсора.
+    Изменения берутся из журнала field.changes, который ведут функции,
+    меняющие поле; для полей без журнала клетки сравниваются
+    с прошлым кадром.
+    Под кадром остается область прокрутки для меню. Если кадр выше
+    или шире оставшейся части терминала, показывается окно кадра;
+    когда изменившаяся клетка оказывается за его пределами, окно
+    сдвигается к ней и перерисовывается только видимая часть.
+    """
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.slots = []
+        self.height = 0
+        self.width = 0
+        self.size = None
+        self.top = 0
+        self.left = 0
+
+    def write(self, text):
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write(text)
+        stream.flush()
+
+    def draw(self, boards):
+        """
+        boards — список кортежей (field, hide_ships, mins, title)
+        """
+        boards = [(field, hide_ships,
+                   set(mins) if hide_ships and mins else None, title)
+                  for field, hide_ships, mins, title in boards]
+        if (not self._same_layout(boards) or
+                shutil.get_terminal_size() != self.size):
+            self._draw_full(boards)
+            return
+        out = []
+        hidden = []
+        for slot, (field, hide_ships, mins, title) in zip(self.slots,
+                                                          boards):
+            changes = getattr(field, 'changes', None)
+            if (field is slot.field and hide_ships == slot.hide_ships and
+                    mins == slot.mins and changes is not None):
+                cells = list(changes)
+            else:
+                cells = [(x, y) for y in range(len(field))
+                         for x in range(len(field[0]))]
+            if changes is not None:
+                changes.clear()
+            for x, y in cells:
+                text = cell_text(field, x, y, hide_ships, mins)
+                if text != slot.texts[y][x]:
+                    slot.texts[y][x] = text
+                    row, column = slot.position(x, y)
+                    if self._visible(row, column):
+                        out.append(self._put(row, column, text[1]))
+                    else:
+                        hidden.append((row, column))
+            title = title.ljust(len(slot.title))
+            if title != slot.title:
+                if self._visible(slot.top + 1, slot.left + 1):
+                    out.append(self._put(slot.top + 1, slot.left + 1,
+                                         title))
+                slot.title = title
+            slot.field = field
+            slot.hide_ships = hide_ships
+            slot.mins = mins
+        if hidden:
+            self._draw_full(boards, hidden[0])
+            return
+        out.append(self._prompt())
+        self.write("".join(out))
+
+    def close(self):
+        """
+        Возврат терминала в обычный режим прокрутки
+        """
+        if self.size is not None:
+            self.write(RESET_SCROLL + move_to(self.size.lines, 1) + "\n")
+            self.size = None
+
+    def _view(self):
+        """
+        Число строк и столбцов терминала, отданных под кадр
+        """
+        return (max(self.size.lines - PROMPT_LINES, 1),
+                max(self.size.columns, 1))
+
+    def _visible(self, row, column):
+        rows, columns = self._view()
+        return (self.top < row <= self.top + rows and
+                self.left < column <= self.left + columns)
+
+    def _put(self, row, column, text):
+        """
+        Вывод текста с позиции кадра (row, column), обрезанного по окну
+        """
+        columns = self._view()[1]
+        text = text[:self.left + columns - column + 1]
+        return move_to(row - self.top, column - self.left) + text
+
+    def _prompt(self):
+        rows = self._view()[0]
+        return move_to(min(self.height, rows) + 1, 1) + CLEAR_BELOW
+
+    def _scroll_to(self, focus):
+        """
+        Сдвиг окна так, чтобы позиция кадра focus оказалась в его центре
+        """
+        rows, columns = self._view()
+        row, column = focus
+        self.top = min(max(row - 1 - rows // 2, 0),
+                       max(self.height - rows, 0))
+        self.left = min(max(column - 1 - columns // 2, 0),
+                        max(self.width - columns, 0))
+
+    def _same_layout(self, boards):
+        if len(boards) != len(self.slots):
+            return False
+        for slot, (field, hide_ships, mins, title) in zip(self.slots,
+                                                          boards):
+            if (len(field) != len(slot.texts) or
+                    len(field[0]) != len(slot.texts[0]) or
+                    len(title) > len(slot.title)):
+                return False
+        return True
+
+    def _draw_full(self, boards, focus=None):
+        blocks = [[title] + render_field(field, hide_ships, mins)
+                  for field, hide_ships, mins, title in boards]
+        widths = [max(len(line) for line in block) for block in blocks]
+        self.size = shutil.get_terminal_size()
+        columns = self.size.columns
+        side_by_side = sum(widths) + GAP * (len(blocks) - 1) <= columns
+
+        self.slots = []
+        lines = []
+        top = left = 0
+        for (field, hide_ships, mins, title), block, width in zip(
+                boards, blocks, widths):
+            self.slots.append(BoardSlot(field, hide_ships, mins,
+                                        title, top, left))
+            if isinstance(field, Field) and field.changes is None:
+                field.changes = set()
+            elif getattr(field, 'changes', None) is not None:
+                field.changes.clear()
+            if side_by_side:
+                for i, line in enumerate(block):
+                    if i == len(lines):
+                        lines.append("")
+                    lines[i] = lines[i].ljust(left) + line
+                left += width + GAP
+            else:
+                lines.extend(block)
+                lines.append("")
+                top += len(block) + 1
+        self.height = len(lines)
+        self.width = max(len(line) for line in lines)
+        if focus is None:
+            self.top = self.left = 0
+        else:
+            self._scroll_to(focus)
+        rows, columns = self._view()
+        shown = lines[self.top:self.top + rows]
+        out = [CLEAR_SCREEN, RESET_SCROLL]
+        for row, line in enumerate(shown, self.top + 1):
+            if len(line) > self.left:
+                out.append(self._put(row, self.left + 1,
+                                     line[self.left:]))
+        out.append(scroll_region(len(shown) + 1, self.size.lines))
+        out.append(self._prompt())
+        self.write("".join(out))
@@ -1,19 +1,95 @@
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
-from io import StringIO
-from unittest.mock import patch
+from io import BytesIO, StringIO
+from multiprocessing import Barrier, Process
+from unittest.mock import Mock, patch
 
-from game.Ai import Ai
+from game import Ai as ai_module
+from game.Ai import Ai, ProbabilityAi, DuelAi
 from game.field import (mark_around_ship, check_ship_full_destroyed,
-                        make_field, print_field)
-from game.main import main, start_game, run_1v1_game
+                        make_field, print_field, print_fields,
+                        render_field, render_viewport, grid_chrome)
+from game.main import main, start_game, run_1v1_game, setup_game
 from game.player_move import (is_hit_classic, is_hit_1v1,
-                              player_move_1v1, player_move_classic)
-from game.utils import (clear_field, game_over,
+                              player_move_1v1, player_move_classic,
+                              resolve_salvo)
+from game.utils import (clear_field, game_over, random_place_fleet,
                         init_available_cells, place_ship_manual,
                         correct_field_size, set_up_mins,
-                        check_mins, manual_ship_placement, move_ship)
+                        check_mins, manual_ship_placement, move_ship,
+                        record_score, display_scores)
 from game.ship import ship_not_near, random_place_ship, find_ship_cages
-from game.constans import EMPTY, SHIP, DAMAGED, MISSED, CROSSING, LINE
+from game.constans import (EMPTY, SHIP, DAMAGED, MISSED, CROSSING, LINE,
+                           SHIPS)
+from game.simulation import play_headless_game, play_headless_duel
+from game.bitboard import BitField
+from game.placement import place_fleet
+from game.registry import ShipRegistry
+from game.pool import IndexedPool, SparsePool
+from game.sparse import SparseField
+from game.neighbours import neighbour_tables
+from game.terminal import DiffRenderer, CLEAR_SCREEN
+from game.tournament import (run_tournament, wilson_interval, STRATEGIES,
+                             register_strategy, load_strategy)
+from game.leaderboard import Leaderboard, ScoreSink
+from game.benchmarks import (bench_scores, bench_gameplay, bench_bitboard,
+                             bench_neighbours, bench_replay)
+from game.movelog import (MoveLog, Replay, MODE_DUEL, MINE_PLACE,
+                          PLACE)
+from game import simulation
+from game import player_move
+from game.mines import Mines
+from game import feasibility
+from game import movelog
+from game.feasibility import fleet_layout, fleet_fits, solve
+from game.fleet import fleet_for_size, TARGET_DENSITY
+from game.server import LobbyServer
+from game.errors import MoveError
+from game.engine import (Shoot, Salvo, MoveShip, Surrender, Missed, Hit,
+                         SalvoFired, ShipMoved, MineExploded, TurnPassed,
+                         GameOver, classic_state, duel_state, apply,
+                         place_mines)
+from game.snapshot import (ClassicGame, DuelGame, SnapshotError, HEADER,
+                           dumps, loads, load_game)
+
+
+module_cache = None
+
+
+def setUpModule():
+    # Кэш решателя расстановки и журналы партий, которые пишут
+    # тесты, попадают во временный каталог, а не в текущий
+    global module_cache
+    module_cache = tempfile.TemporaryDirectory()
+    unittest.addModuleCleanup(module_cache.cleanup)
+    for patcher in (
+            patch.object(feasibility, "CACHE_PATH",
+                         os.path.join(module_cache.name, "fleet_fit.json")),
+            patch.object(movelog, "REPLAY_DIR",
+                         os.path.join(module_cache.name, "replays"))):
+        patcher.start()
+        unittest.addModuleCleanup(patcher.stop)
+
+
+def use_temp_fleet_cache(test):
+    """
+    Кэш решателя расстановки во временном каталоге теста
+    """
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    path = os.path.join(directory.name, "fleet_fit.json")
+    patcher = patch.object(feasibility, "CACHE_PATH", path)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    return path
 
 
 class TestShipPlacement(unittest.TestCase):
@@ -413,6 +489,17 @@ class TestGameLogic(unittest.TestCase):
         result = move_ship(field)
         self.assertFalse(result)
 
+    @patch('builtins.input', side_effect=['1 1', 'вправо'])
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_move_ship_goes_through_engine(self, mock_stdout, mock_input):
+        field = make_field((4, 4))
+        place_ship_manual(field, 2, 1, 1, 'h')
+        with patch('game.engine.apply', wraps=apply) as mock_apply:
+            self.assertTrue(move_ship(field))
+        self.assertEqual(mock_apply.call_args[0][1],
+                         MoveShip(0, 1, 1, 1, 0))
+        self.assertEqual(field[1][3], SHIP)
+
 
 class TestMainMenu(unittest.TestCase):
     @patch('builtins.input', side_effect=['0'])
@@ -433,25 +520,54 @@ class TestMainMenu(unittest.TestCase):
         main()
         mock_scores.assert_called_once()
 
-    @patch('builtins.input', side_effect=['TestPlayer', '1', 'да'])
-    @patch('game.main.print_field')
-    @patch('game.main.is_hit_classic', return_value=False)
-    @patch('game.main.player_move_classic', return_value=(0, 0))
-    def test_game_flow(self, mock_move, mock_hit, mock_print, mock_input):
-        with patch('game.main.game_over', side_effect=[False, False, True]):
+    @staticmethod
+    def one_ship_field(x, y):
+        field = make_field((10, 10))
+        place_ship_manual(field, 1, x, y, 'h')
+        return field
+
+    def classic_game(self, ai):
+        return ClassicGame("TestPlayer", self.one_ship_field(0, 0),
+                           self.one_ship_field(5, 5), ai, True, 0)
+
+    def duel_game(self):
+        return DuelGame("Player1", "Player2", self.one_ship_field(0, 0),
+                        self.one_ship_field(5, 5),
+                        [(9, 0), (9, 1), (9, 2), (9, 3), (9, 4)],
+                        [(9, 0), (9, 1), (9, 2), (9, 3), (9, 4)], 1, False)
+
+    @patch('game.main.record_score')
+    @patch('game.main.print_fields')
+    @patch('game.main.player_move_classic', side_effect=[(1, 1), (5, 5)])
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_game_flow(self, mock_stdout, mock_move, mock_print,
+                       mock_score):
+        ai = Mock()
+        ai.make_move.return_value = (3, 3)
+        with patch('game.main.setup_game',
+                   return_value=self.classic_game(ai)):
             start_game((10, 10))
-            self.assertTrue(mock_move.called)
-            self.assertTrue(mock_hit.called)
-
-    @patch('builtins.input', side_effect=['TestPlayer', '1', 'да'])
-    @patch('game.main.print_field')
-    @patch('game.main.is_hit_classic', return_value=False)
-    @patch('game.main.player_move_classic', return_value=(0, 0))
-    def test_game_flow_2(self, mock_move, mock_hit, mock_print, mock_input):
-        with patch('game.main.game_over', side_effect=[True]):
+        output = mock_stdout.getvalue()
+        self.assertIn("Вы промахнулись!", output)
+        self.assertIn("Соперник промахнулся!", output)
+        self.assertIn("Победа!", output)
+        ai.register_miss.assert_called_once()
+        mock_score.assert_called_once_with(2, "TestPlayer")
+
+    @patch('game.main.record_score')
+    @patch('game.main.print_fields')
+    @patch('game.main.player_move_classic', return_value=(1, 1))
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_game_flow_2(self, mock_stdout, mock_move, mock_print,
+                         mock_score):
+        ai = Mock()
+        ai.make_move.return_value = (0, 0)
+        with patch('game.main.setup_game',
+                   return_value=self.classic_game(ai)):
             start_game((10, 10))
-            self.assertTrue(mock_move.called)
-            self.assertTrue(mock_hit.called)
+        self.assertIn("Проигрыш!", mock_stdout.getvalue())
+        ai.register_hit.assert_called_once_with(0, 0, True)
+        self.assertFalse(mock_score.called)
 
     @patch('builtins.input', side_effect=[
         'Player1', 'Player2',
@@ -460,40 +576,84 @@ class TestMainMenu(unittest.TestCase):
         '',
         '1', 'да',
         '0 0', '0 1', '0 2', '0 3', '0 4',
-        '1',
-        '0 0',
-        '0 0',
         '3',
         ''
     ])
-    @patch('game.main.player_move_1v1', return_value=[(0, 0)])
-    @patch('game.main.check_mins', return_value=True)
-    @patch('game.main.game_over', side_effect=[False, True])
-    def test_1v1_flow(self, mock_over, mock_mins, mock_move, mock_input):
+    @patch('game.main.print_fields')
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_1v1_flow(self, mock_stdout, mock_print, mock_input):
         run_1v1_game((10, 10))
-        self.assertTrue(mock_mins.called)
-        self.assertTrue(mock_move.called)
+        self.assertIn("Победил Player2!", mock_stdout.getvalue())
+
+    @patch('builtins.input', side_effect=['1', '0 0', '5 5', ''])
+    @patch('game.main.print_fields')
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_1v1_salvo_wins(self, mock_stdout, mock_print, mock_input):
+        run_1v1_game((10, 10), self.duel_game())
+        output = mock_stdout.getvalue()
+        self.assertIn("1-палубным кораблем по [(5, 5)]", output)
+        self.assertIn("Победил Player1!", output)
+
+    @patch('builtins.input', side_effect=['1', '0 0', '9 9',
+                                          '1', '0 0', '5 5', ''])
+    @patch('game.main.print_fields')
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_1v1_against_bot(self, mock_stdout, mock_print, mock_input):
+        bot = DuelAi((10, 10), {1: 1})
+        with patch.object(bot, 'choose_action',
+                          return_value=Salvo(1, 5, 5, 9, 9)) as choose:
+            run_1v1_game((10, 10), self.duel_game(), bot)
+        output = mock_stdout.getvalue()
+        choose.assert_called_once()
+        self.assertIn("Player2 промахнулся!", output)
+        self.assertIn("Победил Player1!", output)
+        self.assertNotIn("Сохранить и выйти", output)
+        self.assertEqual(bot.fresh_misses, {(9, 9)})
+        self.assertEqual(bot.enemy_misses, {(9, 9)})
+
+    @patch('builtins.input', side_effect=['1', '0 0', '9 9',
+                                          '1', '0 0', '5 5', ''])
+    @patch('game.main.print_fields')
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_rejected_bot_action_falls_back(self, mock_stdout, mock_print,
+                                            mock_input):
+        bot = DuelAi((10, 10), {1: 1})
+        with patch.object(bot, 'choose_action',
+                          return_value=MoveShip(1, 0, 0, 1, 0)), \
+                patch.object(bot, 'fallback_salvo',
+                             return_value=Salvo(1, 5, 5, 9, 8)) as fallback:
+            run_1v1_game((10, 10), self.duel_game(), bot)
+        output = mock_stdout.getvalue()
+        self.assertIn("Ход бота MoveShip(player=1, ship_x=0, ship_y=0, "
+                      "dx=1, dy=0) отклонен", output)
+        fallback.assert_called_once()
+        self.assertIn("Победил Player1!", output)
+
+    @patch('builtins.input', side_effect=['6', '0'])
+    @patch('game.main.run_1v1_game')
+    def test_main_menu_bot_duel(self, mock_run, mock_input):
+        main()
+        bot = mock_run.call_args.kwargs['bot']
+        self.assertIsInstance(bot, DuelAi)
 
     @patch('builtins.input', side_effect=[
-        'Player1', 'Player2',
-        '1', 'да',
-        '0 0', '0 1', '0 2', '0 3', '0 4',
-        '',
-        '1', 'да',
-        '0 0', '0 1', '0 2', '0 3', '0 4',
-        '1',
-        '0 0',
-        '0 0',
+        '1', '3 3', '5 5',
+        '2', '0 0', 'вниз',
+        '1', '0 1', '2 2',
         '3',
         ''
     ])
-    @patch('game.main.player_move_1v1', return_value=[])
-    @patch('game.main.check_mins', return_value=True)
-    @patch('game.main.game_over', side_effect=[False, True])
-    def test_1v1_flow2(self, mock_over, mock_mins, mock_move, mock_input):
-        run_1v1_game((10, 10))
-        self.assertTrue(mock_mins.called)
-        self.assertTrue(mock_move.called)
+    @patch('game.main.print_fields')
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_1v1_flow2(self, mock_stdout, mock_print, mock_input):
+        game = self.duel_game()
+        run_1v1_game((10, 10), game)
+        output = mock_stdout.getvalue()
+        self.assertIn("нет вашего неподбитого корабля", output)
+        self.assertIn("Корабль успешно перемещен!", output)
+        self.assertIn("Player1 промахнулся!", output)
+        self.assertIn("Победил Player1!", output)
+        self.assertEqual(game.player1_field[1][0], SHIP)
 
 
 class TestPlayerMove1v1(unittest.TestCase):
@@ -571,6 +731,20 @@ class TestPlayerMove1v1(unittest.TestCase):
         output = mock_stdout.getvalue()
         self.assertIn("Ошибка. Введите два числа через пробел", output)
 
+    @patch('builtins.input', side_effect=['1 1', '9 9', '2 2'])
+    @patch('random.choice', return_value=(2, 3))
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_salvo_goes_through_engine(self, mock_stdout, mock_random,
+                                       mock_input):
+        self.enemy_field[2][2] = SHIP
+        with patch('game.engine.apply', wraps=apply) as mock_apply:
+            damaged = player_move_1v1(self.player_field, self.enemy_field)
+        self.assertEqual(damaged, [(2, 2)])
+        self.assertEqual(mock_apply.call_count, 2)
+        self.assertEqual(mock_apply.call_args[0][1], Salvo(0, 1, 1, 2, 2))
+        self.assertIn("Введите 2 числа в пределах поля",
+                      mock_stdout.getvalue())
+
 
 class TestPlayerMoveClassic(unittest.TestCase):
     def setUp(self):
@@ -592,5 +766,1472 @@ class TestPlayerMoveClassic(unittest.TestCase):
         self.assertEqual(result, (0, 0))
 
 
+class TestHeadlessGame(unittest.TestCase):
+    @patch('builtins.input')
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_game_without_console(self, mock_stdout, mock_input):
+        result = play_headless_game(Ai(), Ai(), seed=1)
+        self.assertIn(result.winner, (0, 1))
+        self.assertGreaterEqual(result.shots[result.winner], 20)
+        self.assertGreaterEqual(result.duration, 0)
+        self.assertFalse(mock_input.called)
+        self.assertEqual(mock_stdout.getvalue(), '')
+
+    def test_same_seed_same_game(self):
+        first = play_headless_game(Ai(), Ai(), seed=7)
+        second = play_headless_game(Ai(), Ai(), seed=7)
+        self.assertEqual(first.winner, second.winner)
+        self.assertEqual(first.shots, second.shots)
+
+    def test_custom_field_size(self):
+        result = play_headless_game(Ai(), Ai(), field_size=(15, 12), seed=3)
+        self.assertGreaterEqual(result.shots[result.winner], 20)
+
+
+class TestTournament(unittest.TestCase):
+    def test_tournament_reproducible(self):
+        first = run_tournament(['ai', 'probability'], games_per_pair=4,
+                               batch_size=2, workers=2, seed=11)
+        second = run_tournament(['ai', 'probability'], games_per_pair=4,
+                                batch_size=2, workers=2, seed=11)
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(first[('ai', 'probability')]['games'], 4)
+        self.assertEqual(sum(first[('ai', 'probability')]['wins']), 4)
+
+    def test_tournament_resume(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.jsonl')
+            run_tournament(['ai'], games_per_pair=10, batch_size=5,
+                           workers=1, seed=3, results_path=path)
+            with open(path) as file:
+                self.assertEqual(len(file.readlines()), 2)
+            summary = run_tournament(['ai'], games_per_pair=20,
+                                     batch_size=5, workers=1, seed=3,
+                                     results_path=path)
+            with open(path) as file:
+                self.assertEqual(len(file.readlines()), 4)
+            self.assertEqual(summary[('ai', 'ai')]['games'], 20)
+
+    def test_tournament_resume_skips_other_settings(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.jsonl')
+            run_tournament(['ai'], games_per_pair=20, batch_size=5,
+                           workers=1, seed=3, results_path=path)
+            summary = run_tournament(['ai'], games_per_pair=10,
+                                     batch_size=5, workers=1, seed=3,
+                                     results_path=path)
+            self.assertEqual(summary[('ai', 'ai')]['games'], 10)
+            summary = run_tournament(['ai'], games_per_pair=12,
+                                     batch_size=4, workers=1, seed=3,
+                                     results_path=path)
+            self.assertEqual(summary[('ai', 'ai')]['games'], 12)
+            with open(path) as file:
+                self.assertEqual(len(file.readlines()), 7)
+            summary = run_tournament(['ai'], games_per_pair=7,
+                                     batch_size=5, workers=1, seed=3,
+                                     results_path=path)
+            self.assertEqual(summary[('ai', 'ai')]['games'], 7)
+
+    def test_register_strategy_needs_import_path(self):
+        with self.assertRaises(ValueError):
+            register_strategy('lambda', lambda field_size: Ai())
+        self.assertNotIn('lambda', STRATEGIES)
+        register_strategy('copy', ProbabilityAi)
+        try:
+            self.assertEqual(STRATEGIES['copy'], 'game.Ai:ProbabilityAi')
+            self.assertIs(load_strategy(STRATEGIES['copy']), ProbabilityAi)
+        finally:
+            del STRATEGIES['copy']
+
+    def test_wilson_interval(self):
+        low, high = wilson_interval(50, 100)
+        self.assertLess(low, 0.5)
+        self.assertGreater(high, 0.5)
+        self.assertEqual(wilson_interval(0, 0), (0.0, 1.0))
+
+
+class TestBitField(unittest.TestCase):
+    def setUp(self):
+        self.field = make_field((8, 6))
+        self.field[1][2] = SHIP
+        self.field[1][3] = DAMAGED
+        self.field[4][7] = MISSED
+        self.bit_field = BitField.from_list(self.field)
+
+    def test_list_view(self):
+        self.assertEqual(len(self.bit_field), 6)
+        self.assertEqual(len(self.bit_field[0]), 8)
+        self.assertEqual(self.bit_field[1][2], SHIP)
+        self.assertEqual(self.bit_field[1][3], DAMAGED)
+        self.assertEqual(self.bit_field[4][7], MISSED)
+        self.assertEqual(self.bit_field.to_list(), self.field)
+        self.bit_field[1][2] = DAMAGED
+        self.assertEqual(self.bit_field[1][2], DAMAGED)
+        self.assertEqual(self.bit_field.ships, 0)
+
+    def test_ship_not_near_matches_list(self):
+        for y in range(6):
+            for x in range(8):
+                for position in ('h', 'v'):
+                    self.assertEqual(
+                        ship_not_near(self.bit_field, x, y, 2, position),
+                        ship_not_near(self.field, x, y, 2, position))
+
+    def test_game_over(self):
+        self.assertFalse(game_over(self.bit_field))
+        self.bit_field[1][2] = DAMAGED
+        self.assertTrue(game_over(self.bit_field))
+
+    def test_mark_around_ship_matches_list(self):
+        self.field[1][2] = DAMAGED
+        self.bit_field[1][2] = DAMAGED
+        cells = init_available_cells((8, 6))
+        bit_cells = init_available_cells((8, 6))
+        mark_around_ship(self.field, cells, [(2, 1), (3, 1)])
+        mark_around_ship(self.bit_field, bit_cells, [(2, 1), (3, 1)])
+        self.assertEqual(self.bit_field, self.field)
+        self.assertEqual(cells, bit_cells)
+
+    def test_random_fleet_and_print(self):
+        bit_field = BitField((10, 10))
+        random_place_fleet(bit_field)
+        self.assertEqual(sum(cage == SHIP for row in bit_field
+                             for cage in row), 20)
+        with patch('sys.stdout', new_callable=StringIO) as bit_stdout:
+            print_field(bit_field, hide_ships=False)
+        with patch('sys.stdout', new_callable=StringIO) as list_stdout:
+            print_field(bit_field.to_list(), hide_ships=False)
+        self.assertEqual(bit_stdout.getvalue(), list_stdout.getvalue())
+
+
+class TestFleetPlacement(unittest.TestCase):
+    ships = {1: 4, 2: 3, 3: 2, 4: 1}
+
+    def assert_valid_fleet(self, field):
+        sizes = []
+        seen = set()
+        for y, row in enumerate(field):
+            for x, cage in enumerate(row):
+                if cage == SHIP and (x, y) not in seen:
+                    cages = find_ship_cages(field, x, y)
+                    seen.update(cages)
+                    sizes.append(len(cages))
+                    xs = {cx for cx, cy in cages}
+                    ys = {cy for cx, cy in cages}
+                    self.assertTrue(len(xs) == 1 or len(ys) == 1)
+                    for cx, cy in cages:
+                        for dx in range(-1, 2):
+                            for dy in range(-1, 2):
+                                a, b = cx + dx, cy + dy
+                                if (0 <= a < len(field[0]) and
+                                        0 <= b < len(field) and
+                                        field[b][a] == SHIP):
+                                    self.assertIn((a, b), cages)
+        self.assertEqual(sorted(sizes), [1, 1, 1, 1, 2, 2, 2, 3, 3, 4])
+
+    def test_place_fleet_default(self):
+        field = make_field((10, 10))
+        self.assertTrue(place_fleet(field, self.ships))
+        self.assert_valid_fleet(field)
+
+    def test_place_fleet_tight_fields(self):
+        for field_size in ((7, 8), (1, 29), (3, 17)):
+            field = make_field(field_size)
+            self.assertTrue(place_fleet(field, self.ships))
+            self.assert_valid_fleet(field)
+
+    def test_place_fleet_impossible(self):
+        field = make_field((1, 28))
+        self.assertFalse(place_fleet(field, self.ships, restarts=2))
+        self.assertEqual(field, make_field((1, 28)))
+
+    def test_random_place_fleet(self):
+        field = make_field((10, 10))
+        field[0][0] = SHIP
+        self.assertTrue(random_place_fleet(field))
+        self.assert_valid_fleet(field)
+
+
+class TestShipRegistry(unittest.TestCase):
+    def setUp(self):
+        self.field = make_field((6, 6))
+        place_ship_manual(self.field, 2, 1, 1, 'h')
+        place_ship_manual(self.field, 1, 4, 4, 'h')
+
+    def test_registry_filled_by_placement(self):
+        registry = self.field.registry
+        ship_id = registry.find(2, 1)
+        self.assertEqual(registry.find(1, 1), ship_id)
+        self.assertEqual(registry.cells(ship_id), [(1, 1), (2, 1)])
+        self.assertIsNone(registry.find(0, 0))
+        self.assertEqual(find_ship_cages(self.field, 1, 1),
+                         [(1, 1), (2, 1)])
+
+    def test_hits_and_sinking(self):
+        is_hit_classic(1, 1, self.field)
+        self.assertFalse(check_ship_full_destroyed(self.field, 1, 1))
+        is_hit_1v1(2, 1, self.field)
+        self.assertTrue(check_ship_full_destroyed(self.field, 2, 1))
+        self.assertEqual(self.field[0][0], MISSED)
+        self.assertTrue(self.field.registry.is_sunk(
+            self.field.registry.find(1, 1)))
+
+    @patch('builtins.input', side_effect=['1 1', 'вниз'])
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_move_ship_updates_registry(self, mock_stdout, mock_input):
+        self.assertTrue(move_ship(self.field))
+        registry = self.field.registry
+        self.assertIsNone(registry.find(1, 1))
+        self.assertEqual(registry.cells(registry.find(1, 2)),
+                         [(1, 2), (2, 2)])
+
+    def test_check_mins_sinks_registered_ship(self):
+        self.assertTrue(check_mins(self.field, [(2, 1)]))
+        registry = self.field.registry
+        self.assertTrue(registry.is_sunk(registry.find(1, 1)))
+        self.assertFalse(registry.is_sunk(registry.find(4, 4)))
+
+    def test_random_fleet_registered(self):
+        field = make_field((10, 10))
+        random_place_fleet(field)
+        registry = field.registry
+        self.assertEqual(len(registry.ship_cells), 10)
+        for y, row in enumerate(field):
+            for x, cage in enumerate(row):
+                self.assertEqual(cage == SHIP,
+                                 registry.find(x, y) is not None)
+
+    def test_rebuild(self):
+        is_hit_classic(1, 1, self.field)
+        registry = ShipRegistry()
+        registry.rebuild(self.field)
+        self.assertEqual(sorted(map(sorted, registry.ship_cells.values())),
+                         [[(1, 1), (2, 1)], [(4, 4)]])
+        self.assertEqual(registry.health[registry.find(1, 1)], 1)
+
+
+class TestFleetCounters(unittest.TestCase):
+    def setUp(self):
+        self.field = make_field((42, 42))
+        random_place_fleet(self.field)
+        self.registry = self.field.registry
+
+    def test_initial_counters(self):
+        self.assertEqual(self.registry.intact_cells, 20)
+        self.assertEqual(self.registry.afloat, {4: 1, 3: 2, 2: 3, 1: 4})
+        self.assertEqual(self.registry.ships_left(), 10)
+        self.assertFalse(game_over(self.field))
+
+    def test_counters_follow_hits(self):
+        ship_id = next(iter(self.registry.ship_cells))
+        cells = self.registry.cells(ship_id)
+        size = len(cells)
+        for x, y in cells:
+            is_hit_classic(x, y, self.field)
+        self.assertEqual(self.registry.intact_cells, 20 - size)
+        self.assertEqual(self.registry.ships_left(size),
+                         {4: 1, 3: 2, 2: 3, 1: 4}[size] - 1)
+
+    def test_game_over_after_all_hits(self):
+        for ship_id, cells in list(self.registry.ship_cells.items()):
+            if ship_id % 2:
+                check_mins(self.field, [cells[0]])
+            else:
+                for x, y in cells:
+                    is_hit_1v1(x, y, self.field)
+        self.assertEqual(self.registry.ships_left(), 0)
+        self.assertTrue(game_over(self.field))
+
+
+class TestProbabilityAi(unittest.TestCase):
+    def setUp(self):
+        self.ai = ProbabilityAi((10, 10))
+        self.available_cells = init_available_cells((10, 10))
+
+    def check_moves(self):
+        move = self.ai.make_move(self.available_cells)
+        self.assertIn(move, {(x, y) for x in range(3, 7)
+                             for y in range(3, 7)})
+        self.ai.register_hit(4, 4)
+        self.available_cells.remove((4, 4))
+        move = self.ai.make_move(self.available_cells)
+        self.assertIn(move, {(3, 4), (5, 4), (4, 3), (4, 5)})
+        self.ai.register_hit(5, 4)
+        self.available_cells.remove((5, 4))
+        move = self.ai.make_move(self.available_cells)
+        self.assertIn(move, {(3, 4), (6, 4)})
+        self.ai.register_hit(6, 4, is_ship_destroyed=True)
+        self.assertEqual(self.ai.hits, set())
+        self.assertEqual(self.ai.remaining[3], 1)
+        self.assertIn((7, 5), self.ai.blocked)
+
+    @unittest.skipUnless(ai_module.HAS_NUMPY, "numpy не установлен")
+    def test_moves_numpy(self):
+        self.check_moves()
+
+    def test_moves_without_numpy(self):
+        with patch('game.Ai.HAS_NUMPY', False):
+            self.ai = ProbabilityAi((10, 10))
+            self.check_moves()
+
+    def test_full_game(self):
+        result = play_headless_game(ProbabilityAi((10, 10)), Ai(), seed=2)
+        self.assertGreaterEqual(result.shots[result.winner], 20)
+
+
+class TestIndexedPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = init_available_cells((4, 3))
+
+    def test_set_api(self):
+        self.assertIsInstance(self.pool, IndexedPool)
+        self.assertEqual(self.pool, {(x, y) for x in range(4)
+                                     for y in range(3)})
+        self.pool.remove((1, 1))
+        self.assertNotIn((1, 1), self.pool)
+        self.assertEqual(len(self.pool), 11)
+        with self.assertRaises(KeyError):
+            self.pool.remove((1, 1))
+        self.pool.discard((1, 1))
+        self.pool.add((1, 1))
+        self.assertIn((1, 1), self.pool)
+        self.assertEqual(len(self.pool), 12)
+
+    def test_swap_remove_keeps_positions(self):
+        for cell in [(0, 0), (3, 2), (2, 1)]:
+            self.pool.remove(cell)
+        for index, item in enumerate(self.pool.items):
+            self.assertEqual(self.pool.positions[item], index)
+
+    def test_choice_and_ai(self):
+        for i in range(11):
+            self.pool.remove(self.pool.choice())
+        self.assertEqual(Ai().make_move(self.pool), self.pool.items[0])
+
+    def test_mark_around_ship_uses_pool(self):
+        field = make_field((4, 3))
+        field[1][1] = DAMAGED
+        mark_around_ship(field, self.pool, [(1, 1)])
+        self.assertEqual(len(self.pool), 12 - 8)
+
+
+class TestNeighbourTables(unittest.TestCase):
+    def test_tables(self):
+        near4, near8 = neighbour_tables(5, 4)
+        self.assertCountEqual(near4[0][0], [(1, 0), (0, 1)])
+        self.assertCountEqual(near8[0][0], [(1, 0), (0, 1), (1, 1)])
+        self.assertEqual(len(near8[2][2]), 8)
+        self.assertCountEqual(near4[3][4], [(3, 3), (4, 2)])
+        self.assertIs(neighbour_tables(5, 4)[0], near4)
+
+    def test_cache_is_bounded(self):
+        for size in range(10, 30):
+            neighbour_tables(size, size)
+        self.assertLessEqual(neighbour_tables.cache_info().currsize, 8)
+
+
+class TestRenderer(unittest.TestCase):
+    def setUp(self):
+        self.field = make_field((3, 2))
+        self.field[0][0] = SHIP
+        self.field[0][1] = DAMAGED
+        self.field[1][2] = MISSED
+
+    def test_render_field(self):
+        separator = "   " + CROSSING + (LINE * 3 + CROSSING) * 3
+        self.assertEqual(render_field(self.field, False), [
+            "     0   1   2 ",
+            separator,
+            " 0 │ ■ │ # │   │",
+            separator,
+            " 1 │   │   │ o │",
+            separator,
+        ])
+
+    def test_render_hidden_with_mins(self):
+        lines = render_field(self.field, True, [(0, 0), (1, 0), (0, 1)])
+        self.assertEqual(lines[2], " 0 │ M │ # │   │")
+        self.assertEqual(lines[4], " 1 │ M │   │ o │")
+        self.assertEqual(render_field(self.field, True)[2],
+                         " 0 │   │ # │   │")
+
+    def test_chrome_cached(self):
+        self.assertIs(grid_chrome(3), grid_chrome(3))
+
+    def test_print_field_single_write(self):
+        with patch('sys.stdout') as mock_stdout:
+            print_field(self.field, False)
+        mock_stdout.write.assert_called_once()
+
+    @patch('shutil.get_terminal_size',
+           return_value=os.terminal_size((200, 50)))
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_print_fields_side_by_side(self, mock_stdout, mock_size):
+        print_fields(self.field, self.field, "Я", "Соперник")
+        lines = mock_stdout.getvalue().splitlines()
+        self.assertEqual(lines[1].split(), ["Я", "Соперник"])
+        self.assertIn("│ ■ │", lines[4])
+        self.assertEqual(lines[4].count("■"), 1)
+
+    @patch('shutil.get_terminal_size',
+           return_value=os.terminal_size((20, 50)))
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_print_fields_stacked(self, mock_stdout, mock_size):
+        print_fields(self.field, self.field, "Я", "Соперник")
+        lines = mock_stdout.getvalue().splitlines()
+        self.assertEqual(lines[1], "Я")
+        self.assertIn("Соперник", lines)
+
+
+@patch('shutil.get_terminal_size', return_value=os.terminal_size((200, 50)))
+class TestDiffRenderer(unittest.TestCase):
+    def setUp(self):
+        self.stream = StringIO()
+        self.renderer = DiffRenderer(self.stream)
+        self.player_field = make_field((5, 5))
+        self.enemy_field = make_field((5, 5))
+        place_ship_manual(self.enemy_field, 1, 2, 2, 'h')
+
+    def draw(self):
+        self.stream.seek(0)
+        self.stream.truncate()
+        self.renderer.draw([(self.player_field, False, None, "Мое"),
+                            (self.enemy_field, True, None, "Чужое")])
+        return self.stream.getvalue()
+
+    def test_first_frame_is_full(self, mock_size):
+        frame = self.draw()
+        self.assertTrue(frame.startswith(CLEAR_SCREEN))
+        self.assertIn("Мое", frame)
+        self.assertEqual(self.enemy_field.changes, set())
+
+    def test_only_changed_cells_redrawn(self, mock_size):
+        full = self.draw()
+        is_hit_classic(2, 2, self.enemy_field)
+        check_ship_full_destroyed(self.enemy_field, 2, 2)
+        update = self.draw()
+        # Подбитая клетка и 8 клеток вокруг
+        self.assertEqual(update.count("\x1b["), 9 + 2)
+        self.assertIn("\x1b[8;42H#", update)
+        self.assertLess(len(update), len(full) // 4)
+        self.assertEqual(self.draw().count("\x1b["), 2)
+
+    def test_plain_lists_compared_with_last_frame(self, mock_size):
+        self.player_field = [row[:] for row in self.player_field]
+        self.draw()
+        self.player_field[0][0] = MISSED
+        update = self.draw()
+        self.assertIn("\x1b[4;6Ho", update)
+
+    def test_viewport_follows_changes(self, mock_size):
+        mock_size.return_value = os.terminal_size((80, 24))
+        self.player_field = [row[:] for row in make_field((10, 10))]
+        self.enemy_field = [row[:] for row in make_field((10, 10))]
+        frame = self.draw()
+        # Поля стоят друг под другом, под меню отведены нижние строки
+        self.assertIn("\x1b[19;24r", frame)
+        self.assertNotIn("Чужое", frame)
+        self.player_field[0][0] = MISSED
+        update = self.draw()
+        self.assertFalse(update.startswith(CLEAR_SCREEN))
+        self.assertIn("\x1b[4;6Ho", update)
+        self.enemy_field[9][9] = MISSED
+        self.assertTrue(self.draw().startswith(CLEAR_SCREEN))
+        self.enemy_field[8][9] = MISSED
+        update = self.draw()
+        self.assertEqual(update.count("\x1b["), 3)
+        self.assertIn("\x1b[14;42Ho", update)
+        self.renderer.close()
+        self.assertIn("\x1b[r", self.stream.getvalue())
+
+    def test_wide_board_clipped_to_terminal(self, mock_size):
+        mock_size.return_value = os.terminal_size((80, 24))
+        self.player_field = [row[:] for row in make_field((42, 42))]
+        self.enemy_field = [row[:] for row in make_field((42, 42))]
+        frame = self.draw()
+        for line in re.split("\x1b\\[[0-9;]*[A-Za-z]", frame):
+            self.assertLessEqual(len(line), 80)
+        self.player_field[41][41] = MISSED
+        self.assertTrue(self.draw().startswith(CLEAR_SCREEN))
+        self.player_field[41][40] = MISSED
+        self.assertFalse(self.draw().startswith(CLEAR_SCREEN))
+
+
+def migrate_scores(db, txt, barrier):
+    barrier.wait()
+    Leaderboard(db, txt).close()
+
+
+class TestLeaderboard(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.directory.name, "scores.db")
+        self.txt = os.path.join(self.directory.name, "scores.txt")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_top_sorted_and_limited(self):
+        with Leaderboard(self.db, self.txt) as leaderboard:
+            for moves in range(30, 0, -1):
+                leaderboard.add(f"p{moves}", moves)
+            top = leaderboard.top(10)
+        self.assertEqual(top, [(f"p{m}", m) for m in range(1, 11)])
+
+    def test_best_per_player(self):
+        with Leaderboard(self.db, self.txt) as leaderboard:
+            leaderboard.add("ann", 40)
+            leaderboard.add("ann", 25)
+            leaderboard.add("ann", 33)
+            leaderboard.add("bob", 30)
+            self.assertEqual(leaderboard.best("ann"), 25)
+            self.assertIsNone(leaderboard.best("eve"))
+            self.assertEqual(leaderboard.top_players(),
+                             [("ann", 25), ("bob", 30)])
+
+    def test_migration_runs_once(self):
+        with open(self.txt, "w", encoding="utf-8") as file:
+            file.write("ann:20\nname:with:colons:15\nbroken line\nbob:x\n")
+        with Leaderboard(self.db, self.txt) as leaderboard:
+            self.assertEqual(leaderboard.top(),
+                             [("name:with:colons", 15), ("ann", 20)])
+        with Leaderboard(self.db, self.txt) as leaderboard:
+            self.assertEqual(len(leaderboard.top()), 2)
+
+    def test_concurrent_migration_runs_once(self):
+        with open(self.txt, "w", encoding="utf-8") as file:
+            file.writelines(f"p{i}:{i % 90 + 10}\n" for i in range(5000))
+        Leaderboard(self.db, None).close()
+        barrier = Barrier(4)
+        workers = [Process(target=migrate_scores,
+                           args=(self.db, self.txt, barrier))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual([worker.exitcode for worker in workers], [0] * 4)
+        with Leaderboard(self.db, self.txt) as leaderboard:
+            self.assertEqual(leaderboard.connection.execute(
+                "SELECT COUNT(*) FROM scores").fetchone(), (5000,))
+
+    def test_scores_without_files(self):
+        current = os.getcwd()
+        os.chdir(self.directory.name)
+        try:
+            with patch('sys.stdout', new_callable=StringIO) as stdout:
+                display_scores()
+                record_score(12, "a:b")
+                display_scores()
+        finally:
+            os.chdir(current)
+        self.assertIn("В таблице пока нет записей!", stdout.getvalue())
+        self.assertIn("1. a:b: 12 ходов", stdout.getvalue())
+
+    def test_sink_batches_writes(self):
+        sink = ScoreSink(self.db, batch_size=3, max_delay=60)
+        sink.add("ann", 30)
+        sink.add("bob", 20)
+        with Leaderboard(self.db, None) as leaderboard:
+            self.assertEqual(leaderboard.top(), [])
+            sink.add("eve", 25)
+            self.assertEqual(len(leaderboard.top()), 3)
+            record_score(10, "ann", sink=sink)
+            sink.close()
+            self.assertEqual(leaderboard.top(1), [("ann", 10)])
+
+    def test_concurrent_writers(self):
+        self.assertGreater(bench_scores.run(processes=4, records=200,
+                                            batch_size=50), 0)
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.player_field = make_field((42, 42))
+        self.bot_field = make_field((42, 42))
+        random_place_fleet(self.player_field)
+        random_place_fleet(self.bot_field)
+        self.player_field[0][0] = MISSED
+
+    def test_classic_round_trip(self):
+        ai = Ai()
+        ai.first_hit = (3, 4)
+        ai.last_hit = (3, 5)
+        ai.direction = (0, 1)
+        data = dumps(ClassicGame("Игрок", self.player_field, self.bot_field,
+                                 ai, False, 17))
+        self.assertLess(len(data), 1024)
+        game = loads(data)
+        self.assertEqual(game.player_name, "Игрок")
+        self.assertEqual(game.player_field, self.player_field)
+        self.assertEqual(game.bot_field, self.bot_field)
+        self.assertEqual((game.ai.first_hit, game.ai.last_hit,
+                          game.ai.direction), ((3, 4), (3, 5), (0, 1)))
+        self.assertEqual((game.player_turn, game.player_moves), (False, 17))
+        self.assertEqual(game.bot_field.registry.intact_cells,
+                         self.bot_field.registry.intact_cells)
+
+    def test_duel_round_trip(self):
+        data = dumps(DuelGame("a", "b:c", self.player_field, self.bot_field,
+                              [(1, 2), (40, 41)], [(5, 5)], 2, True))
+        self.assertLess(len(data), 1024)
+        game = loads(data)
+        self.assertEqual(game.player2_name, "b:c")
+        self.assertEqual(game.player1_mins, [(1, 2), (40, 41)])
+        self.assertEqual(game.player2_mins, [(5, 5)])
+        self.assertEqual((game.current_player, game.moved_ship), (2, True))
+        self.assertEqual(game.player2_field, self.bot_field)
+
+    def test_odd_field_size(self):
+        field = make_field((3, 5))
+        field[4][2] = SHIP
+        game = loads(dumps(ClassicGame("x", field, make_field((3, 5)),
+                                       Ai(), True, 0)))
+        self.assertEqual(game.player_field, field)
+
+    def test_bad_data(self):
+        data = dumps(ClassicGame("x", self.player_field, self.bot_field,
+                                 Ai(), True, 0))
+        with self.assertRaises(SnapshotError):
+            loads(b"XX" + data[2:])
+        with self.assertRaises(SnapshotError):
+            loads(data[:2] + bytes((99,)) + data[3:])
+        with self.assertRaises(SnapshotError):
+            loads(data[:-10])
+
+    def test_bad_header_values(self):
+        data = dumps(DuelGame("a", "b", self.player_field, self.bot_field,
+                              [(1, 2)], [(5, 5)], 1, False))
+        header = HEADER.size
+        for bad in (data[:4] + bytes(2) + data[6:],
+                    data[:4] + (43).to_bytes(2, 'little') + data[6:],
+                    data[:header] + bytes((3,)) + data[header + 1:],
+                    data[:header + 7] + (42).to_bytes(2, 'little') +
+                    data[header + 9:]):
+            with self.assertRaises(SnapshotError):
+                loads(bad)
+
+    @patch('game.main.print_fields')
+    @patch('builtins.input')
+    def test_save_and_resume(self, mock_input, mock_print_fields):
+        current = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                mock_input.side_effect = ['Игрок', '1', 'да', 's']
+                with patch('sys.stdout', new_callable=StringIO):
+                    start_game((10, 10))
+                game = load_game()
+                mock_input.side_effect = ['5', '0']
+                with patch('game.main.start_game') as mock_start:
+                    with patch('sys.stdout', new_callable=StringIO):
+                        main()
+            finally:
+                os.chdir(current)
+        self.assertEqual(game.player_name, 'Игрок')
+        self.assertEqual(game.player_moves, 0)
+        self.assertEqual(game.bot_field.registry.ships_left(), 10)
+        self.assertEqual(mock_start.call_args[0][0], (10, 10))
+
+    @patch('builtins.input', side_effect=['5', '0'])
+    def test_resume_without_save(self, mock_input):
+        current = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                with patch('sys.stdout', new_callable=StringIO) as stdout:
+                    main()
+            finally:
+                os.chdir(current)
+        self.assertIn("Сохраненной игры нет.", stdout.getvalue())
+
+
+class TestMoveLog(unittest.TestCase):
+    def record_headless(self, seed):
+        fields = []
+
+        def capture(field_size):
+            field = make_field(field_size)
+            fields.append(field)
+            return field
+
+        stream = BytesIO()
+        with patch('game.simulation.make_field', side_effect=capture):
+            simulation.play_headless_game(Ai(), Ai(), seed=seed,
+                                          record=stream)
+        return Replay(stream.getvalue()), fields
+
+    def test_replay_matches_classic_game(self):
+        for seed in range(20):
+            replay, fields = self.record_headless(seed)
+            self.assertEqual(replay.seed, seed)
+            replayed = replay.seek()
+            self.assertEqual(list(replayed[0]), list(fields[0]))
+            self.assertEqual(list(replayed[1]), list(fields[1]))
+            self.assertEqual(replayed[0].registry.intact_cells,
+                             fields[0].registry.intact_cells)
+
+    def test_seek_back_and_forth(self):
+        replay, fields = self.record_headless(1)
+        middle = [list(row) for row in replay.seek(60)[1]]
+        replay.seek()
+        self.assertEqual(list(replay.seek(60)[1]), middle)
+        self.assertEqual(list(replay.seek(30)[1]),
+                         list(self.record_headless(1)[0].seek(30)[1]))
+        self.assertEqual(list(replay.seek()[1]), list(fields[1]))
+
+    @patch('builtins.print')
+    @patch('random.choice', side_effect=lambda cells: cells[0])
+    @patch('builtins.input')
+    def test_replay_matches_1v1_game(self, mock_input, mock_choice,
+                                     mock_print):
+        first = make_field((10, 10))
+        second = make_field((10, 10))
+        place_ship_manual(first, 2, 0, 0, 'h')
+        place_ship_manual(first, 1, 5, 5, 'h')
+        place_ship_manual(second, 3, 2, 2, 'v')
+        place_ship_manual(second, 1, 8, 8, 'h')
+        stream = BytesIO()
+        log = MoveLog(stream, (first, second), 7, MODE_DUEL)
+        log.record_field(first)
+        log.record_field(second)
+        log.record(MINE_PLACE, first, 6, 5)
+
+        mock_input.side_effect = ['0 0', '2 3', '5 5', 'вправо',
+                                  '0 0', '8 8']
+        player_move_1v1(first, second, log)
+        move_ship(first, log)
+        check_mins(first, [(6, 5)], log)
+        player_move_1v1(first, second, log)
+        for x, y in ((2, 2), (2, 3), (2, 4), (8, 8)):
+            check_ship_full_destroyed(second, x, y)
+
+        replay = Replay(stream.getvalue())
+        replayed = replay.seek()
+        self.assertEqual(replay.mins, ([(6, 5)], []))
+        self.assertEqual(list(replayed[0]), list(first))
+        self.assertEqual(list(replayed[1]), list(second))
+        self.assertEqual(replayed[0].registry.ships_left(), 1)
+
+
+class TestLobbyServer(unittest.TestCase):
+    async def connect(self, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        self.assertEqual(await reader.readline(), b"HELLO sea-battle 1\n")
+        return reader, writer
+
+    async def request(self, client, line, until):
+        reader, writer = client
+        if line is not None:
+            writer.write(line.encode("utf-8") + b"\n")
+        lines = []
+        while True:
+            text = (await reader.readline()).decode("utf-8").rstrip("\n")
+            lines.append(text)
+            if text.startswith(until):
+                return lines
+
+    @staticmethod
+    def free_cells(field, count):
+        return [(x, y) for y, row in enumerate(field)
+                for x, cage in enumerate(row) if cage == EMPTY][-count:]
+
+    async def play(self):
+        lobby = LobbyServer((10, 10))
+        port = await lobby.start()
+        first = await self.connect(port)
+        second = await self.connect(port)
+        self.assertEqual(await self.request(first, "NAME Аня", "OK"), ["OK"])
+        await self.request(first, "PLAY", "WAIT")
+        lines = await self.request(second, "PLAY", "PLACE_MINES")
+        self.assertTrue(lines[0].startswith("MATCH 2 10 10 Аня"))
+        await self.request(first, None, "PLACE_MINES")
+
+        match = next(iter(lobby.matches))
+        for client, field in ((first, match.fields[1]),
+                              (second, match.fields[0])):
+            cells = " ".join(f"{x} {y}" for x, y in
+                             self.free_cells(field, 5))
+            await self.request(client, f"MINES {cells}", "OK")
+        await self.request(first, None, "TURN 1")
+        await self.request(second, None, "TURN 1")
+
+        error = await self.request(second, "SHOT 0 0 0 0", "ERR")
+        self.assertEqual(error, ["ERR Сейчас ход соперника"])
+
+        own = next((x, y) for x, y in match.fields[0].registry.ship_at
+                   if len(find_ship_cages(match.fields[0], x, y)) == 1)
+        target = next(iter(match.fields[1].registry.ship_at))
+        lines = await self.request(
+            first, f"SHOT {own[0]} {own[1]} {target[0]} {target[1]}",
+            "TURN")
+        self.assertIn(f"HITS 1 {target[0]},{target[1]}", lines)
+        self.assertEqual(lines[-1], "TURN 1")
+
+        lines = await self.request(second, "SURRENDER", "WIN")
+        self.assertEqual(lines[-1], "WIN 1")
+        await self.request(first, None, "WIN 1")
+        self.assertEqual(lobby.matches, set())
+
+        await self.request(first, "PLAY", "WAIT")
+        first[1].close()
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(lobby.waiting), 0)
+        self.assertEqual(await self.request(second, "QUIT", "BYE"), ["BYE"])
+        await lobby.close()
+
+    def test_match_over_loopback(self):
+        asyncio.run(asyncio.wait_for(self.play(), 10))
+
+
+class TestEngine(unittest.TestCase):
+    def duel(self):
+        fields = (make_field((5, 5)), make_field((5, 5)))
+        place_ship_manual(fields[0], 1, 0, 0, 'h')
+        place_ship_manual(fields[0], 2, 3, 4, 'h')
+        place_ship_manual(fields[1], 1, 4, 4, 'h')
+        state = duel_state(*fields)
+        _, state = place_mines(state, 0,
+                               [(0, 0), (1, 0), (2, 0), (3, 0), (4, 0)])
+        events, state = place_mines(state, 1,
+                                    [(1, 0), (0, 2), (0, 3), (0, 4), (2, 2)])
+        self.assertIn(TurnPassed(0), events)
+        return state
+
+    def test_actions_before_mines(self):
+        state = duel_state(make_field((5, 5)), make_field((5, 5)))
+        with self.assertRaises(MoveError) as error:
+            apply(state, Salvo(0, 0, 0, 0, 0))
+        self.assertEqual(error.exception.code, 'not_started')
+        with self.assertRaises(MoveError) as error:
+            place_mines(state, 0, [(0, 0), (1, 0), (2, 0), (3, 0), (5, 0)])
+        self.assertEqual(error.exception.code, 'out_of_field')
+        self.assertEqual(state.mins, ([], []))
+        with self.assertRaises(MoveError) as error:
+            apply(state, Shoot(0, 0, 0))
+        self.assertEqual(error.exception.code, 'wrong_action')
+
+    def test_one_move_per_turn_and_mines(self):
+        state = self.duel()
+        events, state = apply(state, MoveShip(0, 0, 0, 1, 0))
+        self.assertEqual(events, [ShipMoved(0, [(1, 0)]),
+                                  MineExploded(0, 1, 0)])
+        self.assertIsNone(state.winner)
+        self.assertEqual(state.fields[0].registry.ships_left(), 1)
+        with self.assertRaises(MoveError) as error:
+            apply(state, MoveShip(0, 3, 4, 0, -1))
+        self.assertEqual(error.exception.code, 'already_moved')
+
+    @patch('random.choice', side_effect=lambda cells: cells[0])
+    def test_salvo_size_and_win(self, mock_choice):
+        state = self.duel()
+        with self.assertRaises(MoveError) as error:
+            apply(state, Salvo(1, 4, 4, 0, 0))
+        self.assertEqual(error.exception.code, 'not_your_turn')
+        events, state = apply(state, Salvo(0, 3, 4, 4, 4))
+        self.assertEqual(events[0], SalvoFired(0, 2, [(4, 4), (3, 4)]))
+        self.assertEqual(events[1], Hit(0, 4, 4))
+        self.assertEqual(events[2].cells, [(4, 4)])
+        self.assertEqual(events[-1], GameOver(0))
+        self.assertEqual(state.winner, 0)
+        with self.assertRaises(MoveError) as error:
+            apply(state, Surrender(1))
+        self.assertEqual(error.exception.code, 'game_over')
+
+    def test_classic_turns_and_sinking(self):
+        fields = (make_field((3, 3)), make_field((3, 3)))
+        place_ship_manual(fields[0], 1, 0, 0, 'h')
+        place_ship_manual(fields[1], 1, 1, 1, 'h')
+        state = classic_state(*fields)
+        events, state = apply(state, Shoot(0, 0, 0))
+        self.assertEqual(events, [Missed(0, 0, 0), TurnPassed(1)])
+        with self.assertRaises(MoveError) as error:
+            apply(state, Shoot(0, 2, 2))
+        self.assertEqual(error.exception.code, 'not_your_turn')
+        _, state = apply(state, Shoot(1, 2, 2))
+        with self.assertRaises(MoveError) as error:
+            apply(state, Shoot(0, 0, 0))
+        self.assertEqual(error.exception.code, 'cell_used')
+        events, state = apply(state, Shoot(0, 1, 1))
+        self.assertEqual(events[0], Hit(0, 1, 1))
+        self.assertEqual(len(events[1].halo), 7)
+        self.assertEqual(events[2], GameOver(0))
+
+    def test_mines_checked_only_under_moved_ship(self):
+        state = self.duel()
+        self.assertIsInstance(state.mins[0], Mines)
+        with patch('game.engine.check_mins', wraps=check_mins) as check:
+            events, state = apply(state, MoveShip(0, 3, 4, 0, -1))
+            self.assertEqual(events, [ShipMoved(0, events[0].cells)])
+            check.assert_called_once_with(state.fields[0], state.mins[0],
+                                          None, events[0].cells)
+            apply(state, Salvo(0, 3, 3, 0, 0))
+            self.assertEqual(check.call_count, 1)
+
+    def test_mine_under_ship_at_setup(self):
+        fields = (make_field((5, 5)), make_field((5, 5)))
+        place_ship_manual(fields[0], 2, 0, 0, 'h')
+        place_ship_manual(fields[1], 1, 4, 4, 'h')
+        state = duel_state(*fields)
+        _, state = place_mines(state, 1,
+                               [(1, 0), (0, 2), (0, 3), (0, 4), (2, 2)])
+        with patch('game.utils.find_ship_cages') as flood:
+            events, state = place_mines(
+                state, 0, [(0, 0), (1, 0), (2, 0), (3, 0), (4, 0)])
+        flood.assert_not_called()
+        self.assertIn(MineExploded(0, 1, 0), events)
+        self.assertEqual(events[-1], GameOver(1))
+        self.assertEqual([fields[0][0][0], fields[0][0][1]],
+                         [DAMAGED, DAMAGED])
+        self.assertEqual(state.winner, 1)
+
+    def test_mines_index(self):
+        mines = Mines([(1, 2), (3, 4)])
+        mines.append((0, 0))
+        self.assertEqual(mines, [(1, 2), (3, 4), (0, 0)])
+        self.assertIn((3, 4), mines)
+        self.assertNotIn((4, 3), mines)
+        self.assertEqual(mines.under([(4, 4), (0, 0), (1, 2)]),
+                         [(0, 0), (1, 2)])
+
+    def test_log_matches_replay(self):
+        state = self.duel()
+        stream = BytesIO()
+        log = MoveLog(stream, state.fields, mode=MODE_DUEL)
+        for field in state.fields:
+            log.record_field(field)
+        _, state = apply(state, Salvo(0, 3, 4, 0, 0), log)
+        _, state = apply(state, MoveShip(1, 4, 4, -1, 0), log)
+        _, state = apply(state, Surrender(1), log)
+        replay = Replay(stream.getvalue())
+        self.assertEqual([list(map(list, field)) for field in replay.seek()],
+                         [list(map(list, field)) for field in state.fields])
+
+
+class TestGameplayBenchmark(unittest.TestCase):
+    def test_density_scales_classic_fleet(self):
+        self.assertEqual(bench_gameplay.fleet_for_density((10, 10), 0.2),
+                         SHIPS)
+        fleet = bench_gameplay.fleet_for_density((42, 42), 0.1)
+        cells = sum(size * count for size, count in fleet.items())
+        self.assertAlmostEqual(cells / 42 ** 2, 0.1, delta=0.01)
+
+    def test_results_cover_every_case(self):
+        results = bench_gameplay.run(((10, 10),), (0.1,), repeat=1,
+                                     min_time=0.001)
+        self.assertEqual([result["case"] for result in results],
+                         ['ship_not_near', 'random_place_ship',
+                          'random_place_fleet', 'find_ship_cages',
+                          'check_ship_full_destroyed', 'mark_around_ship',
+                          'game_over', 'Ai.make_move',
+                          'DuelAi.choose_action', 'headless_game'])
+        data = json.loads(json.dumps(bench_gameplay.report(results)))
+        self.assertTrue(all(result["us_per_call"] > 0
+                            for result in data["results"]))
+
+    def test_marking_cases_redo_work_each_run(self):
+        functions = {name: function for name, function, _ in
+                     bench_gameplay.cases((8, 8), {1: 2, 2: 1}, 0)}
+        clear_marks = bench_gameplay.clear_marks
+        marked = []
+
+        def count_and_clear(field, cells):
+            marked.append(sum(row.count(MISSED) for row in field))
+            clear_marks(field, cells)
+            self.assertFalse(any(MISSED in row for row in field))
+
+        with patch('game.benchmarks.bench_gameplay.clear_marks',
+                   side_effect=count_and_clear):
+            for name in ('mark_around_ship', 'check_ship_full_destroyed'):
+                for _ in range(3):
+                    functions[name]()
+        self.assertEqual(len(marked), 6)
+        self.assertEqual(len(set(marked)), 1)
+        self.assertGreater(marked[0], 0)
+
+    def test_bitboard_marking_runs_on_fresh_boards(self):
+        field = make_field((10, 10))
+        place_ship_manual(field, 2, 4, 4, 'h')
+        marked = []
+
+        def mark(*args):
+            marked.append(len(mark_around_ship(*args)))
+
+        with patch('game.benchmarks.bench_bitboard.mark_around_ship',
+                   side_effect=mark):
+            bench_bitboard.time_mark_around_ship(field, [(4, 4), (5, 4)], 3)
+        self.assertEqual(marked, [10] * 6)
+        self.assertEqual(field[4][4], SHIP)
+
+    def test_neighbours_case_gets_fresh_arguments(self):
+        boards = []
+
+        def bench(function, field):
+            boards.append(field)
+            self.assertEqual(field, [[EMPTY]])
+            field[0][0] = MISSED
+
+        bench_neighbours.time_case(bench, None, lambda: ([[EMPTY]],), 3)
+        self.assertEqual(len({id(board) for board in boards}), 3)
+
+    def test_replay_placement_prefix(self):
+        log = bench_replay.record_games((10, 10), 1)[0]
+        replay = Replay(log)
+        placed = bench_replay.placement_length(replay)
+        self.assertEqual(placed, 20)
+        self.assertEqual(replay.events[placed - 1][0], PLACE)
+        self.assertNotEqual(replay.events[placed][0], PLACE)
+
+
+class TestInstrument(unittest.TestCase):
+    def test_report_at_exit(self):
+        code = ("from game.Ai import Ai\n"
+                "from game.simulation import play_headless_game\n"
+                "play_headless_game(Ai(), Ai(), seed=1)\n")
+        root = os.path.dirname(os.path.dirname(ai_module.__file__))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "stats.json")
+            subprocess.run([sys.executable, "-c", code], cwd=directory,
+                           env=dict(os.environ, SEA_BATTLE_STATS=path,
+                                    PYTHONPATH=root),
+                           check=True)
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+        calls = data["calls"]
+        self.assertEqual(calls["game.utils.random_place_fleet"]["calls"], 2)
+        self.assertGreater(calls["game.player_move.is_hit_classic"]["calls"],
+                           40)
+        steps = data["observations"]["fleet_placer.steps"]
+        self.assertGreaterEqual(steps["count"], 2)
+        self.assertGreaterEqual(steps["max"], 10)
+
+
+class TestSparseField(unittest.TestCase):
+    @staticmethod
+    def copy_to_sparse(field):
+        sparse = SparseField((len(field[0]), len(field)))
+        for cells in field.registry.ship_cells.values():
+            for x, y in cells:
+                sparse.set(x, y, SHIP)
+            sparse.registry.add_ship(cells)
+        return sparse
+
+    def test_same_rules_as_lists(self):
+        random.seed(4)
+        field = make_field((12, 12))
+        random_place_fleet(field)
+        sparse = self.copy_to_sparse(field)
+        for size in (1, 3):
+            for y in range(12):
+                for x in range(12):
+                    for position in ('h', 'v'):
+                        self.assertEqual(
+                            ship_not_near(sparse, x, y, size, position),
+                            ship_not_near(field, x, y, size, position))
+        cells = init_available_cells((12, 12))
+        sparse_cells = SparsePool((12, 12))
+        for y in range(12):
+            for x in range(12):
+                if (x, y) not in cells:
+                    continue
+                cells.remove((x, y))
+                sparse_cells.remove((x, y))
+                if is_hit_classic(x, y, field):
+                    self.assertTrue(is_hit_classic(x, y, sparse))
+                    self.assertEqual(
+                        check_ship_full_destroyed(field, x, y, cells),
+                        check_ship_full_destroyed(sparse, x, y,
+                                                  sparse_cells))
+                else:
+                    self.assertFalse(is_hit_classic(x, y, sparse))
+        self.assertEqual(sparse, field)
+        self.assertEqual(sparse_cells, cells)
+        self.assertTrue(game_over(sparse))
+
+    def test_ocean_memory_scales_with_ships(self):
+        field = make_field((10000, 10000))
+        self.assertIsInstance(field, SparseField)
+        ships = {1: 40, 2: 30, 3: 20, 4: 10}
+        self.assertTrue(random_place_fleet(field, ships))
+        self.assertEqual(len(field.cells), 200)
+        cells = init_available_cells((10000, 10000))
+        self.assertIsInstance(cells, SparsePool)
+        ai = Ai()
+        for _ in range(100):
+            x, y = ai.make_move(cells)
+            cells.remove((x, y))
+            is_hit_classic(x, y, field)
+        self.assertEqual(len(cells), 10000 * 10000 - 100)
+        self.assertLessEqual(len(field.cells), 300)
+        self.assertFalse(game_over(field))
+
+        x, y = next(iter(field.registry.ship_at))
+        lines = render_viewport(field, False, x - 2, y - 2, 5, 5)
+        self.assertEqual(len(lines), 3 + 2 * 5)
+        self.assertTrue(lines[3 + 2 * 2].startswith(f"{y} │"))
+        self.assertIn(SHIP, lines[3 + 2 * 2])
+
+    @patch('shutil.get_terminal_size',
+           return_value=os.terminal_size((200, 50)))
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_display_shows_viewport(self, mock_stdout, mock_size):
+        field = make_field((10000, 10000))
+        enemy_field = make_field((10000, 10000))
+        is_hit_classic(5000, 6000, enemy_field)
+        lines = render_field(enemy_field, True)
+        self.assertEqual(lines[0], "x 4990..5009, y 5990..6009")
+        self.assertEqual(len(lines), 3 + 2 * 20)
+        self.assertIn(MISSED, lines[3 + 2 * 10])
+        print_fields(field, enemy_field, "Я", "Соперник")
+        output = mock_stdout.getvalue()
+        self.assertIn("x 0..19, y 0..19", output)
+        self.assertLess(len(output), 10000)
+
+    def test_game_over_uses_registry(self):
+        field = make_field((10000, 10000))
+        random_place_fleet(field, {1: 3, 2: 1})
+        with patch.object(SparseField, 'has_ships') as has_ships:
+            self.assertFalse(game_over(field))
+            for x, y in list(field.registry.ship_at):
+                is_hit_classic(x, y, field)
+            self.assertTrue(game_over(field))
+        has_ships.assert_not_called()
+
+    def test_flood_fill_without_registry(self):
+        field = SparseField((1000, 1000))
+        for x in range(500, 503):
+            field[7][x] = DAMAGED
+        self.assertEqual(sorted(find_ship_cages(field, 501, 7)),
+                         [(500, 7), (501, 7), (502, 7)])
+        self.assertTrue(check_ship_full_destroyed(field, 501, 7))
+        self.assertEqual(len(field.cells), 15)
+
+    def test_pool_choice_when_almost_full(self):
+        cells = SparsePool((5, 5), [(x, y) for x in range(5)
+                                    for y in range(5)][:-1])
+        self.assertEqual(cells.choice(), (4, 4))
+        cells.remove((4, 4))
+        self.assertEqual(len(cells), 0)
+        with self.assertRaises(KeyError):
+            cells.remove((4, 4))
+
+
+class TestFleetFeasibility(unittest.TestCase):
+    def setUp(self):
+        self.path = use_temp_fleet_cache(self)
+
+    def assert_valid_layout(self, field_size, ships, layout):
+        field = make_field(field_size)
+        placed = {}
+        for x, y, size, position in layout:
+            self.assertTrue(place_ship_manual(field, size, x, y, position))
+            placed[size] = placed.get(size, 0) + 1
+        self.assertEqual(placed, ships)
+
+    def test_classic_fleet_bounds(self):
+        # Раньше таблица требовала 1x30 и 3x18, хотя флот помещается
+        # на 1x29 и 3x14: 20 клеток кораблей и 9 промежутков в ряд
+        for field_size in ((1, 29), (29, 1), (3, 14), (7, 7), (10, 10)):
+            layout = fleet_layout(field_size)
+            self.assertIsNotNone(layout, field_size)
+            self.assert_valid_layout(field_size, SHIPS, layout)
+        for field_size in ((1, 28), (2, 25), (3, 13), (6, 6), (4, 12)):
+            self.assertFalse(fleet_fits(field_size), field_size)
+
+    def test_custom_fleets(self):
+        ships = {1: 8, 2: 6, 3: 4, 4: 2}
+        self.assertFalse(fleet_fits((10, 10), ships))
+        ships = {1: 7, 2: 5, 3: 4, 4: 2}
+        self.assert_valid_layout((10, 10), ships,
+                                 fleet_layout((10, 10), ships))
+        self.assertFalse(fleet_fits((42, 42), {43: 1}))
+        self.assertTrue(fleet_fits((5, 5), {}))
+
+    def test_bounds_agree_with_plain_search(self):
+        random.seed(1)
+        for _ in range(100):
+            width = random.randint(1, 6)
+            height = random.randint(width, 7)
+            fleet = tuple((size, random.randint(1, 3))
+                          for size in sorted(random.sample(range(1, 6), 2)))
+            expected = solve(width, height, fleet) is not None
+            with patch.object(feasibility, "lanes_fit",
+                              return_value=True), \
+                    patch.object(feasibility, "parity_fit",
+                                 return_value=True):
+                self.assertEqual(solve(width, height, fleet) is not None,
+                                 expected, (width, height, fleet))
+
+    def test_answers_are_cached_on_disk(self):
+        self.assertTrue(fleet_fits((12, 9)))
+        with open(self.path, encoding="utf-8") as file:
+            self.assertIn("9x12:1=4,2=3,3=2,4=1", json.load(file))
+        feasibility._caches.clear()
+        with patch.object(feasibility, "solve") as solve_mock:
+            layout = fleet_layout((9, 12))
+        solve_mock.assert_not_called()
+        self.assert_valid_layout((9, 12), SHIPS, layout)
+
+    def test_broken_cached_layout_is_solved_again(self):
+        ships = {1: 2, 2: 1}
+        key = "4x4:1=2,2=1"
+        good = fleet_layout((4, 4), ships)
+        broken = [
+            [[0, 0, 1, 'h'], [1, 1, 1, 'h'], [2, 3, 2, 'h']],
+            [[0, 0, 1, 'h'], [3, 3, 1, 'h'], [3, 0, 2, 'h']],
+            [[0, 0, 1, 'h'], [3, 3, 1, 'h']],
+            [[0, 0, 1, 'h'], [0, 0, 1, 'h'], [2, 2, 2, 'v']],
+            [[0, 0, 1, 'x'], [3, 3, 1, 'h'], [2, 0, 2, 'v']],
+            "0,0",
+        ]
+        for layout in broken:
+            feasibility._caches.clear()
+            with open(self.path, "w", encoding="utf-8") as file:
+                json.dump({key: layout}, file)
+            self.assertEqual(fleet_layout((4, 4), ships), good, layout)
+            with open(self.path, encoding="utf-8") as file:
+                self.assertEqual(json.load(file)[key],
+                                 [list(placement) for placement in good])
+
+    def test_concurrent_cache_writers(self):
+        caches = [{f"{i}x{i}:1=1": [[0, 0, 1, 'h']] * 50}
+                  for i in range(1, 9)]
+        threads = [threading.Thread(target=feasibility.save_cache,
+                                    args=(self.path, cache))
+                   for cache in caches]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with open(self.path, encoding="utf-8") as file:
+            self.assertIn(json.load(file), caches)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)),
+                         [os.path.basename(self.path)])
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_correct_field_size_custom_fleet(self, mock_stdout):
+        self.assertTrue(correct_field_size((10, 10), {4: 5}))
+        self.assertFalse(correct_field_size((10, 10), {4: 13}))
+        self.assertIn("Флот не помещается", mock_stdout.getvalue())
+
+
+class TestFleetPolicy(unittest.TestCase):
+    @staticmethod
+    def ship_cells(ships):
+        return sum(size * count for size, count in ships.items())
+
+    def test_classic_fleet_on_default_board(self):
+        self.assertEqual(fleet_for_size((10, 10)), SHIPS)
+
+    def test_density_kept_on_large_boards(self):
+        for side in (20, 30, 42):
+            ships = fleet_for_size((side, side))
+            self.assertAlmostEqual(self.ship_cells(ships) / side ** 2,
+                                   TARGET_DENSITY, delta=0.02)
+            self.assertTrue(fleet_fits((side, side), ships))
+
+    def test_narrow_board_drops_long_ships(self):
+        ships = fleet_for_size((2, 30))
+        self.assertTrue(fleet_fits((2, 30), ships))
+        self.assertEqual(fleet_for_size((1, 3)), {1: 1})
+
+    def test_fallback_to_solver_layout(self):
+        ships = {1: 7, 2: 5, 3: 4, 4: 2}
+        field = make_field((10, 10))
+        random.seed(3)
+        with patch('game.utils.place_fleet', return_value=False):
+            self.assertTrue(random_place_fleet(field, ships))
+        self.assertEqual(field.registry.ships_left(), sum(ships.values()))
+        self.assertEqual(sum(row.count(SHIP) for row in field),
+                         self.ship_cells(ships))
+        for cells in field.registry.ship_cells.values():
+            for x, y in cells:
+                for a, b in neighbour_tables(10, 10)[1][y][x]:
+                    if field[b][a] == SHIP:
+                        self.assertIn((a, b), cells)
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_setup_game_uses_fleet(self, mock_stdout):
+        ships = fleet_for_size((20, 20))
+        with patch('builtins.input', side_effect=["Игрок", "1", "да"]):
+            game = setup_game((20, 20), ships)
+        for field in (game.player_field, game.bot_field):
+            self.assertEqual(field.registry.ships_left(),
+                             sum(ships.values()))
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_manual_placement_custom_fleet(self, mock_stdout):
+        field = make_field((6, 6))
+        with patch('builtins.input', side_effect=["0 0 h", "0 2 v"]):
+            manual_ship_placement(field, {2: 1, 3: 1})
+        self.assertEqual(field[0][:2], [SHIP, SHIP])
+        self.assertEqual([field[y][0] for y in range(2, 5)], [SHIP] * 3)
+
+    def test_probability_ai_knows_fleet(self):
+        self.assertEqual(ProbabilityAi((30, 30)).remaining,
+                         fleet_for_size((30, 30)))
+
+    def test_solver_capped_on_large_boards(self):
+        use_temp_fleet_cache(self)
+        sizes = []
+
+        def record(width, height, fleet):
+            sizes.append((width, height))
+            return solve(width, height, fleet)
+
+        with patch('game.feasibility.solve', side_effect=record):
+            ships = fleet_for_size((100, 100))
+            self.assertEqual(fleet_for_size((10000, 10000)), ships)
+            self.assertEqual(ships, fleet_for_size((42, 42)))
+            self.assertTrue(fleet_fits((10, 500), {4: 20}))
+            result = play_headless_game(Ai(), Ai(), (60, 60), seed=1)
+        self.assertIn(result.winner, (0, 1))
+        self.assertTrue(all(max(size) <= 42 for size in sizes))
+
+    @patch('sys.stdout', new_callable=StringIO)
+    def test_menu_rejects_bad_sizes(self, mock_stdout):
+        with patch('builtins.input', side_effect=[
+                '3', '-1 5', '100 100', '2 2', '1 5', '', '0']):
+            main()
+        output = mock_stdout.getvalue()
+        self.assertEqual(output.count("оба числа от 0 до 42"), 2)
+        self.assertIn("не меньше 5 клеток", output)
+        self.assertFalse(correct_field_size((1, 4), ships=None))
+        self.assertTrue(correct_field_size((1, 5), ships=None))
+        with self.assertRaises(ValueError):
+            DuelAi((2, 2), {1: 1}).place_mines()
+
+
+class TestResolveSalvo(unittest.TestCase):
+    cells = [(1, 1), (2, 1), (4, 1), (0, 5), (1, 1), (4, 4)]
+
+    def fields(self):
+        field = make_field((6, 6))
+        plain = [[EMPTY] * 6 for _ in range(6)]
+        for target in (field, plain):
+            place_ship_manual(target, 2, 1, 1, 'h')
+            place_ship_manual(target, 1, 4, 1, 'h')
+            place_ship_manual(target, 2, 4, 3, 'v')
+        return field, plain
+
+    def test_one_sink_check_per_ship(self):
+        field, _ = self.fields()
+        with patch('game.player_move.ship_cells_at',
+                   wraps=player_move.ship_cells_at) as lookup:
+            result = resolve_salvo(field, self.cells)
+        self.assertEqual(lookup.call_count, 3)
+        self.assertEqual(result.hits, [(1, 1), (2, 1), (4, 1), (4, 4)])
+        self.assertEqual([ship.cells for ship in result.sunk],
+                         [[(1, 1), (2, 1)], [(4, 1)]])
+        self.assertEqual(result.sunk[0].halo, [
+            (0, 0), (0, 1), (0, 2), (1, 0), (1, 2), (2, 0), (2, 2),
+            (3, 0), (3, 1), (3, 2)])
+        self.assertEqual(sorted(result.halo),
+                         sorted(result.sunk[0].halo + result.sunk[1].halo))
+        self.assertEqual(field[0][3], MISSED)
+        self.assertEqual(field[4][4], DAMAGED)
+        self.assertEqual(field.registry.ships_left(), 1)
+
+    def test_dry_run_matches_and_keeps_field(self):
+        for field in self.fields():
+            before = [list(row) for row in field]
+            dry = resolve_salvo(field, self.cells, apply=False)
+            self.assertEqual([list(row) for row in field], before)
+            self.assertEqual(dry, resolve_salvo(field, self.cells))
+
+    def test_miss_is_not_marked(self):
+        field, _ = self.fields()
+        result = resolve_salvo(field, [(0, 5)])
+        self.assertEqual(result, ([], [], []))
+        self.assertEqual(field[5][0], EMPTY)
+        self.assertEqual(resolve_salvo(field, [(4, 3)], apply=False).sunk,
+                         [])
+
+
+class TestDuelAi(unittest.TestCase):
+    def setUp(self):
+        random.seed(3)
+
+    def state(self, ships=((2, 1, 'h'), (0, 4, 'v')), size=(6, 6)):
+        fields = (make_field(size), make_field(size))
+        for field in fields:
+            for x, y, position in ships:
+                place_ship_manual(field, 2, x, y, position)
+        return duel_state(*fields)._replace(current=0)
+
+    def test_mines(self):
+        mines = DuelAi((10, 10)).place_mines()
+        self.assertEqual(len(set(mines)), 5)
+        self.assertTrue(all(0 <= x < 10 and 0 <= y < 10 for x, y in mines))
+
+    def test_finishes_off_damaged_ship(self):
+        state = self.state()
+        enemy = state.fields[1]
+        enemy[1][2] = DAMAGED
+        enemy.registry.hit(2, 1)
+        action = DuelAi((6, 6), {2: 2}).choose_action(
+            state._replace(moved_ship=True), 0)
+        self.assertIsInstance(action, Salvo)
+        self.assertEqual(state.fields[0][action.ship_y][action.ship_x], SHIP)
+        self.assertIn((action.x, action.y), {(1, 1), (3, 1), (2, 0), (2, 2)})
+
+    def check_heat(self):
+        field = make_field((7, 5))
+        field[2][3] = DAMAGED
+        field[0][0] = MISSED
+        heat, damaged = DuelAi((7, 5))._heat(field, set(), {(5, 4)},
+                                             {(6, 0)}, {3: 1, 2: 2, 1: 1})
+        return [[round(float(value), 9) for value in row]
+                for row in heat], damaged
+
+    @unittest.skipUnless(ai_module.HAS_NUMPY, "numpy не установлен")
+    def test_heat_numpy_matches_python(self):
+        heat, damaged = self.check_heat()
+        with patch('game.Ai.HAS_NUMPY', False):
+            self.assertEqual(self.check_heat()[0], heat)
+        self.assertTrue(damaged[2][3])
+        self.assertEqual((heat[2][3], heat[0][0], heat[4][5]), (0, 0, 0))
+        best = max(range(35), key=lambda cell: heat[cell // 7][cell % 7])
+        self.assertIn(best, {2 * 7 + 2, 2 * 7 + 4, 1 * 7 + 3, 3 * 7 + 3})
+
+    def test_evades_unless_mines_are_likely(self):
+        state = self.state(ships=(), size=(6, 1))
+        place_ship_manual(state.fields[0], 1, 0, 0, 'h')
+        ai = DuelAi((6, 1), {1: 1})
+        ai.observe(state, [SalvoFired(1, 1, [(1, 0)])], 0)
+        self.assertIsInstance(ai.choose_action(state, 0), Salvo)
+        ai.exploded = 5
+        action = ai.choose_action(state, 0)
+        self.assertEqual(action, MoveShip(0, 0, 0, 1, 0))
+        events, state = apply(state, action)
+        self.assertEqual(events, [ShipMoved(0, [(1, 0)])])
+        self.assertIsInstance(ai.choose_action(state, 0), Salvo)
+
+    def test_fallback_salvo_is_legal(self):
+        state = self.state()
+        enemy = state.fields[1]
+        for y in range(6):
+            for x in range(6):
+                if (x, y) != (5, 5):
+                    enemy[y][x] = DAMAGED
+        state = state._replace(moved_ship=True)
+        action = DuelAi((6, 6), {2: 2}).fallback_salvo(state, 0)
+        self.assertEqual((action.x, action.y), (5, 5))
+        events, _ = apply(state, action)
+        self.assertEqual(type(events[0]), SalvoFired)
+
+    def test_full_game(self):
+        result = play_headless_duel(DuelAi((10, 10)), DuelAi((10, 10)),
+                                    seed=4)
+        self.assertIn(result.winner, (0, 1))
+
+    def test_full_game_without_numpy(self):
+        with patch('game.Ai.HAS_NUMPY', False):
+            result = play_headless_duel(DuelAi((8, 8)), DuelAi((8, 8)),
+                                        (8, 8), seed=5)
+        self.assertIn(result.winner, (0, 1))
+
+
 if __name__ == '__main__':
     unittest.main()
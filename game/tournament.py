@@ -0,0 +1,290 @@
+import argparse
+import importlib
+import itertools
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from game.Ai import Ai, ProbabilityAi
+from game.constans import FIELDSIZE_DEFAULT
+from game.simulation import play_headless_game
+
+
+def classic_ai(field_size):
+    return Ai()
+
+
+# Имя стратегии -> 'модуль:имя' фабрики, принимающей размер поля.
+# Процессы пула получают стратегии по имени и импортируют фабрики сами,
+# поэтому турнир работает при любом способе запуска процессов
+# (fork, spawn, forkserver).
+STRATEGIES = {
+    'ai': 'game.tournament:classic_ai',
+    'probability': 'game.Ai:ProbabilityAi',
+}
+
+
+def strategy_path(factory):
+    return f"{factory.__module__}:{factory.__qualname__}"
+
+
+def load_strategy(path):
+    """
+    Фабрика стратегии по строке 'модуль:имя'
+    """
+    module, _, name = path.partition(":")
+    factory = importlib.import_module(module)
+    try:
+        for part in name.split("."):
+            factory = getattr(factory, part)
+    except AttributeError:
+        raise ValueError(f"Стратегия {path} не импортируется") from None
+    return factory
+
+
+def register_strategy(name, factory):
+    """
+    Регистрация новой стратегии бота для турниров. factory — функция
+    или класс уровня модуля либо строка 'модуль:имя': процессы пула
+    импортируют фабрику заново, поэтому лямбды и локальные функции
+    не подходят.
+    """
+    if isinstance(factory, str):
+        path = factory
+        load_strategy(path)
+    else:
+        path = strategy_path(factory)
+        if load_strategy(path) is not factory:
+            raise ValueError(f"Стратегия {path} не импортируется")
+    STRATEGIES[name] = path
+
+
+def batch_seed(seed, first, second, batch_index):
+    """
+    Зерно генератора для пачки партий. Не зависит от того,
+    какой процесс будет играть пачку, поэтому результаты воспроизводимы.
+    """
+    return f"{seed}:{first}:{second}:{batch_index}"
+
+
+def play_batch(first, second, batch_index, games, seed, field_size,
+               paths=None):
+    """
+    Играет пачку партий между двумя стратегиями в текущем процессе.
+    Первый ход по очереди отдается то одной, то другой стратегии.
+    paths — 'модуль:имя' фабрик стратегий (по умолчанию из STRATEGIES).
+    """
+    random.seed(batch_seed(seed, first, second, batch_index))
+    names = (first, second)
+    if paths is None:
+        paths = (STRATEGIES[first], STRATEGIES[second])
+    factories = [load_strategy(path) for path in paths]
+    wins = [0, 0]
+    shots_sum = [0, 0]
+    shots_sq_sum = [0, 0]
+    for i in range(games):
+        order = (0, 1) if i % 2 == 0 else (1, 0)
+        bots = [factories[side](field_size) for side in order]
+        result = play_headless_game(bots[0], bots[1], field_size)
+        winner = order[result.winner]
+        shots = result.shots[result.winner]
+        wins[winner] += 1
+        shots_sum[winner] += shots
+        shots_sq_sum[winner] += shots * shots
+    return {
+        'first': first,
+        'second': second,
+        'batch': batch_index,
+        'seed': seed,
+        'field_size': list(field_size),
+        'games': games,
+        'wins': wins,
+        'shots_sum': shots_sum,
+        'shots_sq_sum': shots_sq_sum,
+    }
+
+
+def _play_batch_args(args):
+    return play_batch(*args)
+
+
+def load_batches(results_path):
+    """
+    Чтение уже сыгранных пачек из файла результатов.
+    Недописанная последняя строка (прерванный запуск) пропускается.
+    """
+    batches = []
+    if results_path is None or not os.path.exists(results_path):
+        return batches
+    with open(results_path, "r") as file:
+        for line in file:
+            try:
+                batches.append(json.loads(line))
+            except ValueError:
+                continue
+    return batches
+
+
+def run_tournament(strategies=None, games_per_pair=1000, batch_size=200,
+                   workers=None, seed=0, field_size=FIELDSIZE_DEFAULT,
+                   results_path=None):
+    """
+    Круговой турнир стратегий на пуле процессов.
+    Каждая сыгранная пачка сразу дописывается в results_path,
+    поэтому прерванный турнир продолжается с места остановки.
+    Сыгранная пачка используется снова, только если у нее тот же
+    размер пачек и столько же партий, сколько в пачке с тем же номером
+    у нового запуска; остальные пачки играются заново.
+    Возвращает сводку, посчитанную summarize().
+    """
+    if strategies is None:
+        strategies = sorted(STRATEGIES)
+    pairs = list(itertools.combinations_with_replacement(strategies, 2))
+
+    field_size = tuple(field_size)
+    batch_count = math.ceil(games_per_pair / batch_size)
+
+    def batch_games(batch_index):
+        return min(batch_size, games_per_pair - batch_index * batch_size)
+
+    batches = []
+    done = set()
+    for batch in load_batches(results_path):
+        key = (batch['first'], batch['second'], batch['batch'])
+        if ((batch['first'], batch['second']) in pairs and
+                batch['seed'] == seed and
+                tuple(batch['field_size']) == field_size and
+                batch.get('batch_size') == batch_size and
+                batch['batch'] < batch_count and
+                batch['games'] == batch_games(batch['batch']) and
+                key not in done):
+            batches.append(batch)
+            done.add(key)
+
+    tasks = []
+    for first, second in pairs:
+        paths = (STRATEGIES[first], STRATEGIES[second])
+        for batch_index in range(batch_count):
+            if (first, second, batch_index) in done:
+                continue
+            tasks.append((first, second, batch_index,
+                          batch_games(batch_index), seed, field_size,
+                          paths))
+
+    results_file = None
+    if results_path is not None:
+        results_file = open(results_path, "a")
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(_play_batch_args, task) for task in tasks]
+        for future in as_completed(futures):
+            batch = future.result()
+            batch['batch_size'] = batch_size
+            batch['games_per_pair'] = games_per_pair
+            batches.append(batch)
+            if results_file is not None:
+                results_file.write(json.dumps(batch) + "\n")
+                results_file.flush()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        if results_file is not None:
+            results_file.close()
+
+    return summarize(batches)
+
+
+def wilson_interval(wins, games, z=1.96):
+    """
+    Доверительный интервал Уилсона для доли побед
+    """
+    if games == 0:
+        return 0.0, 1.0
+    p = wins / games
+    denominator = 1 + z * z / games
+    centre = (p + z * z / (2 * games)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / games +
+                           z * z / (4 * games * games)) / denominator
+    return centre - margin, centre + margin
+
+
+def mean_interval(total, sq_total, count, z=1.96):
+    """
+    Среднее и его доверительный интервал (нормальное приближение)
+    """
+    if count == 0:
+        return None, (None, None)
+    mean = total / count
+    if count == 1:
+        return mean, (mean, mean)
+    variance = max(sq_total - count * mean * mean, 0) / (count - 1)
+    margin = z * math.sqrt(variance / count)
+    return mean, (mean - margin, mean + margin)
+
+
+def summarize(batches):
+    """
+    Сводка по парам стратегий: доля побед первой стратегии
+    и среднее число выстрелов до победы у каждой стороны.
+    """
+    totals = {}
+    for batch in batches:
+        key = (batch['first'], batch['second'])
+        total = totals.setdefault(key, {
+            'games': 0, 'wins': [0, 0],
+            'shots_sum': [0, 0], 'shots_sq_sum': [0, 0]})
+        total['games'] += batch['games']
+        for side in (0, 1):
+            total['wins'][side] += batch['wins'][side]
+            total['shots_sum'][side] += batch['shots_sum'][side]
+            total['shots_sq_sum'][side] += batch['shots_sq_sum'][side]
+
+    summary = {}
+    for key, total in totals.items():
+        wins = total['wins']
+        shots = [mean_interval(total['shots_sum'][side],
+                               total['shots_sq_sum'][side], wins[side])
+                 for side in (0, 1)]
+        summary[key] = {
+            'games': total['games'],
+            'wins': tuple(wins),
+            'win_rate': wins[0] / total['games'],
+            'win_rate_ci': wilson_interval(wins[0], total['games']),
+            'mean_shots': (shots[0][0], shots[1][0]),
+            'mean_shots_ci': (shots[0][1], shots[1][1]),
+        }
+    return summary
+
+
+def print_summary(summary):
+    for (first, second), row in sorted(summary.items()):
+        low, high = row['win_rate_ci']
+        print(f"{first} vs {second}: {row['games']} партий, "
+              f"победы {first} {row['win_rate']:.3f} "
+              f"[{low:.3f}; {high:.3f}]")
+        for name, mean in zip((first, second), row['mean_shots']):
+            if mean is not None:
+                print(f"    {name}: в среднем {mean:.2f} "
+                      f"выстрелов до победы")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Турнир стратегий ботов")
+    parser.add_argument("--strategies", nargs="+", default=None)
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, nargs=2,
+                        default=list(FIELDSIZE_DEFAULT))
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+    summary = run_tournament(args.strategies, args.games, args.batch_size,
+                             args.workers, args.seed, tuple(args.size),
+                             args.out)
+    print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
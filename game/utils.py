@@ -1,39 +1,103 @@
-from game.constans import EMPTY, SHIPS, SHIP, DAMAGED
-from game.field import print_field, mark_around_ship
-from game.ship import random_place_ship, ship_not_near, find_ship_cages
+import random
+
+from game.bitboard import BitField
+from game.constans import (EMPTY, SHIPS, SHIP, DAMAGED, FIELDSIZE_MAX,
+                           MINES_COUNT)
+from game.errors import MoveError
+from game.feasibility import fleet_fits, fleet_layout
+from game.field import print_field, mark_around_ship, note_changes
+from game.instrument import STATS_ENABLED, observe, instrument_module
+from game.leaderboard import Leaderboard
+from game.mines import Mines
+from game.movelog import MINE
+from game.placement import place_fleet
+from game.pool import IndexedPool, SparsePool
+from game.registry import register_ship
+from game.ship import ship_not_near, find_ship_cages
+from game.sparse import SparseField, SPARSE_AREA
 
 
 def clear_field(field):
     """
     Очистка поля перед новой генерацией
     """
+    if isinstance(field, SparseField):
+        field.clear()
+        return
+    registry = getattr(field, 'registry', None)
+    if registry is not None:
+        registry.clear()
     for row in field:
         for i in range(len(row)):
             row[i] = EMPTY
 
 
-def random_setup_ships(field):
+def random_place_fleet(field, ships=SHIPS):
+    """
+    Случайная расстановка всего флота без вывода на экран.
+    Если случайный перебор не нашел расстановку плотного флота,
+    ставится расстановка точного решателя, отраженная случайным образом.
+    Возвращает False, если флот не помещается на поле.
+    """
+    clear_field(field)
+    if place_fleet(field, ships):
+        return True
+    if isinstance(field, SparseField):
+        return False
+    field_size = (len(field[0]), len(field))
+    layout = fleet_layout(field_size, ships)
+    if layout is None:
+        return False
+    place_layout(field, layout, random.random() < 0.5,
+                 random.random() < 0.5)
+    return True
+
+
+def place_layout(field, layout, flip_x=False, flip_y=False):
+    """
+    Ставит на пустое поле корабли расстановки [(x, y, размер,
+    направление), ...], при необходимости отражая ее
+    """
+    field_size_x, field_size_y = len(field[0]), len(field)
+    for x, y, size, position in layout:
+        dx, dy = (1, 0) if position == 'h' else (0, 1)
+        if flip_x:
+            x = field_size_x - x - 1 - dx * (size - 1)
+        if flip_y:
+            y = field_size_y - y - 1 - dy * (size - 1)
+        cells = [(x + dx * i, y + dy * i) for i in range(size)]
+        for a, b in cells:
+            field[b][a] = SHIP
+        register_ship(field, cells)
+
+
+def random_setup_ships(field, ships=SHIPS):
     """
     Расстановка кораблей с возможностью перегенерации
     """
     while True:
-        clear_field(field)
-        for count in SHIPS:
-            for i in range(count):
-                size_of_ship = SHIPS[count]
-                random_place_ship(field, size_of_ship)
+        if not random_place_fleet(field, ships):
+            print("Не удалось расставить корабли на поле такого размера")
+            return False
         print("\nВаша расстановка кораблей:")
         print_field(field, hide_ships=False)
         choice = input("\nВас устраивает расстановка?"
                        " (да/нет): ").strip().lower()
         if choice == 'да':
-            break
+            return True
 
 
 def game_over(field):
     """
     Проверка на конец игры
     """
+    if isinstance(field, BitField):
+        return not field.has_ships()
+    registry = getattr(field, 'registry', None)
+    if registry is not None and registry.ship_cells:
+        return registry.fleet_destroyed()
+    if isinstance(field, SparseField):
+        return not field.has_ships()
     for row in field:
         for cage in row:
             if cage == SHIP:
@@ -45,8 +109,22 @@ def init_available_cells(field_size):
     """
     Функция определяет клетки, еще не задействованные в игре
     """
-    return {(x, y) for x in range(field_size[0])
-            for y in range(field_size[1])}
+    if field_size[0] * field_size[1] > SPARSE_AREA:
+        return SparsePool(field_size)
+    return IndexedPool((x, y) for x in range(field_size[0])
+                       for y in range(field_size[1]))
+
+
+def untouched_cells(field):
+    """
+    Клетки поля, по которым еще не стреляли,
+    например для продолжения сохраненной партии
+    """
+    if isinstance(field, SparseField):
+        return SparsePool((field.width, field.height), field.shot_cells())
+    return IndexedPool((x, y) for x in range(len(field[0]))
+                       for y in range(len(field))
+                       if field[y][x] == EMPTY or field[y][x] == SHIP)
 
 
 def place_ship_manual(field, size, x, y, direction):
@@ -81,23 +159,23 @@ def place_ship_manual(field, size, x, y, direction):
                 return False
 
     if direction == 'h':
-        for i in range(size):
-            field[y][x + i] = SHIP
+        cells = [(x + i, y) for i in range(size)]
     else:
-        for i in range(size):
-            field[y + i][x] = SHIP
+        cells = [(x, y + i) for i in range(size)]
+    for cage_x, cage_y in cells:
+        field[cage_y][cage_x] = SHIP
+    register_ship(field, cells)
 
     return True
 
 
-def manual_ship_placement(field):
+def manual_ship_placement(field, ships=SHIPS):
     """
     Процесс ручной расстановки кораблей
     """
     print("Формат: x y h/v (например: 3 5 v - вертикально)")
-    field_size = len(field)
     ships_to_place = []
-    for size, count in SHIPS.items():
+    for size, count in sorted(ships.items()):
         ships_to_place.extend([size] * count)
 
     while ships_to_place:
@@ -120,75 +198,74 @@ def manual_ship_placement(field):
             print("Ошибка ввода! Используйте формат: x y h/v")
 
 
-def record_score(moves, player_name):
+def record_score(moves, player_name, sink=None):
     """
-    Записывает количество ходов игрока в файл рекордов с именем.
+    Записывает количество ходов игрока в таблицу рекордов с именем.
+    При массовом запуске игр можно передать ScoreSink:
+    тогда запись попадет в базу вместе с пачкой.
     """
-    with open("scores.txt", "a") as file:
-        file.write(f"{player_name}:{moves}\n")
+    if sink is not None:
+        sink.add(player_name, moves)
+        return
+    with Leaderboard() as leaderboard:
+        leaderboard.add(player_name, moves)
 
 
 def display_scores():
-    with open("scores.txt", "r") as file:
-        scores = []
-        for line in file:
-            name, score = line.split(":")
-            scores.append((name, int(score)))
-        scores.sort(key=lambda item: item[1])
-        if scores:
-            print("\nТаблица рекордов:")
-            rank = 1
-            for name, score in scores[:10]:
-                print(f"{rank}. {name}: {score} ходов")
-                rank += 1
-        else:
-            print("\nВ таблице пока нет записей!")
+    with Leaderboard() as leaderboard:
+        scores = leaderboard.top(10)
+    if scores:
+        print("\nТаблица рекордов:")
+        rank = 1
+        for name, score in scores:
+            print(f"{rank}. {name}: {score} ходов")
+            rank += 1
+    else:
+        print("\nВ таблице пока нет записей!")
+
+
+MOVE_DIRECTIONS = {
+    'вверх': (0, -1),
+    'вниз': (0, 1),
+    'влево': (-1, 0),
+    'вправо': (1, 0),
+}
 
 
-def move_ship(field):
+def movable_ship_cells(field, ship_x, ship_y):
     """
-    Реализует логику перемещения
-    одного неподбитого корабля на одну клетку.
+    Клетки неподбитого корабля, который можно переместить.
+    Если кораблем нельзя ходить, бросает MoveError.
     """
-    print("\n--- Перемещение корабля ---")
-    print("Выберите клетку, принадлежащую "
-          "кораблю, который хотите переместить (x y):")
     field_size_y = len(field)
     field_size_x = len(field[0])
-
-    ship_x, ship_y = map(int, input().split())
     if not (0 <= ship_x < field_size_x and 0 <= ship_y < field_size_y):
-        print("Некорректные координаты корабля.")
-        return False
+        raise MoveError("Некорректные координаты корабля.", 'out_of_field')
     if field[ship_y][ship_x] != SHIP:
-        print("В выбранной клетке нет вашего неподбитого корабля.")
-        return False
+        raise MoveError("В выбранной клетке нет вашего неподбитого корабля.",
+                        'no_ship')
 
     ship_cells = find_ship_cages(field, ship_x, ship_y)
     if any(field[y][x] == DAMAGED for x, y in ship_cells):
-        print("Этот корабль подбит, его нельзя переместить.")
-        return False
+        raise MoveError("Этот корабль подбит, его нельзя переместить.",
+                        'ship_damaged')
+    return ship_cells
 
-    print("Введите куда переместить корабль(вверх, вниз, влево, вправо):")
-    direction = input().strip().lower()
-    dx, dy = 0, 0
-    if direction == 'вверх':
-        dy = -1
-    elif direction == 'вниз':
-        dy = 1
-    elif direction == 'влево':
-        dx = -1
-    elif direction == 'вправо':
-        dx = 1
-    else:
-        return False
 
+def shift_ship(field, ship_x, ship_y, dx, dy, log=None):
+    """
+    Сдвиг неподбитого корабля на одну клетку без ввода-вывода.
+    Если сдвинуть нельзя, поле не меняется и бросается MoveError.
+    """
+    field_size_y = len(field)
+    field_size_x = len(field[0])
+    ship_cells = movable_ship_cells(field, ship_x, ship_y)
     new_ship_cells = [(x + dx, y + dy) for x, y in ship_cells]
 
     if not all(0 <= x < field_size_x and
                0 <= y < field_size_y for x, y in new_ship_cells):
-        print("Новая позиция выходит за пределы поля.")
-        return False
+        raise MoveError("Новая позиция выходит за пределы поля.",
+                        'out_of_field')
 
     original_cells_state = [(x, y, field[y][x]) for x, y in ship_cells]
     for x, y in ship_cells:
@@ -207,41 +284,81 @@ def move_ship(field):
         new_position = 'h'
         new_head_x, new_head_y = new_ship_cells[0]
 
-    can_place_at_new_pos = ship_not_near(
-        field, new_head_x, new_head_y, len(ship_cells), new_position)
-    if can_place_at_new_pos:
-        for new_x, new_y in new_ship_cells:
-            field[new_y][new_x] = SHIP
-        print("Корабль успешно перемещен!")
-        return True
-    else:
+    if not ship_not_near(field, new_head_x, new_head_y,
+                         len(ship_cells), new_position):
         for x, y, state in original_cells_state:
             field[y][x] = state
-        print("Невозможно переместить "
-              "корабль на новую позицию (занято).")
+        raise MoveError("Невозможно переместить "
+                        "корабль на новую позицию (занято).", 'blocked')
+
+    for new_x, new_y in new_ship_cells:
+        field[new_y][new_x] = SHIP
+    registry = getattr(field, 'registry', None)
+    if registry is not None:
+        ship_id = registry.find(ship_x, ship_y)
+        if ship_id is not None:
+            registry.move(ship_id, new_ship_cells)
+        else:
+            registry.add_ship(new_ship_cells)
+    note_changes(field, ship_cells)
+    note_changes(field, new_ship_cells)
+    if log is not None:
+        log.record_move(field, ship_x, ship_y, dx, dy)
+    return new_ship_cells
+
+
+def move_ship(field, log=None):
+    """
+    Перемещение одного неподбитого корабля на одну клетку
+    с вводом с консоли. Ход выполняет автомат партии (game.engine).
+    Удачное перемещение записывается в журнал партии, если он передан.
+    """
+    # game.engine сам импортирует этот модуль
+    from game.engine import MoveShip, apply, duel_state
+
+    print("\n--- Перемещение корабля ---")
+    print("Выберите клетку, принадлежащую "
+          "кораблю, который хотите переместить (x y):")
+
+    ship_x, ship_y = map(int, input().split())
+    try:
+        movable_ship_cells(field, ship_x, ship_y)
+    except MoveError as error:
+        print(error)
+        return False
+
+    print("Введите куда переместить корабль(вверх, вниз, влево, вправо):")
+    direction = input().strip().lower()
+    if direction not in MOVE_DIRECTIONS:
         return False
+    action = MoveShip(0, ship_x, ship_y, *MOVE_DIRECTIONS[direction])
 
+    try:
+        apply(duel_state(field, field)._replace(current=0), action, log)
+    except MoveError as error:
+        print(error)
+        return False
+    print("Корабль успешно перемещен!")
+    return True
 
-def correct_field_size(field_size):
+
+def correct_field_size(field_size, ships=SHIPS):
+    """
+    Проверка размеров поля из меню: стороны от 1 до FIELDSIZE_MAX,
+    на поле помещаются мины режима 1 на 1 и флот ships
+    (если ships=None, флот не проверяется)
+    """
     x, y = field_size
-    if x < 1 or y < 1 or x > 42 or y > 42:
+    if x < 1 or y < 1 or x > FIELDSIZE_MAX or y > FIELDSIZE_MAX:
         print("Введите корректные размеры (оба числа от 0 до 42)")
         return False
 
-    min_d = min(x, y)
-    max_d = max(x, y)
-    min_sizes = {
-        1: 30,
-        2: 27,
-        3: 18,
-        4: 13,
-        5: 11,
-        6: 10,
-        7: 8,
-    }.get(min_d, 0)
-
-    if min_d <= 7 and max_d < min_sizes:
-        print(f"При {min_d=} {max_d} должен быть минимум {min_sizes}")
+    if x * y < MINES_COUNT:
+        print(f"На поле должно быть не меньше {MINES_COUNT} клеток")
+        return False
+
+    if ships is not None and not fleet_fits(field_size, ships):
+        print(f"Флот не помещается на поле {x}x{y}")
         return False
 
     return True
@@ -252,11 +369,11 @@ def set_up_mins(field):
     field_size_x = len(field[0])
     field_size_y = len(field)
     print(f"Расстановка мин на поле соперника")
-    for i in range(5):
+    for i in range(MINES_COUNT):
         while True:
             x, y = map(int, input(
                 f"Введите координаты для {i + 1} "
-                f"мины из {5} (x y): ").split())
+                f"мины из {MINES_COUNT} (x y): ").split())
             if (0 <= x < field_size_x and
                     0 <= y < field_size_y and (x, y) not in mins):
                 mins.append((x, y))
@@ -269,13 +386,48 @@ def set_up_mins(field):
     return mins
 
 
-def check_mins(field, mins):
-    damaged = False
-    for x, y in mins:
+def check_mins(field, mins, log=None, cells=None):
+    """
+    Подрыв кораблей, стоящих на минах.
+    Если переданы клетки cells, куда только что встал корабль,
+    проверяются только мины в них, иначе все мины.
+    Возвращает клетки сработавших мин.
+    """
+    if cells is None:
+        candidates = mins
+    elif isinstance(mins, Mines):
+        candidates = mins.under(cells)
+    else:
+        candidates = [cell for cell in cells if cell in mins]
+    exploded = []
+    for x, y in candidates:
         if field[y][x] == SHIP:
-            damaged = True
-            cages = find_ship_cages(field, x, y)
-            for i, j in cages:
-                field[j][i] = DAMAGED
-            mark_around_ship(field, None, cages)
-    return damaged
+            exploded.append((x, y))
+            if log is not None:
+                log.record(MINE, field, x, y)
+            blow_up_ship(field, x, y)
+    if STATS_ENABLED:
+        observe("check_mins.exploded", len(exploded))
+    return exploded
+
+
+def blow_up_ship(field, x, y):
+    """
+    Уничтожение корабля в клетке (x, y) целиком: клетки корабля
+    берутся из реестра, а без него — обходом поля
+    """
+    registry = getattr(field, 'registry', None)
+    ship_id = registry.find(x, y) if registry is not None else None
+    if ship_id is None:
+        cages = find_ship_cages(field, x, y)
+    else:
+        cages = registry.cells(ship_id)
+    for i, j in cages:
+        if registry is not None and field[j][i] == SHIP:
+            registry.hit(i, j)
+        field[j][i] = DAMAGED
+    note_changes(field, cages)
+    mark_around_ship(field, None, cages)
+
+
+instrument_module(globals())